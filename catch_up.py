@@ -0,0 +1,143 @@
+"""Modo de recuperação (--recuperar): gera e envia os dias úteis perdidos numa passada.
+
+Se a máquina estava desligada ou o WhatsApp Web deslogado, o relatório do dia não
+saía. Aqui:
+1. o registro de execuções (run_ledger) aponta os dias úteis sem entrega completa;
+2. o roster é lido uma vez e cada dia ganha o seu plano de métricas;
+3. uma única extração de fatos diários cobre a união das janelas de todos os dias
+   (daily_facts) e as métricas de cada dia são somadas em memória;
+4. os itens já entregues (execuções parciais) saem do lote;
+5. envio em ordem de data ("em_ordem") ou uma mensagem por destinatário com
+   todos os dias ("consolidado").
+"""
+
+from __future__ import annotations
+
+from datetime import date
+
+import config
+from daily_facts import extrair_fatos, resultados_de_fatos
+from metric_plan import FiltroExecucao, montar_mensagens
+from report_calendar import ReportContext
+from run_ledger import LedgerExecucoes, chave_item, marcar_data_execucao
+from stage_profiler import etapa
+
+
+RECUPERACAO_MAX_DIAS = getattr(config, "RECUPERACAO_MAX_DIAS", 6)
+RECUPERACAO_MODO = getattr(config, "RECUPERACAO_MODO", "em_ordem")
+
+MODOS = ("em_ordem", "consolidado")
+
+SEPARADOR_CONSOLIDADO = "\n➖➖➖➖➖➖➖➖\n\n"
+
+
+def consolidar_por_destinatario(lotes: list[tuple[date, list[dict]]]) -> list[dict]:
+    """Junta os itens do mesmo destinatário (tipo + telefone + nome) numa só mensagem."""
+    por_chave: dict[str, dict] = {}
+    for dia, itens in lotes:
+        for item in itens:
+            chave = chave_item(item)
+            atual = por_chave.get(chave)
+            if atual is None:
+                por_chave[chave] = {
+                    **item,
+                    "mensagens": ["\n".join(item["mensagens"])],
+                    "datas_execucao": [dia.isoformat()],
+                }
+                continue
+            atual["mensagens"][0] += SEPARADOR_CONSOLIDADO + "\n".join(item["mensagens"])
+            atual["datas_execucao"].append(dia.isoformat())
+
+    for item in por_chave.values():
+        if len(item["datas_execucao"]) > 1:
+            item["mensagens"][0] = f"📅 {len(item['datas_execucao'])} relatórios pendentes\n\n" + item["mensagens"][0]
+    return list(por_chave.values())
+
+
+def rotular_dia(itens: list[dict], ctx: ReportContext) -> list[dict]:
+    """Identifica o dia de referência em cada mensagem recuperada (nem toda mensagem traz a data)."""
+    rotulo = f"🗓 Referente a {ctx.ref.strftime('%d/%m/%Y')} (envio recuperado)\n\n"
+    for item in itens:
+        item["mensagens"] = [rotulo + m for m in item["mensagens"]]
+    return itens
+
+
+def executar_recuperacao(hoje: date, filtro: FiltroExecucao, modo_teste: bool, modo: str | None = None) -> int:
+    import main
+
+    modo = modo or RECUPERACAO_MODO
+    if modo not in MODOS:
+        print(f"ERRO: modo de recuperação inválido: {modo} (use {' ou '.join(MODOS)})")
+        return 1
+
+    arquivo = main.arquivo_ledger()
+    if not arquivo:
+        print("ERRO: LEDGER_ARQUIVO está desativado no config; não há como saber quais dias foram perdidos.")
+        return 1
+    ledger = LedgerExecucoes(arquivo)
+
+    dias = ledger.dias_pendentes(hoje, RECUPERACAO_MAX_DIAS)
+    if not dias:
+        print("✓ Nenhum dia pendente no registro de execuções.")
+        return 0
+    print(f"📅 Dias a recuperar ({modo}): {', '.join(d.strftime('%d/%m/%Y') for d in dias)}")
+
+    senders = None if modo_teste else main.preparar_envio()
+    try:
+        from database import Database
+
+        db = Database()
+        try:
+            from recipient_index import carregar_indice
+
+            leaders_rows = carregar_indice(db).linhas
+            planos = []
+            for dia in dias:
+                plano = main.planejar_execucao(db, ReportContext.para_data(dia), filtro, leaders_rows=leaders_rows)
+                if plano is None:
+                    return 1
+                planos.append(plano)
+            if any(plano.destinatarios for plano in planos):
+                # Kickoff em segundo plano durante a extração
+                main.confirmar_lote(senders)
+            fatos = extrair_fatos(db, planos)
+        finally:
+            db.disconnect()
+
+        esperados: list[tuple[date, list[dict]]] = []
+        lotes: list[tuple[date, list[dict]]] = []
+        for plano in planos:
+            dia = plano.ctx.hoje
+            with etapa("mensagens"):
+                resultados = resultados_de_fatos(plano, fatos) if fatos is not None else {}
+                itens = marcar_data_execucao(montar_mensagens(plano, resultados), dia)
+                if dia != hoje:
+                    rotular_dia(itens, plano.ctx)
+            main.gravar_snapshot(plano.ctx, resultados, itens)
+            esperados.append((dia, itens))
+            entregues = ledger.entregues(dia)
+            pendentes = [i for i in itens if chave_item(i) not in entregues]
+            if len(pendentes) < len(itens):
+                print(f"- {dia.strftime('%d/%m')}: {len(itens) - len(pendentes)} item(ns) já entregues ficam de fora")
+            lotes.append((dia, pendentes))
+
+        if modo == "consolidado":
+            mensagens_envio = consolidar_por_destinatario(lotes)
+        else:
+            mensagens_envio = [item for _, itens in lotes for item in itens]
+
+        if modo_teste:
+            main.imprimir_previa(mensagens_envio)
+            return 0
+
+        if mensagens_envio:
+            with etapa("envio"):
+                main.enviar_lote(mensagens_envio, senders, ao_concluir_item=ledger.registrar_entrega)
+
+        if filtro.sem_filtros():
+            for dia, itens in esperados:
+                if ledger.concluir_se_entregue(dia, itens):
+                    print(f"✓ {dia.strftime('%d/%m')} concluído no registro de execuções")
+        return 0
+    finally:
+        main.cancelar_envio(senders)
@@ -32,6 +32,8 @@ TABLE_AREA_MERCHAN = "Rbdistrib_Trade.dbo.dimAreaMerchan"
 TABLE_TELEFONE_LIDERANCA = "Rbdistrib_Trade.dbo.dimTelefoneMerchanLideranca"
 TABLE_MONITORAMENTO = "Monitoramento_Promotor"  # normalmente já está no rbdistrib_Trade
 TABLE_FERIADO_MERCHAN = "Rbdistrib_Trade.dbo.dimFeriadoMerchan"  # datas a excluir da conta de aderência
+# Telefones dos promotores (colunas nome_colaborador, telefone); obrigatória com ENVIAR_PROMOTORES/--promotores
+TABLE_TELEFONE_PROMOTOR = None
 
 # Valores que contam como visita feita
 CHECKIN_VALIDOS = ("Manual", "Manual e GPS")
@@ -42,11 +44,19 @@ AREAS_ORDEM_PADRAO = ["Centro Norte", "Filial", "Grandes Redes", "Trad"]
 # Telefones
 USE_TEST_PHONE = True
 TEST_PHONE_E164 = "+5585986068742"  # +55 + DDD + número (E.164)
+# Validação antes do envio: DDIs aceitos (telefone fora deles ou fora do E.164 fica fora do lote)
+TELEFONE_DDI_ACEITOS = ("55",)
+# Roster (líderes + telefones) em cache; só é relido quando a tabela muda (None = consulta sempre)
+ROSTER_CACHE_ARQUIVO = "roster_cache.json"
 
 # Envio
 # True = apenas imprime mensagens (não abre WhatsApp)
 MODO_TESTE = True
 
+# Mensagem individual para cada promotor (mp.Colaborador) com visitas planejadas ontem
+# Uma única consulta traz todos os promotores; também pode ser ligado por execução com --promotores
+ENVIAR_PROMOTORES = False
+
 # WhatsApp (pywhatkit)
 # Se o WhatsApp Web estiver demorando para carregar, aumente principalmente:
 # - WA_WARMUP_SEGUNDOS (tempo após abrir https://web.whatsapp.com)
@@ -57,3 +67,183 @@ WA_WAIT_TIME_PADRAO = 45
 WA_ESPERA_POS_ENVIO = 10
 WA_INTERVALO_ENTRE_MENSAGENS = 7
 WA_INTERVALO_MESMO_NUMERO = 5
+
+# Agenda do lote (ordem por prioridade/telefone + ETA)
+# - WA_PRAZO_ENVIO: horário limite para terminar o lote ("HH:MM"); None = sem prazo
+# - WA_PRAZO_ACAO: "sinalizar" (apenas avisa) ou "adiar" (tira do lote os itens de
+#   baixa prioridade que não cabem no prazo)
+# - WA_TEMPOS_APRENDIDOS_ARQUIVO: média dos tempos reais por tipo de mensagem
+WA_PRAZO_ENVIO = "08:00"
+WA_PRAZO_ACAO = "sinalizar"
+WA_TEMPOS_APRENDIDOS_ARQUIVO = "tempos_envio.json"
+
+# Telemetria do envio (um registro JSONL por mensagem + resumo p50/p95 por fase)
+# None = desativa
+WA_TELEMETRIA_ARQUIVO = "telemetria_envio.jsonl"
+
+# Várias sessões de envio em paralelo (opcional)
+# Cada item é uma sessão/worker; chaves além de "nome" sobrescrevem os tempos do sender.
+# Os destinatários são distribuídos por telefone entre as sessões.
+# No mesmo desktop, cada sessão precisa de:
+# - "perfil_navegador": pasta de perfil do WA_NAVEGADOR_EXECUTAVEL (um WhatsApp logado por perfil;
+#   abra uma vez com --user-data-dir=<pasta> para ler o QR code);
+# - "janela": (x, y, largura, altura) na tela, sem sobrepor a das outras sessões;
+# - opcional "regiao_caixa"/"regiao_bolha": regiões da confirmação pela tela dentro da sua janela.
+# Só o foco + ENTER é serializado entre as sessões (WA_SESSOES_MESMO_DESKTOP); carregamento
+# da conversa e confirmação correm em paralelo.
+# - WA_SESSOES_MESMO_DESKTOP: use False apenas se cada sessão tiver o seu próprio desktop/backend.
+# - WA_OUTBOX_ARQUIVO: andamento de cada item (pendente/enviando/ok/falha); None = só em memória
+WA_NAVEGADOR_EXECUTAVEL = None  # ex.: r"C:\Program Files\Google\Chrome\Application\chrome.exe"
+WA_SESSOES = None
+# ex.: [
+#     {"nome": "sessao1", "perfil_navegador": r"C:\wa\sessao1", "janela": (0, 0, 960, 1040)},
+#     {"nome": "sessao2", "perfil_navegador": r"C:\wa\sessao2", "janela": (960, 0, 960, 1040), "wait_time_padrao": 50},
+# ]
+WA_SESSOES_MESMO_DESKTOP = True
+WA_OUTBOX_ARQUIVO = None
+
+# Confirmação de envio pela tela (substitui a espera fixa WA_ESPERA_POS_ENVIO)
+# Regiões (left, top, width, height) em pixels; None = desativado (usa a espera fixa).
+# Calibre com: python delivery_detector.py --calibrar [--marcador enviado]
+WA_CONFIRMACAO_REGIAO_CAIXA = None  # ex.: (700, 980, 900, 50) - caixa de digitação
+WA_CONFIRMACAO_REGIAO_BOLHA = None  # ex.: (1700, 900, 80, 40) - canto da última bolha enviada
+WA_CONFIRMACAO_REFERENCIAS_DIR = "referencias_tela"
+WA_CONFIRMACAO_TIMEOUT = 30
+
+# Watchdog por envio: folga (segundos) além das esperas previstas de cada mensagem
+# (wait_time + pós-envio/confirmação). O envio roda numa thread e o lote espera no máximo
+# esse tempo, mesmo com o pywhatkit/pyautogui bloqueado. Estourou: encerra o navegador da
+# sessão (o processo aberto com WA_NAVEGADOR_EXECUTAVEL/perfil; sem perfil, alt+F4), reabre
+# com warm-up, repete a mensagem (até WA_TENTATIVAS_ENVIO) se travou antes do ENTER e segue
+# para o próximo item. None = desligado
+WA_WATCHDOG_SEGUNDOS = 60
+WA_TENTATIVAS_ENVIO = 2
+
+# Snapshot de cada execução (datas, métricas e mensagens prontas)
+# Reenvio/prévia sem consultar o banco: python main.py --de-snapshot snapshots\<arquivo>.json.gz
+# None = não grava
+SNAPSHOT_DIR = "snapshots"
+
+# Janelas móveis de aderência (dias úteis) como colunas extras nas mensagens dos líderes
+# Ex.: (7, 28) -> "Ontem | Mês | 7d | 28d"; () = desligado
+# O estado fica em JANELAS_MOVEIS_ARQUIVO e cada execução consulta só os dias novos
+# mais os últimos JANELAS_MOVEIS_DIAS_REABERTOS dias (check-ins lançados com atraso),
+# que não são gravados no estado. Prévias (--teste) não gravam o estado.
+JANELAS_MOVEIS = ()
+JANELAS_MOVEIS_ARQUIVO = "janelas_moveis.json"
+JANELAS_MOVEIS_DIAS_REABERTOS = 3
+
+# Parcial do dia (python main.py --parcial): progresso das visitas de hoje
+# - INTRADIA_TIPOS: quem recebe ("lider_merchan" = geral + áreas; "lider_area" = área + colaboradores)
+# - INTRADIA_COLUNA_ALTERACAO: coluna de data/hora de alteração em TABLE_MONITORAMENTO (ex.: do check-in);
+#   None = detecta alterações pelas visitas pendentes que ganharam check-in
+# - INTRADIA_MAX_PENDENTES: sem a coluna, acima de tantas visitas pendentes o tick relê o dia inteiro
+INTRADIA_ARQUIVO = "intradia.json"
+INTRADIA_TIPOS = ("lider_merchan",)
+INTRADIA_COLUNA_ALTERACAO = None
+INTRADIA_MAX_PENDENTES = 1000
+
+# Registro das entregas por dia de execução (base do modo --recuperar); None = desativa
+LEDGER_ARQUIVO = "execucoes.json"
+# Recuperação (python main.py --recuperar): gera e envia os dias úteis perdidos
+# - RECUPERACAO_MAX_DIAS: olha no máximo este número de dias para trás
+# - RECUPERACAO_MODO: "em_ordem" (uma mensagem por dia) ou "consolidado" (uma por destinatário)
+RECUPERACAO_MAX_DIAS = 6
+RECUPERACAO_MODO = "em_ordem"
+
+# Modo serviço (python main.py --servico): processo residente com agenda própria
+# Horário de disparo por tipo de mensagem (segunda a sábado)
+SERVICO_HORARIOS = {"lider_merchan": "07:00", "diretoria": "07:00", "lider_area": "07:00", "lider_org": "07:00"}
+# Controle local (prévias/reenvios): http://127.0.0.1:8765/status
+SERVICO_HOST = "127.0.0.1"
+SERVICO_PORTA = 8765
+# Segredo exigido no cabeçalho X-Servico-Token do POST /executar; None = POST desligado
+SERVICO_TOKEN = None
+
+# Consulta local das métricas já calculadas (python main.py --metricas; no modo serviço, na SERVICO_PORTA)
+# GET /metricas?area=Trad&colaborador=Joao&data=2026-01-12 e /mensagens?destinatario=Ana, a partir dos snapshots
+METRICAS_HOST = "127.0.0.1"
+METRICAS_PORTA = 8766
+# Snapshots lidos mantidos em memória (os usados por último)
+METRICAS_CACHE_SNAPSHOTS = 32
+
+# Banco: timeouts (segundos), novas tentativas das consultas e disjuntor
+# - DB_TENTATIVAS: tentativas por consulta em erro transitório (conexão caiu, timeout, deadlock),
+#   com espera exponencial a partir de DB_BACKOFF_BASE (até DB_BACKOFF_MAX) e jitter
+# - DB_DISJUNTOR_FALHAS/DB_DISJUNTOR_PAUSA: após N falhas seguidas, as consultas falham na hora
+#   durante a pausa (0 = sem disjuntor)
+DB_TIMEOUT_CONEXAO = 15
+DB_TIMEOUT_CONSULTA = 300
+DB_TENTATIVAS = 3
+DB_BACKOFF_BASE = 2.0
+DB_BACKOFF_MAX = 30.0
+DB_DISJUNTOR_FALHAS = 5
+DB_DISJUNTOR_PAUSA = 120
+# Prazo da execução inteira (também por execução no modo serviço); None = sem prazo
+# Estourou: para, informa a etapa/consulta e sai com código 2. Por execução: --prazo-minutos
+EXECUCAO_PRAZO_MINUTOS = None
+
+# Portão de frescor: antes das consultas, confere se as visitas de ontem já foram carregadas
+# (visitas e check-ins do dia >= FRESCOR_MIN_PCT% da mediana do mesmo dia da semana nas
+# FRESCOR_SEMANAS anteriores). Incompleto: nova sonda a cada FRESCOR_ESPERA_INICIAL segundos
+# (dobrando até FRESCOR_ESPERA_MAX) por até FRESCOR_PRAZO_MINUTOS. Estourou: alerta no número
+# do kickoff e "abortar" (não envia) ou "seguir" (envia com o que houver). Por execução: --sem-frescor
+FRESCOR_ATIVO = True
+FRESCOR_SEMANAS = 4
+FRESCOR_MIN_PCT = 90
+FRESCOR_PRAZO_MINUTOS = 60
+FRESCOR_ESPERA_INICIAL = 60
+FRESCOR_ESPERA_MAX = 600
+FRESCOR_AO_ESTOURAR = "abortar"
+
+# Rollup diário no warehouse (fatos por dia x área x superior x colaborador e grupos/redes),
+# publicado por MERGE para este relatório e o Power BI reaproveitarem (None = desligado)
+# - ROLLUP_PUBLICAR: a execução diária republica os últimos ROLLUP_DIAS_REPUBLICAR dias
+# - ROLLUP_LER: janelas (mês até ontem, dia, semana anterior) cobertas pelo rollup saem dele
+# - ROLLUP_DIALETO: "sqlserver" ou "sqlite" (arquivo ROLLUP_SQLITE_ARQUIVO, para testes)
+# Carga inicial: python daily_rollup.py --de 2026-10-01 --ate 2026-10-20
+ROLLUP_TABELA = None  # ex.: "rbdistrib_Trade.dbo.fatoAderenciaDiariaMerchan"
+ROLLUP_PUBLICAR = False
+ROLLUP_LER = False
+ROLLUP_DIAS_REPUBLICAR = 7
+ROLLUP_DIALETO = "sqlserver"
+ROLLUP_SQLITE_ARQUIVO = "rollup.sqlite"
+
+# Predicados das consultas: "normalizado" (LTRIM/RTRIM/COLLATE em ForaDoRoteiro, feriado por CAST)
+# ou "indexavel": as grafias de ForaDoRoteiro/tipocheckin e os feriados do período são descobertos
+# uma vez por execução e as consultas comparam a coluna direto (IN / faixas de data), usando índice.
+# Comparação num banco sintético: python predicate_benchmark.py
+PREDICADOS_MODO = "normalizado"
+
+# Mensagem do líder de área em áreas grandes (mensagem longa = envio lento e às vezes cortada)
+# - RANKING_COLABORADORES: lista só os N piores e os N melhores do mês; os demais numa linha de resumo
+#   (0 = todos, em ordem alfabética)
+# - MENSAGEM_MAX_CARACTERES: teto da mensagem; quem não couber entra no resumo (None = sem teto)
+RANKING_COLABORADORES = 0
+MENSAGEM_MAX_CARACTERES = None
+
+# Hierarquia da liderança além de área -> líder: nó -> pai (área, líder ou um nó novo, ex.: regional).
+# Quem é pai de alguém aqui recebe o relatório da sua equipe inteira (tipo "lider_org") no lugar do
+# relatório da área; as métricas de todos os nós saem de uma extração só. {} = hierarquia padrão.
+ORG_PAIS = {}
+# Ex.: ORG_PAIS = {"Ana": "Regional Norte", "Caio": "Regional Norte", "Regional Norte": "Trad"}
+
+# Várias empresas no mesmo processo (python main.py --todas-empresas | --empresa NOME)
+# Cada empresa sobrescreve só o que muda: DB_CONFIG, TABLE_*, CHECKIN_VALIDOS, AREAS_ORDEM_PADRAO,
+# GRUPOS_ECONOMICOS_IMPORTANTES, REDES_IMPORTANTES, ROLLUP_TABELA, ORG_PAIS, TELEFONE_DDI_ACEITOS ({} = valores acima). As consultas de cada
+# empresa rodam em paralelo (conexão própria) e as mensagens vão num único lote de envio.
+# Estado separado por empresa: execucoes_<empresa>.json, snapshots_<empresa>, etc.
+# - EMPRESAS_PARALELO: máximo de empresas consultando ao mesmo tempo (None = todas)
+EMPRESAS = {}
+# Ex.:
+# EMPRESAS = {
+#     "rbdistrib": {},
+#     "outra": {
+#         "DB_CONFIG": {"server": "10.0.0.5", "database": "outra_Trade", "username": "...", "password": "...", "driver": "SQL Server"},
+#         "TABLE_AREA_MERCHAN": "outra_Trade.dbo.dimAreaMerchan",
+#         "TABLE_TELEFONE_LIDERANCA": "outra_Trade.dbo.dimTelefoneMerchanLideranca",
+#         "TABLE_FERIADO_MERCHAN": "outra_Trade.dbo.dimFeriadoMerchan",
+#         "AREAS_ORDEM_PADRAO": ["Capital", "Interior"],
+#     },
+# }
+EMPRESAS_PARALELO = None
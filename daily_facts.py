@@ -0,0 +1,217 @@
+"""Fatos diários: uma extração cobrindo vários dias, métricas derivadas em memória.
+
+Usado pelo modo de recuperação (--recuperar): em vez de rodar o plano de métricas
+de cada dia perdido no banco, extrai uma vez os fatos diários do período que cobre
+todas as janelas (dia, mês, semana anterior) e soma as linhas de cada janela.
+
+As linhas devolvidas têm o mesmo formato das consultas de merchan_queries, então
+a montagem das mensagens (metric_plan.montar_mensagens) não muda.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import sargable_predicates
+from metric_plan import Metrica, PlanoMetricas
+from report_builder import AdherenceBatch, AdherenceMetric
+from stage_profiler import etapa
+
+
+FAMILIAS_UNIDADES = {"grupo_rede", "grupos"}
+
+_NAO_IDENTIFICADA = "Não Identificada"
+
+
+def _como_data(v) -> date:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return date.fromisoformat(str(v)[:10])
+
+
+def _int(v) -> int:
+    try:
+        return int(v or 0)
+    except Exception:
+        return 0
+
+
+def _agrupar(linhas, chave) -> dict[object, AdherenceMetric]:
+    return AdherenceBatch.from_rows(linhas, chave).agrupar()
+
+
+class FatosDiarios:
+    """Fatos de [inicio, fim) indexados por dia."""
+
+    def __init__(
+        self,
+        inicio: date,
+        fim: date,
+        visitas: list[dict],
+        unidades: list[dict] | None = None,
+        telefones: dict[str, str] | None = None,
+    ):
+        self.inicio = inicio
+        self.fim = fim
+        self.telefones = telefones or {}
+        self._visitas: dict[date, list[dict]] = defaultdict(list)
+        for r in visitas:
+            area = (r.get("area_merchan") or "").strip() or None
+            self._visitas[_como_data(r["data_visita"])].append(
+                {
+                    "area": area or _NAO_IDENTIFICADA,
+                    "area_mapeada": bool(_int(r.get("area_mapeada"))),
+                    "colaborador": (r.get("colaborador") or "").strip(),
+                    "superior": (r.get("colaborador_superior") or "").strip(),
+                    "visitas_feitas": _int(r.get("visitas_feitas")),
+                    "visitas_planejadas": _int(r.get("visitas_planejadas")),
+                }
+            )
+        self._unidades: dict[date, list[dict]] = defaultdict(list)
+        for r in unidades or []:
+            self._unidades[_como_data(r["data_visita"])].append(
+                {
+                    "tipo": (r.get("tipo_unidade") or "").strip(),
+                    "unidade": (r.get("unidade") or "").strip(),
+                    "visitas_feitas": _int(r.get("visitas_feitas")),
+                    "visitas_planejadas": _int(r.get("visitas_planejadas")),
+                }
+            )
+
+    @staticmethod
+    def _periodo(indice: dict[date, list[dict]], ini: date, fim: date):
+        d = ini
+        while d < fim:
+            yield from indice.get(d, ())
+            d += timedelta(days=1)
+
+    def visitas(self, ini: date, fim: date):
+        if ini < self.inicio or fim > self.fim:
+            raise ValueError(f"Período {ini} a {fim} fora da extração ({self.inicio} a {self.fim})")
+        return self._periodo(self._visitas, ini, fim)
+
+    def unidades(self, ini: date, fim: date):
+        return self._periodo(self._unidades, ini, fim)
+
+    # ------------------------------------------------------------------
+    # Uma função por família de métrica (mesmas colunas/ordem das consultas)
+    # ------------------------------------------------------------------
+    def geral(self, ini: date, fim: date) -> list[dict]:
+        return [AdherenceBatch.from_rows(self.visitas(ini, fim)).total().como_linha()]
+
+    def areas(self, ini: date, fim: date) -> list[dict]:
+        soma = _agrupar(self.visitas(ini, fim), lambda r: r["area"])
+        return [m.como_linha(area_merchan=a) for a, m in sorted(soma.items())]
+
+    def area(self, nome: str, ini: date, fim: date) -> list[dict]:
+        alvo = nome.strip().casefold()
+        soma = _agrupar((r for r in self.visitas(ini, fim) if r["area"].casefold() == alvo), lambda r: r["area"])
+        return [m.como_linha(area_merchan=a) for a, m in soma.items()]
+
+    def colaboradores(self, nome: str, ini: date, fim: date) -> list[dict]:
+        alvo = nome.strip().casefold()
+        linhas = (r for r in self.visitas(ini, fim) if r["area_mapeada"] and r["area"].casefold() == alvo)
+        return [m.como_linha(colaborador=c) for c, m in _agrupar(linhas, lambda r: r["colaborador"]).items()]
+
+    def promotores(self, dia_ini: date, dia_fim: date, ini: date, fim: date) -> list[dict]:
+        mes = _agrupar(self.visitas(ini, fim), lambda r: r["colaborador"])
+        dia = _agrupar(self.visitas(dia_ini, dia_fim), lambda r: r["colaborador"])
+        saida = []
+        for colaborador in sorted(mes):
+            m_dia = dia.get(colaborador, AdherenceMetric())
+            linha = mes[colaborador].como_linha(colaborador=colaborador, telefone=self.telefones.get(colaborador))
+            linha["visitas_feitas_dia"] = m_dia.visitas_feitas
+            linha["visitas_planejadas_dia"] = m_dia.visitas_planejadas
+            saida.append(linha)
+        return saida
+
+    def _unidades_importantes(self, tipos: set[str], ini: date, fim: date) -> list[dict]:
+        linhas = (r for r in self.unidades(ini, fim) if r["tipo"] in tipos)
+        soma = _agrupar(linhas, lambda r: r["unidade"])
+        saida = [m.como_linha(unidade=u) for u, m in soma.items()]
+        saida.sort(key=lambda r: r["visitas_planejadas"], reverse=True)
+        return saida
+
+    def grupo_rede(self, ini: date, fim: date) -> list[dict]:
+        return self._unidades_importantes({"grupo", "rede"}, ini, fim)
+
+    def grupos(self, ini: date, fim: date) -> list[dict]:
+        return self._unidades_importantes({"grupo"}, ini, fim)
+
+    def resultado(self, m: Metrica, plano: PlanoMetricas) -> list[dict]:
+        ctx = plano.ctx
+        ini, fim = ctx.janela(m.janela)
+        if m.familia == "moveis":
+            from rolling_window import janelas_de_fatos
+
+            return janelas_de_fatos(self, ctx.ref)
+        if m.familia == "org":
+            from org_tree import linhas_de_fatos
+
+            return linhas_de_fatos(self, ctx)
+        fn = getattr(self, m.familia)
+        if m.familia == "promotores":
+            return fn(ctx.dt_start, ctx.dt_end, ini, fim)
+        if m.area is not None:
+            return fn(m.area, ini, fim)
+        return fn(ini, fim)
+
+
+def _periodo_metrica(m: Metrica, plano: PlanoMetricas) -> tuple[date, date]:
+    if m.familia == "moveis":
+        from rolling_window import JANELAS_MOVEIS, dias_de_historico
+
+        ref = plano.ctx.ref
+        return ref - timedelta(days=dias_de_historico(max(JANELAS_MOVEIS))), ref + timedelta(days=1)
+    if m.familia == "org":
+        from org_tree import periodo_org
+
+        return periodo_org(plano.ctx)
+    return plano.ctx.janela(m.janela)
+
+
+def periodo_total(planos: list[PlanoMetricas]) -> tuple[date, date] | None:
+    """União (envoltória) de todas as janelas de todos os planos."""
+    periodos = [_periodo_metrica(m, plano) for plano in planos for m in plano.metricas]
+    periodos += [(plano.ctx.dt_start, plano.ctx.dt_end) for plano in planos if plano.metricas]
+    if not periodos:
+        return None
+    return min(p[0] for p in periodos), max(p[1] for p in periodos)
+
+
+def extrair_fatos(db, planos: list[PlanoMetricas]) -> FatosDiarios | None:
+    """Uma extração para todos os planos: visitas (+ unidades/telefones se algum plano precisar)."""
+    import merchan_queries
+
+    periodo = periodo_total(planos)
+    if periodo is None:
+        return None
+    inicio, fim = periodo
+    familias = {m.familia for plano in planos for m in plano.metricas}
+
+    with etapa("fatos;predicados"):
+        sargable_predicates.preparar(db, inicio, fim)
+    with etapa("fatos;visitas"):
+        visitas = db.query_rows(merchan_queries.daily_visit_facts_sql(inicio, fim))
+    unidades = None
+    if familias & FAMILIAS_UNIDADES:
+        with etapa("fatos;unidades"):
+            unidades = db.query_rows(
+                merchan_queries.unidades_importantes_sql(inicio, fim, por_dia=True)
+            )
+    telefones = None
+    if "promotores" in familias:
+        with etapa("fatos;telefones"):
+            telefones = {
+                (r.get("colaborador") or "").strip(): r.get("telefone")
+                for r in db.query_rows(merchan_queries.promoter_phones_sql())
+            }
+    print(f"📦 Fatos diários de {inicio.isoformat()} a {(fim - timedelta(days=1)).isoformat()}: {len(visitas)} linhas")
+    return FatosDiarios(inicio, fim, visitas, unidades, telefones)
+
+
+def resultados_de_fatos(plano: PlanoMetricas, fatos: FatosDiarios) -> dict[Metrica, list[dict]]:
+    return {m: fatos.resultado(m, plano) for m in plano.metricas}
@@ -0,0 +1,359 @@
+"""Rollup diário: os fatos de aderência publicados numa tabela do warehouse (MERGE).
+
+Em vez de cada consumidor (este relatório, Power BI) recalcular a partir das
+visitas brutas, a execução publica os fatos diários em ROLLUP_TABELA:
+
+- tipo "visita": dia x área x superior x colaborador (mesmas regras das consultas);
+- tipo "grupo"/"rede": dia x unidade importante;
+- tipo "dia": total do dia, uma linha por dia publicado (também em feriados) — é
+  o que diz quais dias o rollup cobre.
+
+A cada execução são republicados os últimos ROLLUP_DIAS_REPUBLICAR dias até a
+referência (corrige check-ins lançados com atraso e cobre o domingo). A escrita é
+um MERGE por chave; linhas que sumiram da origem nos dias republicados são apagadas.
+
+Com ROLLUP_LER, as métricas áreas/área/colaboradores/grupos/redes cujas janelas o
+rollup cobre inteiras (mês até ontem, dia, semana anterior) saem de uma leitura do
+rollup em vez das consultas sobre Monitoramento_Promotor. Janela com algum dia
+faltando: consulta normal. O geral fica sempre na própria consulta (sem a junção com
+dimAreaMerchan), como na execução sem rollup.
+
+ROLLUP_DIALETO = "sqlite" grava/lê num arquivo SQLite (ROLLUP_SQLITE_ARQUIVO)
+no lugar do warehouse, para testar sem tocar no banco.
+
+Carga inicial / reprocessamento:
+    python daily_rollup.py --de 2026-10-01 --ate 2026-10-20
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import config
+import run_deadline
+import sargable_predicates
+import tenants
+from stage_profiler import etapa
+
+
+ROLLUP_TABELA = getattr(config, "ROLLUP_TABELA", None)
+ROLLUP_PUBLICAR = getattr(config, "ROLLUP_PUBLICAR", False)
+ROLLUP_LER = getattr(config, "ROLLUP_LER", False)
+ROLLUP_DIAS_REPUBLICAR = max(1, int(getattr(config, "ROLLUP_DIAS_REPUBLICAR", 7)))
+ROLLUP_DIALETO = getattr(config, "ROLLUP_DIALETO", "sqlserver")
+ROLLUP_SQLITE_ARQUIVO = getattr(config, "ROLLUP_SQLITE_ARQUIVO", "rollup.sqlite")
+
+# Famílias que o rollup responde (mesmas funções de daily_facts.FatosDiarios); o geral não:
+# as linhas do rollup passaram pela junção com dimAreaMerchan (overall_adherence_sql não)
+FAMILIAS_ROLLUP = {"areas", "area", "colaboradores", "grupo_rede", "grupos"}
+
+COLUNAS_CHAVE = ("data_visita", "tipo", "area_merchan", "colaborador_superior", "colaborador", "unidade")
+COLUNAS = COLUNAS_CHAVE + ("area_mapeada", "visitas_feitas", "visitas_planejadas")
+
+
+def _texto(v) -> str:
+    return (v or "").strip()
+
+
+def _como_data(v) -> date:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return date.fromisoformat(str(v)[:10])
+
+
+def linhas_rollup(ini: date, fim: date, visitas: list[dict], unidades: list[dict]) -> list[tuple]:
+    """Linhas da origem -> tuplas na ordem de COLUNAS (chave sem NULL: '' no lugar)."""
+    soma: dict[tuple, list[int]] = defaultdict(lambda: [0, 0, 0])
+    dias: dict[date, list[int]] = {}
+    d = ini
+    while d < fim:
+        dias[d] = [0, 0]
+        d += timedelta(days=1)
+
+    for r in visitas:
+        dia = _como_data(r["data_visita"])
+        chave = (dia, "visita", _texto(r.get("area_merchan")), _texto(r.get("colaborador_superior")), _texto(r.get("colaborador")), "")
+        acc = soma[chave]
+        acc[0] = 1 if r.get("area_mapeada") else 0
+        acc[1] += int(r.get("visitas_feitas") or 0)
+        acc[2] += int(r.get("visitas_planejadas") or 0)
+        total = dias.setdefault(dia, [0, 0])
+        total[0] += int(r.get("visitas_feitas") or 0)
+        total[1] += int(r.get("visitas_planejadas") or 0)
+    for r in unidades:
+        chave = (_como_data(r["data_visita"]), _texto(r.get("tipo_unidade")), "", "", "", _texto(r.get("unidade")))
+        acc = soma[chave]
+        acc[1] += int(r.get("visitas_feitas") or 0)
+        acc[2] += int(r.get("visitas_planejadas") or 0)
+    for dia, (feitas, planejadas) in dias.items():
+        soma[(dia, "dia", "", "", "", "")] = [0, feitas, planejadas]
+
+    return [
+        (chave[0].isoformat(), *chave[1:], mapeada, feitas, planejadas)
+        for chave, (mapeada, feitas, planejadas) in sorted(soma.items())
+    ]
+
+
+def leitura_sql(tabela: str, ini: date, fim: date) -> str:
+    return f"""
+SELECT
+    data_visita,
+    tipo,
+    area_merchan,
+    area_mapeada,
+    colaborador,
+    unidade,
+    SUM(visitas_feitas) AS visitas_feitas,
+    SUM(visitas_planejadas) AS visitas_planejadas
+FROM {tabela}
+WHERE data_visita >= '{ini.isoformat()}'
+  AND data_visita < '{fim.isoformat()}'
+GROUP BY data_visita, tipo, area_merchan, area_mapeada, colaborador, unidade
+""".strip()
+
+
+# ----------------------------------------------------------------------
+# Destinos: warehouse (SQL Server, MERGE) ou SQLite (upsert)
+# ----------------------------------------------------------------------
+class RollupSqlServer:
+    def __init__(self, db, tabela: str):
+        self.db = db
+        self.tabela = tabela
+
+    def criar_tabela_sql(self) -> str:
+        return f"""
+IF OBJECT_ID(N'{self.tabela}', N'U') IS NULL
+CREATE TABLE {self.tabela} (
+    data_visita DATE NOT NULL,
+    tipo VARCHAR(10) NOT NULL,
+    area_merchan NVARCHAR(200) NOT NULL,
+    colaborador_superior NVARCHAR(200) NOT NULL,
+    colaborador NVARCHAR(200) NOT NULL,
+    unidade NVARCHAR(200) NOT NULL,
+    area_mapeada BIT NOT NULL,
+    visitas_feitas INT NOT NULL,
+    visitas_planejadas INT NOT NULL,
+    publicado_em DATETIME2 NOT NULL DEFAULT SYSDATETIME(),
+    PRIMARY KEY ({", ".join(COLUNAS_CHAVE)})
+)
+""".strip()
+
+    def merge_sql(self) -> str:
+        igual = " AND ".join(f"t.{c} = s.{c}" for c in COLUNAS_CHAVE)
+        return f"""
+MERGE {self.tabela} AS t
+USING #rollup AS s
+    ON {igual}
+WHEN MATCHED AND (
+    t.area_mapeada <> s.area_mapeada
+    OR t.visitas_feitas <> s.visitas_feitas
+    OR t.visitas_planejadas <> s.visitas_planejadas
+) THEN UPDATE SET
+    area_mapeada = s.area_mapeada,
+    visitas_feitas = s.visitas_feitas,
+    visitas_planejadas = s.visitas_planejadas,
+    publicado_em = SYSDATETIME()
+WHEN NOT MATCHED BY TARGET THEN
+    INSERT ({", ".join(COLUNAS)})
+    VALUES ({", ".join(f"s.{c}" for c in COLUNAS)})
+WHEN NOT MATCHED BY SOURCE AND t.data_visita >= ? AND t.data_visita < ? THEN
+    DELETE;
+""".strip()
+
+    def gravar(self, ini: date, fim: date, linhas: list[tuple]) -> None:
+        self.db.escrever(
+            [
+                (self.criar_tabela_sql(), None),
+                ("IF OBJECT_ID('tempdb..#rollup') IS NOT NULL DROP TABLE #rollup", None),
+                (f"SELECT TOP 0 {', '.join(COLUNAS)} INTO #rollup FROM {self.tabela}", None),
+                (f"INSERT INTO #rollup ({', '.join(COLUNAS)}) VALUES ({', '.join('?' * len(COLUNAS))})", linhas),
+                (self.merge_sql(), (ini.isoformat(), fim.isoformat())),
+                ("DROP TABLE #rollup", None),
+            ]
+        )
+
+    def ler(self, ini: date, fim: date) -> list[dict]:
+        return self.db.query_rows(leitura_sql(self.tabela, ini, fim))
+
+
+class RollupSqlite:
+    def __init__(self, arquivo: str, tabela: str):
+        self.arquivo = arquivo
+        # "banco.dbo.tabela" -> "tabela"
+        self.tabela = tabela.split(".")[-1]
+
+    def criar_tabela_sql(self) -> str:
+        return f"""
+CREATE TABLE IF NOT EXISTS {self.tabela} (
+    data_visita TEXT NOT NULL,
+    tipo TEXT NOT NULL,
+    area_merchan TEXT NOT NULL,
+    colaborador_superior TEXT NOT NULL,
+    colaborador TEXT NOT NULL,
+    unidade TEXT NOT NULL,
+    area_mapeada INTEGER NOT NULL,
+    visitas_feitas INTEGER NOT NULL,
+    visitas_planejadas INTEGER NOT NULL,
+    publicado_em TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY ({", ".join(COLUNAS_CHAVE)})
+)
+""".strip()
+
+    def upsert_sql(self) -> str:
+        return f"""
+INSERT INTO {self.tabela} ({", ".join(COLUNAS)}, publicado_em)
+VALUES ({", ".join("?" * len(COLUNAS))}, ?)
+ON CONFLICT ({", ".join(COLUNAS_CHAVE)}) DO UPDATE SET
+    area_mapeada = excluded.area_mapeada,
+    visitas_feitas = excluded.visitas_feitas,
+    visitas_planejadas = excluded.visitas_planejadas,
+    publicado_em = excluded.publicado_em
+""".strip()
+
+    def gravar(self, ini: date, fim: date, linhas: list[tuple]) -> None:
+        carimbo = datetime.now().isoformat(timespec="microseconds")
+        conn = sqlite3.connect(self.arquivo)
+        try:
+            with conn:
+                conn.execute(self.criar_tabela_sql())
+                conn.executemany(self.upsert_sql(), [linha + (carimbo,) for linha in linhas])
+                # Linhas dos dias republicados que não vieram desta vez (o NOT MATCHED BY SOURCE do MERGE)
+                conn.execute(
+                    f"DELETE FROM {self.tabela} WHERE data_visita >= ? AND data_visita < ? AND publicado_em <> ?",
+                    (ini.isoformat(), fim.isoformat(), carimbo),
+                )
+        finally:
+            conn.close()
+
+    def ler(self, ini: date, fim: date) -> list[dict]:
+        conn = sqlite3.connect(self.arquivo)
+        conn.row_factory = sqlite3.Row
+        try:
+            return [dict(r) for r in conn.execute(leitura_sql(self.tabela, ini, fim))]
+        finally:
+            conn.close()
+
+
+def tabela_rollup() -> str | None:
+    return tenants.valor("ROLLUP_TABELA", ROLLUP_TABELA)
+
+
+def destino(db):
+    tabela = tabela_rollup()
+    if ROLLUP_DIALETO == "sqlite":
+        return RollupSqlite(tenants.arquivo_da_empresa(ROLLUP_SQLITE_ARQUIVO), tabela)
+    return RollupSqlServer(db, tabela)
+
+
+# ----------------------------------------------------------------------
+# Publicação
+# ----------------------------------------------------------------------
+def publicar(db, ini: date, fim: date) -> int:
+    """Extrai os fatos de [ini, fim) da origem e faz o MERGE no rollup; devolve o nº de linhas."""
+    import merchan_queries
+
+    with etapa("rollup;extracao"):
+        sargable_predicates.preparar(db, ini, fim)
+        visitas = db.query_rows(merchan_queries.daily_visit_facts_sql(ini, fim))
+        unidades = db.query_rows(merchan_queries.unidades_importantes_sql(ini, fim, por_dia=True))
+    linhas = linhas_rollup(ini, fim, visitas, unidades)
+    with etapa("rollup;merge"):
+        destino(db).gravar(ini, fim, linhas)
+    print(
+        f"📤 Rollup {tabela_rollup()}: {len(linhas)} linhas de {ini.strftime('%d/%m')} "
+        f"a {(fim - timedelta(days=1)).strftime('%d/%m')}"
+    )
+    return len(linhas)
+
+
+def publicar_recentes(db, ref: date) -> None:
+    """Etapa da execução diária: republica os últimos dias até a referência (falha = só aviso)."""
+    if not (ROLLUP_PUBLICAR and tabela_rollup()):
+        return
+    try:
+        publicar(db, ref - timedelta(days=ROLLUP_DIAS_REPUBLICAR - 1), ref + timedelta(days=1))
+    except run_deadline.PrazoEstourado:
+        raise
+    except Exception as e:
+        print(f"⚠ Rollup não publicado: {e}")
+
+
+# ----------------------------------------------------------------------
+# Leitura pelo plano de métricas
+# ----------------------------------------------------------------------
+def resultados_do_rollup(plano, db, metricas: list) -> dict:
+    """Métricas do plano que o rollup cobre -> linhas (mesmo formato das consultas)."""
+    if not (ROLLUP_LER and tabela_rollup()):
+        return {}
+    candidatas = [m for m in metricas if m.familia in FAMILIAS_ROLLUP]
+    if not candidatas:
+        return {}
+    janelas = {m: plano.ctx.janela(m.janela) for m in candidatas}
+    ini = min(j[0] for j in janelas.values())
+    fim = max(j[1] for j in janelas.values())
+
+    try:
+        with etapa("rollup;leitura"):
+            rows = destino(db).ler(ini, fim)
+    except run_deadline.PrazoEstourado:
+        raise
+    except Exception as e:
+        print(f"⚠ Rollup indisponível; usando as consultas completas: {e}")
+        return {}
+
+    from daily_facts import FatosDiarios
+
+    cobertos: set[date] = set()
+    visitas: list[dict] = []
+    unidades: list[dict] = []
+    for r in rows:
+        tipo = r["tipo"]
+        if tipo == "dia":
+            cobertos.add(_como_data(r["data_visita"]))
+        elif tipo == "visita":
+            visitas.append(r)
+        else:
+            unidades.append({**r, "tipo_unidade": tipo})
+    fatos = FatosDiarios(ini, fim, visitas, unidades)
+
+    resultados = {}
+    for m, (a, b) in janelas.items():
+        if all(a + timedelta(days=k) in cobertos for k in range((b - a).days)):
+            resultados[m] = fatos.resultado(m, plano)
+    print(f"📦 Rollup: {len(resultados)} de {len(candidatas)} métricas lidas de {tabela_rollup()}")
+    return resultados
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Publica o rollup diário de aderência")
+    parser.add_argument("--de", type=str, required=True, help="Primeiro dia (YYYY-MM-DD)")
+    parser.add_argument("--ate", type=str, required=True, help="Último dia, inclusive (YYYY-MM-DD)")
+    parser.add_argument("--empresa", type=str, default=None, help="Empresa de EMPRESAS no config")
+    args = parser.parse_args()
+
+    if args.empresa:
+        erros = tenants.validar([args.empresa])
+        if erros:
+            print(f"ERRO: {erros[0]}")
+            return 1
+    with tenants.usar_empresa(args.empresa):
+        if not tabela_rollup():
+            print("ERRO: ROLLUP_TABELA não configurada.")
+            return 1
+        from database import Database
+
+        db = Database()
+        try:
+            publicar(db, date.fromisoformat(args.de), date.fromisoformat(args.ate) + timedelta(days=1))
+        finally:
+            db.disconnect()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,29 +1,139 @@
-"""Módulo para conexão e execução de queries no SQL Server."""
+"""Módulo para conexão e execução de queries no SQL Server.
+
+Consultas são leituras (SELECT) e, portanto, idempotentes: em erro transitório
+(conexão caiu, timeout, deadlock) a conexão é descartada e a consulta é refeita
+com espera exponencial com jitter, até DB_TENTATIVAS. Falhas seguidas abrem o
+disjuntor (um por servidor/banco, compartilhado no processo): durante DB_DISJUNTOR_PAUSA as consultas
+falham na hora em vez de esperar o timeout de novo. Com prazo de execução ativo
+(run_deadline), o timeout de cada consulta é limitado ao tempo que falta.
+
+Escritas (`escrever`, ex.: MERGE do rollup diário) passam pelo mesmo laço: só
+comandos idempotentes, numa transação que é desfeita em erro.
+"""
 
 from __future__ import annotations
 
-from datetime import date
+import math
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
 
 import pyodbc
 
-from config import DB_CONFIG
+import config
+import run_deadline
+import tenants
+
+
+DB_TIMEOUT_CONEXAO = getattr(config, "DB_TIMEOUT_CONEXAO", 15)
+DB_TIMEOUT_CONSULTA = getattr(config, "DB_TIMEOUT_CONSULTA", 300)
+DB_TENTATIVAS = max(1, int(getattr(config, "DB_TENTATIVAS", 3)))
+DB_BACKOFF_BASE = getattr(config, "DB_BACKOFF_BASE", 2.0)
+DB_BACKOFF_MAX = getattr(config, "DB_BACKOFF_MAX", 30.0)
+DB_DISJUNTOR_FALHAS = getattr(config, "DB_DISJUNTOR_FALHAS", 5)
+DB_DISJUNTOR_PAUSA = getattr(config, "DB_DISJUNTOR_PAUSA", 120)
+
+# Conexão recusada/caída, timeout de login/consulta, deadlock
+SQLSTATES_TRANSITORIOS = {"08001", "08S01", "08003", "08004", "HYT00", "HYT01", "40001"}
+SQLSTATES_TIMEOUT = {"HYT00", "HYT01"}
+
+
+class BancoIndisponivel(RuntimeError):
+    pass
+
+
+def _sqlstate(e: Exception) -> str:
+    return e.args[0] if e.args and isinstance(e.args[0], str) else ""
+
+
+def erro_transitorio(e: Exception) -> bool:
+    return isinstance(e, pyodbc.OperationalError) or _sqlstate(e) in SQLSTATES_TRANSITORIOS
+
+
+def espera_backoff(tentativa: int) -> float:
+    """Exponencial (base * 2^(n-1), até DB_BACKOFF_MAX) com jitter: metade fixa, metade sorteada."""
+    teto = min(DB_BACKOFF_MAX, DB_BACKOFF_BASE * 2 ** (tentativa - 1))
+    return random.uniform(teto / 2, teto)
+
+
+class Disjuntor:
+    def __init__(self, limite: int, pausa: float, nome: str = "banco"):
+        self.nome = nome
+        self.limite = limite
+        self.pausa = pausa
+        self.falhas = 0
+        self.aberto_ate: float | None = None
+        self._lock = threading.Lock()
+
+    def permitir(self) -> None:
+        """Fechado ou meio-aberto (pausa vencida): segue; aberto: BancoIndisponivel."""
+        with self._lock:
+            if self.aberto_ate is None:
+                return
+            falta = self.aberto_ate - time.monotonic()
+        if falta > 0:
+            ate = datetime.now() + timedelta(seconds=falta)
+            raise BancoIndisponivel(
+                f"Banco indisponível ({self.nome}): {self.falhas} falhas seguidas; nova tentativa a partir de {ate:%H:%M:%S}"
+            )
+
+    def sucesso(self) -> None:
+        with self._lock:
+            self.falhas = 0
+            self.aberto_ate = None
+
+    def falha(self) -> None:
+        with self._lock:
+            self.falhas += 1
+            # Meio-aberto que falhou volta a abrir; fechado abre ao atingir o limite
+            if self.limite and (self.aberto_ate is not None or self.falhas >= self.limite):
+                self.aberto_ate = time.monotonic() + self.pausa
+                print(f"⚠ Disjuntor do banco {self.nome} aberto por {self.pausa:.0f}s ({self.falhas} falhas seguidas)")
+
+
+_DISJUNTORES: dict[tuple[str, str], Disjuntor] = {}
+_LOCK_DISJUNTORES = threading.Lock()
+
+
+def disjuntor_do_banco(db_config: dict) -> Disjuntor:
+    chave = (str(db_config.get("server")), str(db_config.get("database")))
+    with _LOCK_DISJUNTORES:
+        if chave not in _DISJUNTORES:
+            _DISJUNTORES[chave] = Disjuntor(DB_DISJUNTOR_FALHAS, DB_DISJUNTOR_PAUSA, nome="/".join(chave))
+        return _DISJUNTORES[chave]
+
+
+def _limitar_ao_prazo(timeout: float) -> int:
+    """Timeout em segundos inteiros (0 = sem limite no pyodbc), nunca além do prazo da execução."""
+    restante = run_deadline.restante()
+    if restante is not None:
+        teto = max(1, math.ceil(restante))
+        timeout = min(timeout, teto) if timeout else teto
+    return int(math.ceil(timeout or 0))
 
 
 class Database:
-    def __init__(self) -> None:
+    def __init__(self, db_config: dict | None = None) -> None:
+        # Sem db_config: o DB_CONFIG da empresa ativa (tenants) ou o do config
+        db_config = db_config or tenants.valor("DB_CONFIG")
         self.connection_string = (
-            f"DRIVER={{{DB_CONFIG['driver']}}};"
-            f"SERVER={DB_CONFIG['server']};"
-            f"DATABASE={DB_CONFIG['database']};"
-            f"UID={DB_CONFIG['username']};"
-            f"PWD={DB_CONFIG['password']}"
+            f"DRIVER={{{db_config['driver']}}};"
+            f"SERVER={db_config['server']};"
+            f"DATABASE={db_config['database']};"
+            f"UID={db_config['username']};"
+            f"PWD={db_config['password']}"
         )
         self.conn: pyodbc.Connection | None = None
+        self.disjuntor = disjuntor_do_banco(db_config)
+
+    def _conectar(self) -> None:
+        self.conn = pyodbc.connect(self.connection_string, timeout=_limitar_ao_prazo(DB_TIMEOUT_CONEXAO))
+        print("OK: Conectado ao banco de dados")
 
     def connect(self) -> bool:
         try:
-            self.conn = pyodbc.connect(self.connection_string)
-            print("OK: Conectado ao banco de dados")
+            self._conectar()
             return True
         except Exception as e:
             print(f"ERRO: Falha ao conectar ao banco: {e}")
@@ -35,12 +145,18 @@ class Database:
             self.conn = None
             print("OK: Conexao fechada")
 
-    def query_rows(self, sql: str) -> list[dict]:
-        if self.conn is None:
-            ok = self.connect()
-            if not ok:
-                raise RuntimeError("Não foi possível conectar ao banco")
+    def _descartar_conexao(self) -> None:
+        if self.conn is not None:
+            try:
+                self.conn.close()
+            except Exception:
+                pass
+            self.conn = None
 
+    def _executar(self, sql: str) -> list[dict]:
+        if self.conn is None:
+            self._conectar()
+        self.conn.timeout = _limitar_ao_prazo(DB_TIMEOUT_CONSULTA)
         cur = self.conn.cursor()
         cur.execute(sql)
         cols = [c[0] for c in cur.description] if cur.description else []
@@ -50,6 +166,65 @@ class Database:
             result.append({cols[i]: r[i] for i in range(len(cols))})
         return result
 
+    def _escrever(self, passos: list[tuple[str, object]]) -> None:
+        if self.conn is None:
+            self._conectar()
+        self.conn.timeout = _limitar_ao_prazo(DB_TIMEOUT_CONSULTA)
+        cur = self.conn.cursor()
+        try:
+            for sql, params in passos:
+                if isinstance(params, list):
+                    if params:
+                        cur.fast_executemany = True
+                        cur.executemany(sql, params)
+                elif params is None:
+                    cur.execute(sql)
+                else:
+                    cur.execute(sql, params)
+            self.conn.commit()
+        except Exception:
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
+            raise
+
+    def _com_tentativas(self, executar):
+        for tentativa in range(1, DB_TENTATIVAS + 1):
+            onde = f"consulta em {run_deadline.etapa_atual()}"
+            run_deadline.verificar(onde)
+            self.disjuntor.permitir()
+            try:
+                resultado = executar()
+            except pyodbc.Error as e:
+                if not erro_transitorio(e):
+                    raise
+                self.disjuntor.falha()
+                self._descartar_conexao()
+                restante = run_deadline.restante()
+                if restante is not None and (restante <= 0 or (_sqlstate(e) in SQLSTATES_TIMEOUT and restante < 1)):
+                    raise run_deadline.estourar(onde) from e
+                if tentativa == DB_TENTATIVAS:
+                    raise RuntimeError(f"{onde} falhou após {tentativa} tentativa(s): {e}") from e
+                espera = espera_backoff(tentativa)
+                if restante is not None:
+                    espera = min(espera, max(0.0, restante))
+                print(f"⚠ Banco: {e} — nova tentativa ({tentativa + 1}/{DB_TENTATIVAS}) em {espera:.1f}s")
+                time.sleep(espera)
+                continue
+            self.disjuntor.sucesso()
+            return resultado
+
+    def query_rows(self, sql: str) -> list[dict]:
+        return self._com_tentativas(lambda: self._executar(sql))
+
+    def escrever(self, passos: list[tuple[str, object]]) -> None:
+        """Executa (sql, parâmetros) em ordem numa transação; parâmetros em lista = executemany.
+
+        Refeita do início em erro transitório: use só comandos idempotentes (MERGE, DELETE/INSERT do período).
+        """
+        self._com_tentativas(lambda: self._escrever(passos))
+
 
 def sql_date(d: date) -> str:
     return d.strftime("%Y-%m-%d")
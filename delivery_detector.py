@@ -0,0 +1,305 @@
+"""Confirmação de envio pela tela, no lugar da espera fixa pós-envio.
+
+Após o ENTER, capturamos periodicamente duas regiões da tela:
+- a caixa de digitação (precisa estar vazia: o texto saiu);
+- o canto da última bolha enviada (precisa mostrar o marcador de enviado/entregue/lido).
+
+Assim que as duas condições valem e a tela mudou desde antes do ENTER (captura
+de base em `registrar_antes`), o envio está confirmado; se o tempo limite estourar,
+o envio é tratado como falha (com o motivo). Sem a base, a bolha anterior da
+conversa (já com o seu ✓) confirmaria um envio que não aconteceu.
+
+As funções de análise recebem imagens PIL, então podem ser testadas com
+capturas gravadas (ver `--calibrar`), sem WhatsApp aberto.
+
+Referências (PNG) esperadas em WA_CONFIRMACAO_REFERENCIAS_DIR:
+- caixa_vazia.png            caixa de digitação vazia
+- enviado.png / entregue.png / lido.png   recortes dos marcadores
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from dataclasses import dataclass
+
+
+# Cores aproximadas dos "checks" do WhatsApp Web (tema claro e escuro)
+COR_LIDO = (83, 189, 235)
+CORES_ENVIADO = ((134, 150, 160), (102, 119, 129))
+
+MARCADORES_ACEITOS = ("enviado", "entregue", "lido")
+
+
+def _rgb(img):
+    return img.convert("RGB") if getattr(img, "mode", "RGB") != "RGB" else img
+
+
+def _pixels(img) -> list[tuple[int, int, int]]:
+    return list(_rgb(img).getdata())
+
+
+def _distancia(c1, c2) -> int:
+    return abs(c1[0] - c2[0]) + abs(c1[1] - c2[1]) + abs(c1[2] - c2[2])
+
+
+def proporcao_cor(img, cor, tolerancia: int = 60) -> float:
+    pixels = _pixels(img)
+    if not pixels:
+        return 0.0
+    return sum(1 for p in pixels if _distancia(p, cor) <= tolerancia) / len(pixels)
+
+
+def _cor_dominante(pixels):
+    contagem: dict[tuple[int, int, int], int] = {}
+    for p in pixels:
+        contagem[p] = contagem.get(p, 0) + 1
+    return max(contagem, key=contagem.get)
+
+
+def proporcao_diferente(img_a, img_b, limiar: int = 90) -> float:
+    """Fração de pixels que diferem (soma RGB > limiar) entre duas imagens do mesmo tamanho."""
+    if img_a.size != img_b.size:
+        img_b = _rgb(img_b).resize(img_a.size)
+    pa = _pixels(img_a)
+    pb = _pixels(img_b)
+    if not pa:
+        return 0.0
+    return sum(1 for a, b in zip(pa, pb) if _distancia(a, b) > limiar) / len(pa)
+
+
+def contem_referencia(img, referencia, tolerancia: float = 60.0) -> bool:
+    """Procura `referencia` dentro de `img` (janela deslizante).
+
+    Só os pixels de "desenho" da referência (diferentes da cor de fundo dela) entram
+    na comparação; assim um recorte quase todo de fundo não casa com qualquer bolha.
+    """
+    img = _rgb(img)
+    referencia = _rgb(referencia)
+    w, h = img.size
+    rw, rh = referencia.size
+    if rw > w or rh > h:
+        return False
+    ref_px = _pixels(referencia)
+    fundo = _cor_dominante(ref_px)
+    desenho = [(i // rw, i % rw, p) for i, p in enumerate(ref_px) if _distancia(p, fundo) > 90]
+    if not desenho:
+        return False
+    img_px = _pixels(img)
+    limite = tolerancia * len(desenho)
+    for y in range(0, h - rh + 1):
+        for x in range(0, w - rw + 1):
+            total = 0
+            for dy, dx, p in desenho:
+                total += _distancia(img_px[(y + dy) * w + x + dx], p)
+                if total > limite:
+                    break
+            if total <= limite:
+                return True
+    return False
+
+
+def caixa_vazia(img, referencia=None, proporcao_max: float = 0.005) -> bool:
+    """True se a caixa de digitação estiver vazia.
+
+    Com referência gravada: quase nenhum pixel pode diferir da caixa vazia.
+    Sem referência: quase nenhum pixel pode contrastar com a cor de fundo.
+    """
+    if referencia is not None:
+        return proporcao_diferente(img, referencia) <= proporcao_max
+
+    pixels = _pixels(img)
+    if not pixels:
+        return True
+    fundo = _cor_dominante(pixels)
+    contraste = sum(1 for p in pixels if _distancia(p, fundo) > 200)
+    return contraste / len(pixels) <= proporcao_max
+
+
+def marcador_ultima_bolha(img, referencias: dict | None = None, proporcao_min: float = 0.01) -> str | None:
+    """Identifica o marcador de status da última bolha ("lido", "entregue", "enviado") ou None."""
+    if referencias:
+        # Ordem: o estado mais avançado primeiro
+        for nome in ("lido", "entregue", "enviado"):
+            ref = referencias.get(nome)
+            if ref is not None and contem_referencia(img, ref):
+                return nome
+        return None
+
+    if proporcao_cor(img, COR_LIDO) >= proporcao_min:
+        return "lido"
+    for cor in CORES_ENVIADO:
+        if proporcao_cor(img, cor, tolerancia=30) >= proporcao_min:
+            return "enviado"
+    return None
+
+
+def tela_mudou(antes, depois, referencia_caixa=None, proporcao_min: float = 0.003) -> bool:
+    """(caixa, bolha) antes do ENTER x agora: apareceu bolha nova ou o texto saiu da caixa.
+
+    Duas mensagens seguidas para o mesmo número no mesmo minuto podem deixar o canto
+    da bolha idêntico; nesse caso vale a caixa, que tinha o texto e esvaziou.
+    """
+    caixa_antes, bolha_antes = antes
+    caixa_agora, bolha_agora = depois
+    if proporcao_diferente(bolha_antes, bolha_agora) >= proporcao_min:
+        return True
+    return not caixa_vazia(caixa_antes, referencia_caixa) and caixa_vazia(caixa_agora, referencia_caixa)
+
+
+def carregar_referencias(diretorio: str | None) -> dict:
+    if not diretorio or not os.path.isdir(diretorio):
+        return {}
+    from PIL import Image
+
+    refs = {}
+    for nome in ("caixa_vazia",) + MARCADORES_ACEITOS:
+        caminho = os.path.join(diretorio, f"{nome}.png")
+        if os.path.exists(caminho):
+            refs[nome] = Image.open(caminho).convert("RGB")
+    return refs
+
+
+@dataclass
+class ResultadoConfirmacao:
+    confirmado: bool
+    marcador: str | None
+    segundos: float
+    motivo: str | None = None
+
+
+class DetectorEntrega:
+    def __init__(
+        self,
+        regiao_caixa,
+        regiao_bolha,
+        referencias: dict | None = None,
+        timeout=30,
+        intervalo=0.5,
+        espera_minima=1.0,
+        captura=None,
+        relogio=time.monotonic,
+        dormir=time.sleep,
+    ):
+        """
+        regiao_*: (left, top, width, height) em pixels da tela.
+        captura: callable(regiao) -> imagem PIL (padrão: pyautogui.screenshot).
+        """
+        self.regiao_caixa = tuple(regiao_caixa)
+        self.regiao_bolha = tuple(regiao_bolha)
+        self.referencias = referencias or {}
+        self.timeout = timeout
+        self.intervalo = intervalo
+        self.espera_minima = espera_minima
+        self._captura = captura or self._captura_pyautogui
+        self._relogio = relogio
+        self._dormir = dormir
+        self._antes = None
+
+    @staticmethod
+    def _captura_pyautogui(regiao):
+        import pyautogui
+
+        return pyautogui.screenshot(region=regiao)
+
+    def _capturar(self):
+        return self._captura(self.regiao_caixa), self._captura(self.regiao_bolha)
+
+    def registrar_antes(self) -> None:
+        """Base da próxima confirmação: as duas regiões logo antes do ENTER."""
+        try:
+            self._antes = self._capturar()
+        except Exception as e:
+            print(f"  ⚠ Captura antes do envio falhou ({e}); confirmação sem comparação")
+            self._antes = None
+
+    def verificar(self) -> tuple[bool, str | None]:
+        """Uma leitura da tela: (caixa vazia?, marcador da última bolha)."""
+        return self._analisar(*self._capturar())
+
+    def _analisar(self, img_caixa, img_bolha) -> tuple[bool, str | None]:
+        vazia = caixa_vazia(img_caixa, self.referencias.get("caixa_vazia"))
+        marcador = marcador_ultima_bolha(
+            img_bolha, {k: v for k, v in self.referencias.items() if k in MARCADORES_ACEITOS}
+        )
+        return vazia, marcador
+
+    def aguardar_confirmacao(self) -> ResultadoConfirmacao:
+        inicio = self._relogio()
+        antes, self._antes = self._antes, None
+        if self.espera_minima:
+            self._dormir(self.espera_minima)
+
+        vazia, marcador, mudou = False, None, antes is None
+        while True:
+            try:
+                agora = self._capturar()
+            except Exception as e:
+                return ResultadoConfirmacao(False, None, self._relogio() - inicio, f"falha na captura: {e}")
+            vazia, marcador = self._analisar(*agora)
+            if antes is not None and not mudou:
+                mudou = tela_mudou(antes, agora, self.referencias.get("caixa_vazia"))
+
+            if vazia and marcador in MARCADORES_ACEITOS and mudou:
+                return ResultadoConfirmacao(True, marcador, self._relogio() - inicio)
+
+            if self._relogio() - inicio >= self.timeout:
+                if not vazia:
+                    motivo = "texto continua na caixa de digitação"
+                elif not mudou:
+                    motivo = "nenhuma bolha nova desde antes do envio"
+                else:
+                    motivo = "marcador de envio não apareceu"
+                return ResultadoConfirmacao(False, marcador, self._relogio() - inicio, motivo)
+
+            self._dormir(self.intervalo)
+
+
+def calibrar(regiao_caixa, regiao_bolha, diretorio: str, nome_bolha: str | None = None) -> None:
+    """Grava as capturas atuais das regiões como referências (caixa vazia / marcador)."""
+    import pyautogui
+
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, "caixa_vazia.png")
+    pyautogui.screenshot(region=tuple(regiao_caixa)).save(caminho)
+    print(f"OK: {caminho}")
+    if nome_bolha:
+        caminho = os.path.join(diretorio, f"{nome_bolha}.png")
+        pyautogui.screenshot(region=tuple(regiao_bolha)).save(caminho)
+        print(f"OK: {caminho}")
+
+
+def main() -> int:
+    from config import (
+        WA_CONFIRMACAO_REFERENCIAS_DIR,
+        WA_CONFIRMACAO_REGIAO_BOLHA,
+        WA_CONFIRMACAO_REGIAO_CAIXA,
+    )
+
+    parser = argparse.ArgumentParser(description="Calibra/testa a confirmação de envio pela tela")
+    parser.add_argument("--calibrar", action="store_true", help="Grava a caixa de digitação vazia como referência")
+    parser.add_argument(
+        "--marcador",
+        choices=MARCADORES_ACEITOS,
+        default=None,
+        help="Junto com --calibrar: grava também a região da bolha como este marcador",
+    )
+    args = parser.parse_args()
+
+    if args.calibrar:
+        calibrar(WA_CONFIRMACAO_REGIAO_CAIXA, WA_CONFIRMACAO_REGIAO_BOLHA, WA_CONFIRMACAO_REFERENCIAS_DIR, args.marcador)
+        return 0
+
+    detector = DetectorEntrega(
+        WA_CONFIRMACAO_REGIAO_CAIXA,
+        WA_CONFIRMACAO_REGIAO_BOLHA,
+        referencias=carregar_referencias(WA_CONFIRMACAO_REFERENCIAS_DIR),
+    )
+    vazia, marcador = detector.verificar()
+    print(f"Caixa vazia: {'SIM' if vazia else 'NÃO'} | Marcador: {marcador or '—'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,161 @@
+"""Portão de frescor: só consulta o mês quando as visitas de ontem já foram carregadas.
+
+Antes das consultas pesadas, uma sonda barata conta as visitas (e os check-ins
+válidos) do dia de referência e compara com o volume típico do mesmo dia da
+semana nas FRESCOR_SEMANAS anteriores (mediana, ignorando dias sem carga/feriados).
+Abaixo de FRESCOR_MIN_PCT do típico, espera com intervalo crescente e sonda de
+novo, até FRESCOR_PRAZO_MINUTOS. Prazo estourado: alerta pelo número do kickoff e,
+conforme FRESCOR_AO_ESTOURAR, aborta (padrão) ou segue com os dados que houver.
+
+Dia de referência feriado: nada a esperar.
+"""
+
+from __future__ import annotations
+
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import config
+import run_deadline
+import tenants
+from stage_profiler import etapa
+
+
+FRESCOR_ATIVO = getattr(config, "FRESCOR_ATIVO", True)
+FRESCOR_SEMANAS = max(1, int(getattr(config, "FRESCOR_SEMANAS", 4)))
+FRESCOR_MIN_PCT = getattr(config, "FRESCOR_MIN_PCT", 90)
+FRESCOR_PRAZO_MINUTOS = getattr(config, "FRESCOR_PRAZO_MINUTOS", 60)
+FRESCOR_ESPERA_INICIAL = getattr(config, "FRESCOR_ESPERA_INICIAL", 60)
+FRESCOR_ESPERA_MAX = getattr(config, "FRESCOR_ESPERA_MAX", 600)
+FRESCOR_AO_ESTOURAR = getattr(config, "FRESCOR_AO_ESTOURAR", "abortar")
+
+# Alertas de várias empresas (threads) não disputam o mesmo navegador
+_LOCK_ALERTA = threading.Lock()
+
+
+@dataclass
+class LeituraFrescor:
+    dia: date
+    feitas: int
+    planejadas: int
+    # Mediana do mesmo dia da semana nas semanas anteriores (None = sem histórico)
+    tipico_feitas: float | None
+    tipico_planejadas: float | None
+
+    def _pct(self, valor: int, tipico: float | None) -> float | None:
+        return valor / tipico * 100 if tipico else None
+
+    @property
+    def completo(self) -> bool:
+        if not self.planejadas:
+            return False
+        for valor, tipico in ((self.planejadas, self.tipico_planejadas), (self.feitas, self.tipico_feitas)):
+            pct = self._pct(valor, tipico)
+            if pct is not None and pct < FRESCOR_MIN_PCT:
+                return False
+        return True
+
+    def resumo(self) -> str:
+        partes = []
+        for rotulo, valor, tipico in (
+            ("visitas", self.planejadas, self.tipico_planejadas),
+            ("check-ins", self.feitas, self.tipico_feitas),
+        ):
+            pct = self._pct(valor, tipico)
+            partes.append(f"{valor} {rotulo}" + (f" ({pct:.0f}% do típico {tipico:.0f})" if pct is not None else ""))
+        return ", ".join(partes)
+
+
+def dias_comparaveis(ref: date, semanas: int = FRESCOR_SEMANAS) -> list[date]:
+    return [ref - timedelta(weeks=k) for k in range(1, semanas + 1)]
+
+
+def _mediana(valores: list[int]) -> float | None:
+    valores = [v for v in valores if v]
+    return float(statistics.median(valores)) if valores else None
+
+
+def ler(rows: list[dict], ref: date, comparaveis: list[date]) -> LeituraFrescor:
+    por_dia = {}
+    for r in rows:
+        dia = r["data_visita"]
+        if not isinstance(dia, date):
+            dia = date.fromisoformat(str(dia)[:10])
+        por_dia[dia] = (int(r.get("visitas_feitas") or 0), int(r.get("visitas_planejadas") or 0))
+    feitas, planejadas = por_dia.get(ref, (0, 0))
+    return LeituraFrescor(
+        dia=ref,
+        feitas=feitas,
+        planejadas=planejadas,
+        tipico_feitas=_mediana([por_dia.get(d, (0, 0))[0] for d in comparaveis]),
+        tipico_planejadas=_mediana([por_dia.get(d, (0, 0))[1] for d in comparaveis]),
+    )
+
+
+def sondar(db, ref: date) -> LeituraFrescor:
+    from merchan_queries import freshness_probe_sql
+
+    comparaveis = dias_comparaveis(ref)
+    return ler(db.query_rows(freshness_probe_sql([ref] + comparaveis)), ref, comparaveis)
+
+
+def alertar_pelo_kickoff(senders: list | None, mensagem: str) -> None:
+    """Alerta pelo número do kickoff, pela primeira sessão de envio (sem sessões: só imprime)."""
+    print(mensagem)
+    if not senders:
+        return
+    from whatsapp_sender import KICKOFF_PHONE_E164
+
+    sender = senders[0]
+    with _LOCK_ALERTA:
+        # Só o warm-up: o kickoff espera o plano, que só vem depois do frescor
+        sender.aguardar_warmup()
+        if not sender.enviar_mensagem(KICKOFF_PHONE_E164, mensagem, fechar_aba=False, tipo="alerta"):
+            print("⚠ Alerta de dados incompletos não foi enviado.")
+
+
+def aguardar_dados(db, ref: date, senders: list | None = None) -> bool:
+    """Sonda até o dia de referência estar completo; False = prazo estourado e FRESCOR_AO_ESTOURAR = "abortar"."""
+    if not FRESCOR_ATIVO:
+        return True
+
+    from merchan_queries import holiday_check_sql
+
+    with etapa("frescor"):
+        rows = db.query_rows(holiday_check_sql(ref))
+        if rows and int(rows[0].get("feriado") or 0):
+            print(f"📅 {ref:%d/%m} é feriado: sem conferência de frescor.")
+            return True
+
+        prazo = (FRESCOR_PRAZO_MINUTOS or 0) * 60
+        inicio = time.monotonic()
+        espera = FRESCOR_ESPERA_INICIAL
+        while True:
+            run_deadline.verificar()
+            leitura = sondar(db, ref)
+            if leitura.completo:
+                print(f"✓ Dados de {ref:%d/%m} carregados: {leitura.resumo()}")
+                return True
+            falta = prazo - (time.monotonic() - inicio)
+            if falta <= 0:
+                break
+            pausa = min(espera, falta)
+            restante = run_deadline.restante()
+            if restante is not None:
+                # Prazo da execução antes do prazo do frescor: a próxima volta acusa
+                pausa = min(pausa, max(0.0, restante))
+            print(f"⏳ Dados de {ref:%d/%m} incompletos — {leitura.resumo()}; nova sonda em {pausa:.0f}s")
+            time.sleep(pausa)
+            espera = min(espera * 2, FRESCOR_ESPERA_MAX)
+
+    empresa = tenants.empresa_atual()
+    alertar_pelo_kickoff(
+        senders,
+        f"⚠ Relatório Merchan{f' ({empresa})' if empresa else ''}: dados de {ref:%d/%m/%Y} incompletos "
+        f"após {FRESCOR_PRAZO_MINUTOS} min de espera — {leitura.resumo()}. "
+        + ("Enviando mesmo assim." if FRESCOR_AO_ESTOURAR == "seguir" else "Envio cancelado."),
+    )
+    return FRESCOR_AO_ESTOURAR == "seguir"
@@ -0,0 +1,241 @@
+"""Parcial do dia (--parcial): progresso das visitas de hoje com consultas incrementais.
+
+Cada execução ("tick") consulta só o que mudou desde a anterior:
+- visitas novas: visitaid acima da marca d'água;
+- visitas alteradas: INTRADIA_COLUNA_ALTERACAO acima da última marca, se a coluna
+  estiver configurada; senão, as visitas ainda pendentes que ganharam check-in válido.
+
+As linhas são somadas em contadores em memória (geral, área, colaborador da área)
+e o estado do dia (visitas, marcas, roster) fica em INTRADIA_ARQUIVO. O primeiro
+tick do dia traz o dia inteiro, que já é pequeno perto das consultas do mês; sem
+coluna de alteração, mais de INTRADIA_MAX_PENDENTES visitas pendentes também.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from datetime import date, datetime
+
+import config
+from metric_plan import FiltroExecucao, resolver_destinatarios
+from report_builder import AdherenceMetric, build_progress_message, order_areas
+from report_calendar import ReportContext, should_send_today
+from stage_profiler import etapa
+from tenants import arquivo_da_empresa
+
+
+INTRADIA_ARQUIVO = getattr(config, "INTRADIA_ARQUIVO", "intradia.json")
+INTRADIA_TIPOS = tuple(getattr(config, "INTRADIA_TIPOS", ("lider_merchan",)) or ())
+INTRADIA_COLUNA_ALTERACAO = getattr(config, "INTRADIA_COLUNA_ALTERACAO", None)
+INTRADIA_MAX_PENDENTES = getattr(config, "INTRADIA_MAX_PENDENTES", 1000)
+
+_NAO_IDENTIFICADA = "Não Identificada"
+
+
+def _metrica(acc: list[int]) -> AdherenceMetric:
+    return AdherenceMetric(*acc)
+
+
+class ProgressoIntradia:
+    def __init__(self, dia: date):
+        self.dia = dia
+        # visitaid -> [area, area_mapeada, colaborador, feita]
+        self.visitas: dict[int, list] = {}
+        self.max_visitaid: int | None = None
+        self.max_alteracao: str | None = None
+        self.roster: list[dict] | None = None
+        self.geral = [0, 0]
+        self.areas: dict[str, list[int]] = {}
+        self.colaboradores: dict[tuple[str, str], list[int]] = {}
+
+    def _somar(self, v: list, sinal: int) -> None:
+        area, mapeada, colaborador, feita = v
+        feitas = sinal if feita else 0
+        for acc in (
+            self.geral,
+            self.areas.setdefault(area, [0, 0]),
+            self.colaboradores.setdefault((area, colaborador), [0, 0]) if mapeada else None,
+        ):
+            if acc is not None:
+                acc[0] += feitas
+                acc[1] += sinal
+
+    def aplicar(self, rows: list[dict]) -> tuple[int, int]:
+        """Dobra o delta nos contadores; devolve (novas, alteradas)."""
+        novas = alteradas = 0
+        for r in rows:
+            visitaid = int(r["visitaid"])
+            nova = [
+                (r.get("area_merchan") or "").strip() or _NAO_IDENTIFICADA,
+                bool(r.get("area_mapeada")),
+                (r.get("colaborador") or "").strip(),
+                bool(r.get("feita")),
+            ]
+            antiga = self.visitas.get(visitaid)
+            if antiga is not None:
+                if antiga == nova:
+                    continue
+                self._somar(antiga, -1)
+                alteradas += 1
+            else:
+                novas += 1
+            self.visitas[visitaid] = nova
+            self._somar(nova, +1)
+            if self.max_visitaid is None or visitaid > self.max_visitaid:
+                self.max_visitaid = visitaid
+            alterado_em = r.get("alterado_em")
+            if alterado_em and (self.max_alteracao is None or str(alterado_em) > self.max_alteracao):
+                self.max_alteracao = str(alterado_em)
+        return novas, alteradas
+
+    def pendentes(self) -> list[int]:
+        return [vid for vid, v in self.visitas.items() if not v[3]]
+
+    # ------------------------------------------------------------------
+    # Estado do dia em disco
+    # ------------------------------------------------------------------
+    def salvar(self, arquivo: str) -> None:
+        conteudo = {
+            "dia": self.dia.isoformat(),
+            "max_visitaid": self.max_visitaid,
+            "max_alteracao": self.max_alteracao,
+            "roster": self.roster,
+            "visitas": {str(k): v for k, v in self.visitas.items()},
+        }
+        with open(arquivo, "w", encoding="utf-8") as f:
+            json.dump(conteudo, f, ensure_ascii=False, separators=(",", ":"), default=str)
+
+    @classmethod
+    def carregar(cls, arquivo: str | None, dia: date) -> "ProgressoIntradia":
+        """Estado do mesmo dia, ou um progresso vazio (primeiro tick / outro dia)."""
+        progresso = cls(dia)
+        if not arquivo or not os.path.exists(arquivo):
+            return progresso
+        try:
+            with open(arquivo, "r", encoding="utf-8") as f:
+                conteudo = json.load(f)
+        except Exception as e:
+            print(f"⚠ Estado do parcial ilegível ({arquivo}): {e}")
+            return progresso
+        if conteudo.get("dia") != dia.isoformat():
+            return progresso
+        progresso.max_visitaid = conteudo.get("max_visitaid")
+        progresso.max_alteracao = conteudo.get("max_alteracao")
+        progresso.roster = conteudo.get("roster")
+        for k, v in (conteudo.get("visitas") or {}).items():
+            progresso.visitas[int(k)] = v
+            progresso._somar(v, +1)
+        return progresso
+
+    # ------------------------------------------------------------------
+    # Mensagens
+    # ------------------------------------------------------------------
+    def mensagem_geral(self, hora_label: str) -> str:
+        areas = order_areas([{"area_merchan": a} for a in self.areas])
+        return build_progress_message(
+            title=f"Parcial de Hoje {self.dia.strftime('%d/%m')}",
+            hora_label=hora_label,
+            total_label="Geral",
+            total=_metrica(self.geral),
+            section_title="📍 Por Área",
+            rows=[(r["area_merchan"], _metrica(self.areas[r["area_merchan"]])) for r in areas],
+        )
+
+    def mensagem_area(self, area: str, hora_label: str) -> str:
+        alvo = area.strip().casefold()
+        nome_area = next((a for a in self.areas if a.casefold() == alvo), area)
+        colaboradores = sorted(
+            ((c, acc) for (a, c), acc in self.colaboradores.items() if a.casefold() == alvo and acc[1] > 0),
+            key=lambda x: x[0].casefold(),
+        )
+        return build_progress_message(
+            title=f"Parcial de Hoje {self.dia.strftime('%d/%m')} - {nome_area}",
+            hora_label=hora_label,
+            total_label=nome_area,
+            total=_metrica(self.areas.get(nome_area, [0, 0])),
+            section_title="👥 Colaboradores (ordem alfabética)",
+            rows=[(c, _metrica(acc)) for c, acc in colaboradores],
+        )
+
+
+def executar_parcial(hoje: date, filtro: FiltroExecucao, modo_teste: bool) -> int:
+    import main
+
+    if not should_send_today(hoje):
+        print("Hoje é domingo: sem parcial.")
+        return 0
+
+    arquivo = arquivo_da_empresa(INTRADIA_ARQUIVO)
+    progresso = ProgressoIntradia.carregar(arquivo, hoje)
+    pendentes = None if INTRADIA_COLUNA_ALTERACAO else progresso.pendentes()
+    # IN (...) com milhares de ids custa mais que reler o dia: acima do limite, dia inteiro
+    dia_inteiro = progresso.max_visitaid is None or len(pendentes or ()) > INTRADIA_MAX_PENDENTES
+
+    from database import Database
+    from merchan_queries import intraday_visits_sql
+    from recipient_index import carregar_indice
+
+    db = Database()
+    try:
+        if progresso.roster is None:
+            progresso.roster = carregar_indice(db).linhas
+        sql = intraday_visits_sql(
+            hoje,
+            desde_visitaid=None if dia_inteiro else progresso.max_visitaid,
+            pendentes=pendentes,
+            coluna_alteracao=INTRADIA_COLUNA_ALTERACAO,
+            desde_alteracao=progresso.max_alteracao,
+        )
+        with etapa("parcial;delta"):
+            rows = db.query_rows(sql)
+    finally:
+        db.disconnect()
+
+    novas, alteradas = progresso.aplicar(rows)
+    print(
+        f"📥 Parcial {'(dia inteiro)' if dia_inteiro else '(delta)'}: {len(rows)} linhas, "
+        f"{novas} visitas novas, {alteradas} alteradas; {len(progresso.visitas)} visitas no dia"
+    )
+    if arquivo:
+        try:
+            progresso.salvar(arquivo)
+        except Exception as e:
+            print(f"⚠ Não foi possível gravar o estado do parcial ({arquivo}): {e}")
+
+    destinatarios = [
+        d
+        for d in resolver_destinatarios(
+            progresso.roster or [],
+            ReportContext.para_data(hoje),
+            filtro,
+            telefone_teste=main.TEST_PHONE_E164 if main.USE_TEST_PHONE else None,
+        )
+        if d.tipo in INTRADIA_TIPOS
+    ]
+    if not destinatarios:
+        print(f"⚠ Nenhum destinatário do parcial (INTRADIA_TIPOS = {INTRADIA_TIPOS}).")
+        return 0
+
+    hora_label = datetime.now().strftime("%H:%M")
+    mensagens_envio = []
+    for dest in destinatarios:
+        if dest.tipo in ("lider_area", "lider_org"):
+            msg = progresso.mensagem_area(dest.area or "", hora_label)
+        else:
+            msg = progresso.mensagem_geral(hora_label)
+        mensagens_envio.append(
+            {"destinatario": dest.nome, "telefone": dest.telefone, "mensagens": [msg], "tipo": "parcial"}
+        )
+
+    if modo_teste:
+        main.imprimir_previa(mensagens_envio)
+        return 0
+
+    # Parcial não manda kickoff: só o relatório diário abre o dia com ele
+    senders = main.preparar_envio(enviar_kickoff=False)
+    try:
+        main.enviar_lote(mensagens_envio, senders)
+    finally:
+        main.cancelar_envio(senders)
+    return 0
@@ -11,6 +11,7 @@ Regras:
 	- Resumo geral
 	- Bloco de Grupos importantes (sem redes)
 - Líderes de área recebem resumo da área + colaboradores.
+- Promotores (opcional, ENVIAR_PROMOTORES ou --promotores) recebem a própria aderência.
 
 Observação: se USE_TEST_PHONE estiver ativo, todos os envios vão para TEST_PHONE_E164.
 """
@@ -18,8 +19,10 @@ Observação: se USE_TEST_PHONE estiver ativo, todos os envios vão para TEST_PH
 from __future__ import annotations
 
 import argparse
-from datetime import date, datetime, timedelta
+import os
+from datetime import date, datetime
 
+import config
 from config import (
 	MODO_TESTE,
 	TEST_PHONE_E164,
@@ -31,53 +34,242 @@ from config import (
 	WA_WAIT_TIME_PRIMEIRA,
 	WA_WARMUP_SEGUNDOS,
 )
-from database import Database
-from merchan_queries import (
-	area_total_by_area_sql,
-	area_totals_sql,
-	area_collaborators_sql,
-	grupos_importantes_sql,
-	grupo_rede_month_sql,
-	leader_area_total_sql,
-	leaders_with_area_and_phone_sql,
-	overall_adherence_sql,
-)
-from report_builder import (
-	AdherenceMetric,
-	build_area_leader_message,
-	build_diretoria_message,
-	build_general_leader_message,
-	metric_from_row,
-	normalize_phone_to_e164,
+from metric_plan import (
+	FiltroExecucao,
+	erro_config_promotores,
+	executar,
+	explicar,
+	montar_mensagens,
+	planejar,
+	resolver_destinatarios,
 )
+from report_calendar import ReportContext, should_send_today
+import run_deadline
+from run_ledger import marcar_data_execucao
+from stage_profiler import etapa
+import tenants
+
+
+def criar_sender(**overrides):
+	from sender_telemetry import TelemetriaEnvio
+	from whatsapp_sender import WhatsAppSender
+
+	detector = None
+	# Sessões com janela própria confirmam o envio nas regiões da sua janela
+	regiao_caixa = overrides.pop("regiao_caixa", None) or getattr(config, "WA_CONFIRMACAO_REGIAO_CAIXA", None)
+	regiao_bolha = overrides.pop("regiao_bolha", None) or getattr(config, "WA_CONFIRMACAO_REGIAO_BOLHA", None)
+	if regiao_caixa and regiao_bolha:
+		from delivery_detector import DetectorEntrega, carregar_referencias
+
+		detector = DetectorEntrega(
+			regiao_caixa,
+			regiao_bolha,
+			referencias=carregar_referencias(getattr(config, "WA_CONFIRMACAO_REFERENCIAS_DIR", None)),
+			timeout=getattr(config, "WA_CONFIRMACAO_TIMEOUT", 30),
+		)
+
+	kwargs = dict(
+		detector_entrega=detector,
+		intervalo_entre_mensagens=WA_INTERVALO_ENTRE_MENSAGENS,
+		intervalo_mesmo_numero=WA_INTERVALO_MESMO_NUMERO,
+		espera_pos_envio=WA_ESPERA_POS_ENVIO,
+		wait_time_primeira=WA_WAIT_TIME_PRIMEIRA,
+		wait_time_padrao=WA_WAIT_TIME_PADRAO,
+		warmup_segundos=WA_WARMUP_SEGUNDOS,
+		watchdog_segundos=getattr(config, "WA_WATCHDOG_SEGUNDOS", 60),
+		tentativas_envio=getattr(config, "WA_TENTATIVAS_ENVIO", 2),
+		navegador_executavel=getattr(config, "WA_NAVEGADOR_EXECUTAVEL", None),
+		telemetria=TelemetriaEnvio(getattr(config, "WA_TELEMETRIA_ARQUIVO", "telemetria_envio.jsonl")),
+	)
+	kwargs.update(overrides)
+	return WhatsAppSender(**kwargs)
+
+
+def criar_agenda(sender):
+	from send_scheduler import AgendaEnvio
+
+	return AgendaEnvio.do_sender(
+		sender,
+		prazo=getattr(config, "WA_PRAZO_ENVIO", None),
+		acao_prazo=getattr(config, "WA_PRAZO_ACAO", "sinalizar"),
+		arquivo_tempos=getattr(config, "WA_TEMPOS_APRENDIDOS_ARQUIVO", "tempos_envio.json"),
+	)
+
+
+def _sessoes_envio() -> list[dict]:
+	sessoes = getattr(config, "WA_SESSOES", None) or [{"nome": "principal"}]
+	if len(sessoes) > 1 and getattr(config, "WA_SESSOES_MESMO_DESKTOP", True):
+		# Mesmo desktop: cada sessão precisa do seu navegador/conta e da sua área da tela
+		faltando = [s.get("nome") or f"sessao{i + 1}" for i, s in enumerate(sessoes) if not (s.get("perfil_navegador") and s.get("janela"))]
+		if faltando:
+			print(f"⚠ WA_SESSOES: sem \"perfil_navegador\"/\"janela\" em {', '.join(faltando)}; enviando só pela primeira sessão.")
+			return sessoes[:1]
+		if len({os.path.abspath(s["perfil_navegador"]) for s in sessoes}) < len(sessoes):
+			print("⚠ WA_SESSOES: sessões com o mesmo perfil_navegador (mesma conta); enviando só pela primeira sessão.")
+			return sessoes[:1]
+	return sessoes
+
+
+def preparar_envio(enviar_kickoff: bool = True) -> list:
+	"""Cria um sender por sessão e dispara o warm-up em segundo plano.
+
+	O kickoff sai da mesma thread, ainda durante as consultas, assim que o plano tiver
+	destinatários (confirmar_lote); sem lote, cancelar_envio o dispensa.
+	"""
+	import threading
+
+	sessoes = _sessoes_envio()
+	trava_gui = None
+	if len(sessoes) > 1 and getattr(config, "WA_SESSOES_MESMO_DESKTOP", True):
+		trava_gui = threading.RLock()
+
+	senders = []
+	for indice, sessao in enumerate(sessoes):
+		overrides = {k: v for k, v in sessao.items() if k != "nome"}
+		# Kickoff só pela primeira sessão
+		overrides.setdefault("enviar_kickoff", enviar_kickoff and indice == 0)
+		sender = criar_sender(trava_gui=trava_gui, **overrides)
+		sender.iniciar_preparacao_em_segundo_plano()
+		senders.append(sender)
+	return senders
+
+
+def confirmar_lote(senders: list | None, ha_lote: bool = True) -> None:
+	"""Plano com destinatários: libera o kickoff na thread do warm-up (ou o dispensa, ha_lote=False)."""
+	for sender in senders or []:
+		sender.sinalizar_lote(ha_lote)
+
+
+def cancelar_envio(senders: list | None) -> None:
+	"""Fim da execução: interrompe warm-ups ainda em andamento (saída sem lote/erro) e espera as threads."""
+	for sender in senders or []:
+		sender.cancelar_preparacao()
+
+
+def enviar_lote(mensagens_envio: list[dict], senders: list | None = None, ao_concluir_item=None) -> dict:
+	"""Envia o lote por uma sessão de WhatsApp ou, se configurado, por várias (WA_SESSOES).
+
+	ao_concluir_item(item, sucesso): ex.: registro de execuções (LedgerExecucoes.registrar_entrega).
+	"""
+	senders = senders or preparar_envio()
+	if len(senders) == 1:
+		sender = senders[0]
+		return sender.enviar_mensagens_lote(
+			mensagens_envio,
+			modo_teste=False,
+			agenda=criar_agenda(sender),
+			ao_concluir_item=ao_concluir_item,
+		)
+
+	from sender_pool import PoolEnvio
+
+	# Kickoff (pela primeira sessão) antes de as sessões começarem
+	confirmar_lote(senders, bool(mensagens_envio))
+	senders[0].aguardar_sessao_pronta()
+	if mensagens_envio:
+		senders[0].enviar_kickoff_pendente()
+	pool = PoolEnvio(
+		_sessoes_envio(),
+		lambda sessao, indice: senders[indice],
+		agenda=criar_agenda(senders[0]),
+		arquivo_outbox=getattr(config, "WA_OUTBOX_ARQUIVO", None),
+	)
+	return pool.enviar(mensagens_envio, ao_concluir_item=ao_concluir_item)
+
+
+def arquivo_ledger() -> str | None:
+	return tenants.arquivo_da_empresa(getattr(config, "LEDGER_ARQUIVO", "execucoes.json"))
 
 
+def criar_ledger():
+	arquivo = arquivo_ledger()
+	if not arquivo:
+		return None
+	from run_ledger import LedgerExecucoes
 
-def should_send_today(today: date) -> bool:
-	# weekday: 0=segunda ... 6=domingo
-	return today.weekday() != 6
+	return LedgerExecucoes(arquivo)
 
 
-def reference_date(today: date) -> date:
-	# segunda -> sábado
-	if today.weekday() == 0:
-		return today - timedelta(days=2)
-	return today - timedelta(days=1)
+def planejar_execucao(db, ctx: ReportContext, filtro: FiltroExecucao, leaders_rows: list[dict] | None = None):
+	"""Roster -> destinatários -> plano de métricas (None se o roster estiver vazio)."""
+	if leaders_rows is None:
+		from recipient_index import carregar_indice
 
+		leaders_rows = carregar_indice(db).linhas
+	if not leaders_rows:
+		print("⚠ Nenhum líder encontrado em dimAreaMerchan.")
+		return None
 
-def month_start(d: date) -> date:
-	return date(d.year, d.month, 1)
+	destinatarios = resolver_destinatarios(
+		leaders_rows,
+		ctx,
+		filtro,
+		telefone_teste=TEST_PHONE_E164 if USE_TEST_PHONE else None,
+	)
+	return planejar(ctx, destinatarios)
+
+
+def imprimir_previa(mensagens_envio: list[dict]) -> None:
+	print("\n" + "=" * 60)
+	print("MODO TESTE - PRÉVIA DAS MENSAGENS")
+	print("=" * 60)
+	print(f"Total de destinatários: {len(mensagens_envio)}")
+	print("=" * 60)
+	for i, item in enumerate(mensagens_envio, 1):
+		destinatario = item["destinatario"]
+		telefone = item["telefone"]
+		mensagens = item["mensagens"]
+		tipo = item.get("tipo", "")
+		print(f"\n[{i}/{len(mensagens_envio)}] {tipo.upper()}: {destinatario}")
+		print(f"Telefone: {telefone}")
+		for j, msg in enumerate(mensagens, 1):
+			print(f"\n--- Mensagem {j} ---")
+			print(msg)
+
+
+def gravar_snapshot(ctx: ReportContext, resultados: dict, mensagens_envio: list[dict]) -> str | None:
+	diretorio = tenants.arquivo_da_empresa(getattr(config, "SNAPSHOT_DIR", "snapshots"))
+	if not diretorio:
+		return None
+	from run_snapshot import salvar_snapshot
+
+	try:
+		arquivo = salvar_snapshot(diretorio, ctx, resultados, mensagens_envio, telefone_teste=USE_TEST_PHONE)
+		print(f"💾 Snapshot gravado: {arquivo}")
+		# Consulta de métricas no mesmo processo (modo serviço) sem reler o arquivo
+		from metrics_endpoint import registrar
+
+		registrar(arquivo, ctx, resultados, mensagens_envio)
+		return arquivo
+	except Exception as e:
+		print(f"⚠ Não foi possível gravar o snapshot: {e}")
+		return None
 
 
-def week_start(d: date) -> date:
-	# Monday as start-of-week
-	return d - timedelta(days=d.weekday())
+def executar_de_snapshot(arquivo: str, modo_teste: bool) -> int:
+	"""Prévia/envio a partir de um snapshot, sem importar pyodbc nem consultar o banco."""
+	from run_snapshot import carregar_snapshot
 
+	try:
+		snap = carregar_snapshot(arquivo)
+	except Exception as e:
+		print(f"ERRO: Não foi possível ler o snapshot {arquivo}: {e}")
+		return 1
+
+	print(
+		f"📂 Snapshot {arquivo} (gerado em {snap.gerado_em}, referência {snap.ctx.ref.isoformat()}, "
+		f"{len(snap.mensagens_envio)} destinatários)"
+	)
+	if snap.telefone_teste:
+		print("⚠ Snapshot gerado com USE_TEST_PHONE: os envios vão para o número de teste.")
+
+	if modo_teste:
+		imprimir_previa(snap.mensagens_envio)
+		return 0
 
-def scalar_metric(rows: list[dict] | None) -> AdherenceMetric:
-	if not rows:
-		return AdherenceMetric(0, 0, None)
-	return metric_from_row(rows[0])
+	ledger = criar_ledger()
+	enviar_lote(snap.mensagens_envio, ao_concluir_item=ledger.registrar_entrega if ledger else None)
+	return 0
 
 
 def main() -> int:
@@ -98,247 +290,351 @@ def main() -> int:
 		default=None,
 		help="Simula a data de execucao (YYYY-MM-DD). Ex: --data 2026-01-12 para simular segunda",
 	)
-	parser.add_argument(
+	somente = parser.add_mutually_exclusive_group()
+	somente.add_argument(
 		"--somente-diretoria",
 		action="store_true",
 		help="Gera/mostra apenas a mensagem da Diretoria (use junto com --teste/--data)",
 	)
+	somente.add_argument(
+		"--somente-area",
+		action="append",
+		default=[],
+		metavar="AREA",
+		help="Gera/mostra apenas a mensagem dos líderes desta área (pode repetir)",
+	)
+	parser.add_argument(
+		"--promotores",
+		action="store_true",
+		help="Inclui a mensagem individual de cada promotor (além de ENVIAR_PROMOTORES no config)",
+	)
+	parser.add_argument(
+		"--somente-promotores",
+		action="store_true",
+		help="Gera/mostra apenas as mensagens individuais dos promotores",
+	)
+	parser.add_argument(
+		"--recuperar",
+		action="store_true",
+		help="Gera e envia os dias úteis perdidos (registro de execuções) até hoje/--data",
+	)
+	parser.add_argument(
+		"--recuperar-modo",
+		choices=["em_ordem", "consolidado"],
+		default=None,
+		help="Com --recuperar: uma mensagem por dia (em ordem) ou uma por destinatário com todos os dias",
+	)
+	parser.add_argument(
+		"--parcial",
+		action="store_true",
+		help="Parcial das visitas de hoje (consulta só o que mudou desde a última parcial)",
+	)
+	parser.add_argument(
+		"--de-snapshot",
+		type=str,
+		default=None,
+		metavar="ARQUIVO",
+		help="Usa o lote gravado num snapshot (sem consultar o banco) para prévia/envio",
+	)
+	parser.add_argument(
+		"--servico",
+		action="store_true",
+		help="Sobe o modo serviço (agenda própria + controle local em SERVICO_PORTA)",
+	)
+	parser.add_argument(
+		"--metricas",
+		action="store_true",
+		help="Sobe a consulta local (somente leitura) das métricas/mensagens gravadas nos snapshots",
+	)
+	parser.add_argument(
+		"--perfil",
+		action="store_true",
+		help="Mede tempo e memória de cada etapa e grava as pilhas (flame graph) em perfis/",
+	)
+	parser.add_argument(
+		"--perfil-cprofile",
+		action="store_true",
+		help="Junto com --perfil: inclui cProfile por etapa (funções abaixo de cada etapa)",
+	)
+	parser.add_argument(
+		"--explicar-plano",
+		action="store_true",
+		help="Lista os destinatários e as consultas que seriam executadas, sem rodá-las",
+	)
+	parser.add_argument(
+		"--empresa",
+		action="append",
+		default=[],
+		metavar="NOME",
+		help="Roda para esta empresa de EMPRESAS no config (pode repetir: dados em paralelo, um só lote de envio)",
+	)
+	parser.add_argument(
+		"--todas-empresas",
+		action="store_true",
+		help="Roda para todas as empresas de EMPRESAS no config",
+	)
+	parser.add_argument(
+		"--sem-frescor",
+		action="store_true",
+		help="Não espera a carga de ontem ficar completa antes das consultas (FRESCOR_*)",
+	)
+	parser.add_argument(
+		"--prazo-minutos",
+		type=float,
+		default=None,
+		help="Prazo da execução inteira; estourou, para e informa a etapa/consulta (padrão: EXECUCAO_PRAZO_MINUTOS)",
+	)
 	args = parser.parse_args()
 
+	prazo = args.prazo_minutos if args.prazo_minutos is not None else run_deadline.EXECUCAO_PRAZO_MINUTOS
+	# No modo serviço o prazo vale por execução (service_mode), não para o processo
+	if prazo and not (args.servico or args.metricas):
+		run_deadline.ativar(prazo * 60)
+	try:
+		if not args.perfil:
+			return executar_com_empresas(args)
+
+		import stage_profiler
+
+		perfil = stage_profiler.ativar(usar_cprofile=args.perfil_cprofile)
+		try:
+			with perfil.etapa("execucao"):
+				return executar_com_empresas(args)
+		finally:
+			stage_profiler.desativar()
+			perfil.relatorio()
+	except run_deadline.PrazoEstourado as e:
+		print(f"\n✗ {e}")
+		return 2
+	finally:
+		run_deadline.desativar()
+
+
+def data_e_filtro(args: argparse.Namespace) -> tuple[date, FiltroExecucao]:
 	hoje = date.fromisoformat(args.data) if args.data else datetime.now().date()
+	filtro = FiltroExecucao(
+		somente_diretoria=args.somente_diretoria,
+		somente_areas=args.somente_area,
+		somente_tipos=["promotor"] if args.somente_promotores else [],
+	)
+	if args.promotores:
+		filtro.incluir_promotores = True
+	return hoje, filtro
+
+
+def executar_com_empresas(args: argparse.Namespace) -> int:
+	"""Sem --empresa: config de sempre. Uma empresa: qualquer modo. Várias: envio diário em paralelo."""
+	empresas = list(tenants.EMPRESAS) if args.todas_empresas else args.empresa
+	if not empresas:
+		return executar_cli(args)
+	erros = tenants.validar(empresas)
+	if erros:
+		for erro in erros:
+			print(f"ERRO: {erro}")
+		return 1
+	if len(empresas) == 1:
+		with tenants.usar_empresa(empresas[0]):
+			return executar_cli(args)
+	if args.servico or args.metricas or args.de_snapshot or args.recuperar or args.parcial:
+		print("ERRO: várias empresas só no envio diário (sem --servico/--metricas/--de-snapshot/--recuperar/--parcial).")
+		return 1
+
+	hoje, filtro = data_e_filtro(args)
+	for nome in empresas:
+		with tenants.usar_empresa(nome):
+			erro = erro_config_promotores(filtro)
+		if erro:
+			print(f"ERRO: empresa {nome}: {erro}")
+			return 1
+	return executar_empresas(
+		empresas,
+		hoje,
+		filtro,
+		args.teste or MODO_TESTE or args.explicar_plano,
+		args.explicar_plano,
+		frescor=not args.sem_frescor,
+	)
+
+
+def gerar_lote(
+	ctx: ReportContext,
+	filtro: FiltroExecucao,
+	explicar_plano: bool = False,
+	senders: list | None = None,
+	frescor: bool = True,
+) -> list[dict] | int:
+	"""Banco -> (frescor) -> (rollup) -> plano -> métricas -> mensagens (+ snapshot).
+
+	Devolve o código de saída (int) quando não há lote: dados de ontem incompletos,
+	roster vazio ou --explicar-plano. senders: por onde sai o alerta de frescor.
+	"""
+	from daily_rollup import publicar_recentes
+	from database import Database
+	from freshness_gate import aguardar_dados
+
+	db = Database()
+	try:
+		if frescor and not explicar_plano and not aguardar_dados(db, ctx.ref, senders):
+			return 1
+		if not explicar_plano:
+			publicar_recentes(db, ctx.ref)
+		plano = planejar_execucao(db, ctx, filtro)
+		if plano is None:
+			return 1
+		if explicar_plano:
+			explicar(plano)
+			return 0
+		if plano.destinatarios:
+			# Haverá lote: o kickoff sai em segundo plano enquanto as métricas são consultadas
+			confirmar_lote(senders)
+
+		resultados = executar(plano, db)
+		with etapa("mensagens"):
+			mensagens_envio = marcar_data_execucao(montar_mensagens(plano, resultados), ctx.hoje)
+	finally:
+		db.disconnect()
+
+	with etapa("snapshot"):
+		gravar_snapshot(ctx, resultados, mensagens_envio)
+	return mensagens_envio
+
+
+def executar_empresas(
+	empresas: list[str],
+	hoje: date,
+	filtro: FiltroExecucao,
+	modo_teste: bool,
+	explicar_plano: bool = False,
+	frescor: bool = True,
+) -> int:
+	"""Fase de dados de cada empresa em paralelo (banco/tabelas/estado próprios); um único lote de envio."""
 	if not should_send_today(hoje):
 		print("Hoje é domingo: não envia relatório.")
 		return 0
 
-	ref = reference_date(hoje)
-	dt_start = ref
-	dt_end = ref + timedelta(days=1)
-	ms = month_start(ref)
-	me = hoje  # mês até ontem (exclui o dia de execução)
-
-	month_label = f"{ms.strftime('%m')}"
-	weekday = hoje.weekday()  # 0=segunda
-	include_grupo_rede_merchan = True  # TODO DIA
-	include_grupos_diretoria = weekday == 0  # SOMENTE SEGUNDA
-	# Diretoria (segunda): a "semana anterior" é a semana que termina no sábado de referência (ref).
-	# Ex.: se hoje é 19/01 (seg), ref=17/01 (sáb) => semana desejada: 12/01 a 17/01.
-	ws_prev = week_start(ref)  # segunda-feira da semana do ref
-	we_prev = ws_prev + timedelta(days=6)  # fim exclusivo (domingo), inclui segunda..sábado
-	prev_week_label = f"{ws_prev.strftime('%d/%m')} a {(ws_prev + timedelta(days=5)).strftime('%d/%m')}"
+	ctx = ReportContext.para_data(hoje)
+	from rolling_window import somente_leitura
+
+	somente_leitura(modo_teste)
+	senders = None if modo_teste else preparar_envio()
+
+	def fase_de_dados(nome: str):
+		lote = gerar_lote(ctx, filtro, explicar_plano, senders, frescor)
+		if not isinstance(lote, int):
+			for item in lote:
+				item["empresa"] = nome
+		return lote
 
-	db = Database()
 	try:
-		leaders_rows = db.query_rows(leaders_with_area_and_phone_sql())
-		if not leaders_rows:
-			print("⚠ Nenhum líder encontrado em dimAreaMerchan.")
-			return 1
+		print(f"🏢 Empresas: {', '.join(empresas)} (fase de dados em paralelo)")
+		with etapa("empresas"):
+			resultados = tenants.executar_por_empresa(empresas, fase_de_dados)
+
+		codigo = 0
+		lotes: dict[str, list[dict]] = {}
+		for nome, lote in resultados.items():
+			if isinstance(lote, Exception):
+				print(f"✗ Empresa {nome}: {lote}")
+				codigo = 1
+			elif isinstance(lote, int):
+				codigo = max(codigo, lote)
+			else:
+				print(f"- {nome}: {len(lote)} destinatário(s)")
+				lotes[nome] = lote
+		mensagens_envio = [item for lote in lotes.values() for item in lote]
+
+		if explicar_plano:
+			return codigo
+		if modo_teste:
+			imprimir_previa(mensagens_envio)
+			return codigo
+
+		ledgers = {}
+		for nome in lotes:
+			with tenants.usar_empresa(nome):
+				ledgers[nome] = criar_ledger()
+
+		def registrar_entrega(item: dict, sucesso: bool) -> None:
+			ledger = ledgers.get(item.get("empresa"))
+			if ledger is not None:
+				ledger.registrar_entrega(item, sucesso)
+
+		if mensagens_envio:
+			# Um só lote (e um só ritmo de envio) para todas as empresas
+			with etapa("envio"):
+				enviar_lote(mensagens_envio, senders, ao_concluir_item=registrar_entrega)
+		if filtro.sem_filtros():
+			for nome, lote in lotes.items():
+				if ledgers[nome] is not None:
+					ledgers[nome].concluir_se_entregue(hoje, lote)
+		return codigo
+	finally:
+		cancelar_envio(senders)
+
+
+def executar_cli(args: argparse.Namespace) -> int:
+	if args.servico:
+		from service_mode import executar_servico
+
+		return executar_servico()
+
+	if args.metricas:
+		from metrics_endpoint import servir
+
+		return servir()
+
+	modo_teste = args.teste or MODO_TESTE or args.explicar_plano
+	# Prévia não grava o estado das janelas móveis
+	from rolling_window import somente_leitura
+
+	somente_leitura(modo_teste)
+
+	if args.de_snapshot:
+		return executar_de_snapshot(args.de_snapshot, modo_teste)
+
+	hoje, filtro = data_e_filtro(args)
+	erro = erro_config_promotores(filtro)
+	if erro:
+		print(f"ERRO: {erro}")
+		return 1
+
+	if args.recuperar:
+		# Também no domingo: recupera os dias úteis anteriores
+		from catch_up import executar_recuperacao
+
+		return executar_recuperacao(hoje, filtro, modo_teste, args.recuperar_modo)
+
+	if args.parcial:
+		from intraday import executar_parcial
+
+		return executar_parcial(hoje, filtro, modo_teste)
+
+	if not should_send_today(hoje):
+		print("Hoje é domingo: não envia relatório.")
+		return 0
+
+	ctx = ReportContext.para_data(hoje)
+
+	# Envio real: warm-up e kickoff do WhatsApp Web rodam em paralelo às consultas (kickoff só com lote)
+	senders = None if modo_teste else preparar_envio()
+	try:
+		mensagens_envio = gerar_lote(ctx, filtro, args.explicar_plano, senders, frescor=not args.sem_frescor)
+		if isinstance(mensagens_envio, int):
+			return mensagens_envio
 
-		def _norm_area(v: str) -> str:
-			return (v or "").strip().casefold()
-
-		merchan_leaders = [r for r in leaders_rows if _norm_area(r.get("area_merchan")) == "merchan"]
-		diretoria_leaders = [r for r in leaders_rows if _norm_area(r.get("area_merchan")) == "diretoria"]
-		area_leaders = [
-			r
-			for r in leaders_rows
-			if _norm_area(r.get("area_merchan")) not in ("merchan", "diretoria")
-		]
-
-		# Métricas gerais
-		overall_day = scalar_metric(db.query_rows(overall_adherence_sql(dt_start, dt_end)))
-		overall_month = scalar_metric(db.query_rows(overall_adherence_sql(ms, me)))
-		overall_prev_week = scalar_metric(db.query_rows(overall_adherence_sql(ws_prev, we_prev)))
-
-		# Por área (para líder geral)
-		areas_day_rows = db.query_rows(area_totals_sql(dt_start, dt_end))
-		areas_month_rows = db.query_rows(area_totals_sql(ms, me))
-		areas_month_by_name: dict[str, AdherenceMetric] = {}
-		for row in areas_month_rows:
-			name = (row.get("area_merchan") or "Não Identificada").strip()
-			areas_month_by_name[name] = metric_from_row(row)
-
-		areas_prev_week_rows = None
-		areas_prev_week_by_name: dict[str, AdherenceMetric] | None = None
-		if include_grupos_diretoria:
-			areas_prev_week_rows = db.query_rows(area_totals_sql(ws_prev, we_prev))
-			# Reusa o dict do mês para consulta por área
-			areas_prev_week_by_name = areas_month_by_name
-
-		# Bloco de unidades importantes
-		grupo_rede_day_rows = None
-		grupo_rede_month_rows = None
-		if include_grupo_rede_merchan:
-			grupo_rede_day_rows = db.query_rows(grupo_rede_month_sql(dt_start, dt_end))
-			grupo_rede_month_rows = db.query_rows(grupo_rede_month_sql(ms, me))
-
-		grupos_semana_rows = None
-		grupos_mes_rows = None
-		if include_grupos_diretoria:
-			grupos_semana_rows = db.query_rows(grupos_importantes_sql(ws_prev, we_prev))
-			grupos_mes_rows = db.query_rows(grupos_importantes_sql(ms, me))
-
-		mensagens_envio: list[dict] = []
-		# 'Ontem' na mensagem refere-se ao dia consultado em dt_start/dt_end (ref)
-		ontem_label = ref.strftime("%d/%m")
-
-		# Líder Merchan (diário)
-		if not args.somente_diretoria:
-			for row in merchan_leaders:
-				leader_name = (row.get("colaborador_superior") or "").strip() or "Líder Merchan"
-				raw_phone = (row.get("telefone") or "").strip()
-				phone = TEST_PHONE_E164 if USE_TEST_PHONE else normalize_phone_to_e164(raw_phone)
-				msg = build_general_leader_message(
-					ref_date=ref,
-					day_label=ontem_label,
-					period2_label=month_label,
-					overall_day=overall_day,
-					overall_period2=overall_month,
-					areas_day=areas_day_rows,
-					areas_month_by_name=areas_month_by_name,
-					include_grupo_rede=include_grupo_rede_merchan,
-					grupo_rede_day_rows=grupo_rede_day_rows,
-					grupo_rede_month_rows=grupo_rede_month_rows,
-					grupo_rede_section_title="🏪 Grupos/Redes Importantes",
-					period2_title="Mês",
-				)
-				mensagens_envio.append(
-					{
-						"destinatario": leader_name,
-						"telefone": phone,
-						"mensagens": [msg],
-						"tipo": "lider_merchan",
-					}
-				)
-
-		# Diretoria (somente segunda)
-		if include_grupos_diretoria:
-			for row in diretoria_leaders:
-				leader_name = (row.get("colaborador_superior") or "").strip() or "Diretoria"
-				raw_phone = (row.get("telefone") or "").strip()
-				phone = TEST_PHONE_E164 if USE_TEST_PHONE else normalize_phone_to_e164(raw_phone)
-				msg = build_diretoria_message(
-					ref_date=ref,
-					semana_label=prev_week_label,
-					mes_label=month_label,
-					overall_semana=overall_prev_week,
-					overall_mes=overall_month,
-					areas_semana=areas_prev_week_rows,
-					areas_mes_by_name=areas_prev_week_by_name,
-					include_areas_section=True,
-					grupos_semana_rows=grupos_semana_rows,
-					grupos_mes_rows=grupos_mes_rows,
-					grupos_section_title="🏪 Grupos Econômicos Importantes",
-				)
-				mensagens_envio.append(
-					{
-						"destinatario": leader_name,
-						"telefone": phone,
-						"mensagens": [msg],
-						"tipo": "diretoria",
-					}
-				)
-
-		# Líderes de área
-		# Pode haver duplicidade se a tabela tiver mais de 1 linha por líder; dedup por colaborador_superior
-		if not args.somente_diretoria:
-			seen_area_leaders: set[str] = set()
-			for row in area_leaders:
-				leader_name = (row.get("colaborador_superior") or "").strip()
-				if not leader_name or leader_name in seen_area_leaders:
-					continue
-				seen_area_leaders.add(leader_name)
-
-				area_name = (row.get("area_merchan") or "Não Identificada").strip() or "Não Identificada"
-				raw_phone = (row.get("telefone") or "").strip()
-				phone = TEST_PHONE_E164 if USE_TEST_PHONE else normalize_phone_to_e164(raw_phone)
-
-			# Área (ontem e mês): deve refletir a área como um todo, mesmo que existam vários líderes
-				area_day_rows = db.query_rows(area_total_by_area_sql(area_name, dt_start, dt_end))
-				area_month_rows = db.query_rows(area_total_by_area_sql(area_name, ms, me))
-				area_day_metric = scalar_metric(area_day_rows)
-				area_month_metric = scalar_metric(area_month_rows)
-				if area_day_rows:
-					maybe_area = (area_day_rows[0].get("area_merchan") or "").strip()
-					if maybe_area:
-						area_name = maybe_area
-
-			# Colaboradores (ontem e mês) - por ÁREA (não por líder)
-				coll_day_rows = db.query_rows(area_collaborators_sql(area_name, dt_start, dt_end))
-				coll_month_rows = db.query_rows(area_collaborators_sql(area_name, ms, me))
-
-				coll_day_by_name: dict[str, AdherenceMetric] = {}
-				for r2 in coll_day_rows:
-					name = (r2.get("colaborador") or "").strip()
-					if name:
-						coll_day_by_name[name] = metric_from_row(r2)
-
-				coll_month_by_name: dict[str, AdherenceMetric] = {}
-				for r2 in coll_month_rows:
-					name = (r2.get("colaborador") or "").strip()
-					if name:
-						coll_month_by_name[name] = metric_from_row(r2)
-
-			# Se a área não tiver nenhum colaborador no período,
-			# não envia mensagem "vazia" (apenas cabeçalho).
-				all_names = set(coll_month_by_name.keys()) | set(coll_day_by_name.keys())
-				if not all_names:
-					print(
-						f"⚠ Pulando envio para {leader_name} ({area_name}): área sem colaboradores no período."
-					)
-					continue
-
-				msg = build_area_leader_message(
-					area_name=area_name,
-					leader_name=leader_name,
-					ref_date=ref,
-					month_label=month_label,
-					area_day=area_day_metric,
-					area_month=area_month_metric,
-					collaborators_day_by_name=coll_day_by_name,
-					collaborators_month_by_name=coll_month_by_name,
-				)
-
-				mensagens_envio.append(
-					{
-						"destinatario": leader_name,
-						"telefone": phone,
-						"mensagens": [msg],
-						"tipo": "lider_area",
-					}
-				)
-
-		modo_teste = args.teste or MODO_TESTE
 		if modo_teste:
-			print("\n" + "=" * 60)
-			print("MODO TESTE - PRÉVIA DAS MENSAGENS")
-			print("=" * 60)
-			print(f"Total de destinatários: {len(mensagens_envio)}")
-			print("=" * 60)
-			for i, item in enumerate(mensagens_envio, 1):
-				destinatario = item["destinatario"]
-				telefone = item["telefone"]
-				mensagens = item["mensagens"]
-				tipo = item.get("tipo", "")
-				print(f"\n[{i}/{len(mensagens_envio)}] {tipo.upper()}: {destinatario}")
-				print(f"Telefone: {telefone}")
-				for j, msg in enumerate(mensagens, 1):
-					print(f"\n--- Mensagem {j} ---")
-					print(msg)
+			imprimir_previa(mensagens_envio)
 			return 0
 
-		from whatsapp_sender import WhatsAppSender
-		sender = WhatsAppSender(
-			intervalo_entre_mensagens=WA_INTERVALO_ENTRE_MENSAGENS,
-			intervalo_mesmo_numero=WA_INTERVALO_MESMO_NUMERO,
-			espera_pos_envio=WA_ESPERA_POS_ENVIO,
-			wait_time_primeira=WA_WAIT_TIME_PRIMEIRA,
-			wait_time_padrao=WA_WAIT_TIME_PADRAO,
-			warmup_segundos=WA_WARMUP_SEGUNDOS,
-		)
-		sender.enviar_mensagens_lote(mensagens_envio, modo_teste=False)
+		ledger = criar_ledger()
+		if mensagens_envio:
+			with etapa("envio"):
+				enviar_lote(mensagens_envio, senders, ao_concluir_item=ledger.registrar_entrega if ledger else None)
+		if ledger is not None and filtro.sem_filtros():
+			ledger.concluir_se_entregue(hoje, mensagens_envio)
 		return 0
 	finally:
-		db.disconnect()
+		cancelar_envio(senders)
 
 
 if __name__ == "__main__":
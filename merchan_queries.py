@@ -2,45 +2,76 @@
 
 from __future__ import annotations
 
-from datetime import date
-
-from config import (
-    CHECKIN_VALIDOS,
-    GRUPOS_ECONOMICOS_IMPORTANTES,
-    REDES_IMPORTANTES,
-    TABLE_AREA_MERCHAN,
-    TABLE_FERIADO_MERCHAN,
-    TABLE_MONITORAMENTO,
-    TABLE_TELEFONE_LIDERANCA,
-)
+from datetime import date, timedelta
+
+import sargable_predicates
 from database import sql_date
+from tenants import PorEmpresa
+
 
+# Resolvidos pela empresa ativa (tenants) a cada consulta montada; sem empresa, valores do config
+CHECKIN_VALIDOS = PorEmpresa("CHECKIN_VALIDOS")
+GRUPOS_ECONOMICOS_IMPORTANTES = PorEmpresa("GRUPOS_ECONOMICOS_IMPORTANTES")
+REDES_IMPORTANTES = PorEmpresa("REDES_IMPORTANTES")
+TABLE_AREA_MERCHAN = PorEmpresa("TABLE_AREA_MERCHAN")
+TABLE_FERIADO_MERCHAN = PorEmpresa("TABLE_FERIADO_MERCHAN")
+TABLE_MONITORAMENTO = PorEmpresa("TABLE_MONITORAMENTO")
+TABLE_TELEFONE_LIDERANCA = PorEmpresa("TABLE_TELEFONE_LIDERANCA")
+# Telefones dos promotores (nome_colaborador, telefone); obrigatória com promotores ligados
+TABLE_TELEFONE_PROMOTOR = PorEmpresa("TABLE_TELEFONE_PROMOTOR")
 
-def _checkin_in_list_sql() -> str:
+
+def _checkin_in_list_sql(periodo: tuple[date, date] | None = None) -> str:
     # ('Manual','Manual e GPS')
-    itens = ", ".join([f"'{x}'" for x in CHECKIN_VALIDOS])
+    # Modo indexável: as grafias de tipocheckin realmente presentes no período
+    variantes = sargable_predicates.variantes(periodo)
+    valores = variantes.checkins if variantes is not None else list(CHECKIN_VALIDOS)
+    if not valores:
+        return "(NULL)"
+    itens = ", ".join([f"'{x.replace("'", "''")}'" for x in valores])
     return f"({itens})"
 
 
-def _fora_do_roteiro_nao_sql(alias: str = "mp") -> str:
+def _fora_do_roteiro_nao_sql(alias: str = "mp", periodo: tuple[date, date] | None = None) -> str:
     """Predicate to keep only visits that are NOT off-route.
 
     Business rule: only count visits where ForaDoRoteiro == 'Não'.
     We use an accent/case-insensitive collation so 'Nao'/'NÃO' also match.
+    In the index-friendly mode (sargable_predicates) the column is compared
+    as-is against the variants found in the period that normalize to 'nao'.
     """
     col = f"{alias}.ForaDoRoteiro"
+    variantes = sargable_predicates.variantes(periodo)
+    if variantes is not None:
+        partes = []
+        if variantes.fora_nao:
+            partes.append(f"{col} IN (" + ", ".join(f"'{x.replace("'", "''")}'" for x in variantes.fora_nao) + ")")
+        if variantes.fora_nulo:
+            partes.append(f"{col} IS NULL")
+        return "(" + " OR ".join(partes) + ")" if partes else "1 = 0"
     return (
         "LTRIM(RTRIM(ISNULL(" + col + ", 'Não'))) "
         "COLLATE Latin1_General_CI_AI = 'Nao'"
     )
 
 
-def _not_holiday_sql(alias: str = "mp", date_col: str = "DataVisita") -> str:
+def _not_holiday_sql(
+    alias: str = "mp", date_col: str = "DataVisita", periodo: tuple[date, date] | None = None
+) -> str:
     """Predicate to exclude holidays from adherence calculation.
 
     If CAST(<alias>.<date_col> AS DATE) exists in dimFeriadoMerchan, the row is ignored.
+    In the index-friendly mode the holidays of the period are known up front and
+    become plain date ranges on the column.
     """
     col = f"{alias}.{date_col}"
+    variantes = sargable_predicates.variantes(periodo)
+    if variantes is not None:
+        faixas = [
+            f"NOT ({col} >= CAST('{sql_date(ini)}' AS DATE) AND {col} < CAST('{sql_date(fim)}' AS DATE))"
+            for ini, fim in variantes.faixas_feriados()
+        ]
+        return "(" + " AND ".join(faixas) + ")" if faixas else "1 = 1"
     return (
         "NOT EXISTS ("
         f"SELECT 1 FROM {TABLE_FERIADO_MERCHAN} f "
@@ -61,12 +92,34 @@ LEFT JOIN {TABLE_TELEFONE_LIDERANCA} t
 """.strip()
 
 
+def roster_checksum_sql() -> str:
+    """Assinatura do roster (mesmo JOIN de leaders_with_area_and_phone_sql): muda quando o roster muda.
+
+    SHA-256 do conteúdo inteiro, em ordem fixa (CHECKSUM_AGG/BINARY_CHECKSUM deixa passar
+    trocas que se anulam no XOR). NVARCHAR(MAX) evita o limite de 8000 bytes do STRING_AGG.
+    """
+    linha = (
+        "CONCAT(a.colaborador_superior, NCHAR(31), a.area_merchan, NCHAR(31), "
+        "ISNULL(t.telefone, NCHAR(30)))"
+    )
+    return f"""
+SELECT
+    COUNT_BIG(*) AS linhas,
+    CONVERT(VARCHAR(64), HASHBYTES('SHA2_256', STRING_AGG(CAST({linha} AS NVARCHAR(MAX)), NCHAR(10))
+        WITHIN GROUP (ORDER BY a.colaborador_superior, a.area_merchan, t.telefone)), 2) AS roster_checksum
+FROM {TABLE_AREA_MERCHAN} a
+LEFT JOIN {TABLE_TELEFONE_LIDERANCA} t
+    ON t.nome_colaborador = a.colaborador_superior
+""".strip()
+
+
 def overall_adherence_sql(dt_start: date, dt_end: date) -> str:
     start = sql_date(dt_start)
     end = sql_date(dt_end)
-    checkins = _checkin_in_list_sql()
-    fora_ok = _fora_do_roteiro_nao_sql("mp")
-    not_holiday = _not_holiday_sql("mp", "DataVisita")
+    periodo = (dt_start, dt_end)
+    checkins = _checkin_in_list_sql(periodo)
+    fora_ok = _fora_do_roteiro_nao_sql("mp", periodo)
+    not_holiday = _not_holiday_sql("mp", "DataVisita", periodo)
 
     return f"""
 SELECT
@@ -87,9 +140,10 @@ WHERE mp.DataVisita >= CAST('{start}' AS DATE)
 def area_totals_sql(dt_start: date, dt_end: date) -> str:
     start = sql_date(dt_start)
     end = sql_date(dt_end)
-    checkins = _checkin_in_list_sql()
-    fora_ok = _fora_do_roteiro_nao_sql("mp")
-    not_holiday = _not_holiday_sql("mp", "DataVisita")
+    periodo = (dt_start, dt_end)
+    checkins = _checkin_in_list_sql(periodo)
+    fora_ok = _fora_do_roteiro_nao_sql("mp", periodo)
+    not_holiday = _not_holiday_sql("mp", "DataVisita", periodo)
 
     return f"""
 SELECT
@@ -115,10 +169,11 @@ ORDER BY area_merchan ASC
 def leader_area_total_sql(leader_name: str, dt_start: date, dt_end: date) -> str:
     start = sql_date(dt_start)
     end = sql_date(dt_end)
-    checkins = _checkin_in_list_sql()
+    periodo = (dt_start, dt_end)
+    checkins = _checkin_in_list_sql(periodo)
     leader_escaped = leader_name.replace("'", "''")
-    fora_ok = _fora_do_roteiro_nao_sql("mp")
-    not_holiday = _not_holiday_sql("mp", "DataVisita")
+    fora_ok = _fora_do_roteiro_nao_sql("mp", periodo)
+    not_holiday = _not_holiday_sql("mp", "DataVisita", periodo)
 
     return f"""
 SELECT
@@ -145,10 +200,11 @@ def area_total_by_area_sql(area_name: str, dt_start: date, dt_end: date) -> str:
     """Total da área (independente do líder), usando o mapeamento em dimAreaMerchan."""
     start = sql_date(dt_start)
     end = sql_date(dt_end)
-    checkins = _checkin_in_list_sql()
+    periodo = (dt_start, dt_end)
+    checkins = _checkin_in_list_sql(periodo)
     area_escaped = area_name.replace("'", "''")
-    fora_ok = _fora_do_roteiro_nao_sql("mp")
-    not_holiday = _not_holiday_sql("mp", "DataVisita")
+    fora_ok = _fora_do_roteiro_nao_sql("mp", periodo)
+    not_holiday = _not_holiday_sql("mp", "DataVisita", periodo)
 
     return f"""
 SELECT
@@ -174,10 +230,11 @@ GROUP BY dam.area_merchan
 def leader_collaborators_sql(leader_name: str, dt_start: date, dt_end: date) -> str:
     start = sql_date(dt_start)
     end = sql_date(dt_end)
-    checkins = _checkin_in_list_sql()
+    periodo = (dt_start, dt_end)
+    checkins = _checkin_in_list_sql(periodo)
     leader_escaped = leader_name.replace("'", "''")
-    fora_ok = _fora_do_roteiro_nao_sql("mp")
-    not_holiday = _not_holiday_sql("mp", "DataVisita")
+    fora_ok = _fora_do_roteiro_nao_sql("mp", periodo)
+    not_holiday = _not_holiday_sql("mp", "DataVisita", periodo)
 
     return f"""
 SELECT
@@ -206,10 +263,11 @@ def area_collaborators_sql(area_name: str, dt_start: date, dt_end: date) -> str:
     """
     start = sql_date(dt_start)
     end = sql_date(dt_end)
-    checkins = _checkin_in_list_sql()
+    periodo = (dt_start, dt_end)
+    checkins = _checkin_in_list_sql(periodo)
     area_escaped = area_name.replace("'", "''")
-    fora_ok = _fora_do_roteiro_nao_sql("mp")
-    not_holiday = _not_holiday_sql("mp", "DataVisita")
+    fora_ok = _fora_do_roteiro_nao_sql("mp", periodo)
+    not_holiday = _not_holiday_sql("mp", "DataVisita", periodo)
 
     return f"""
 SELECT
@@ -232,22 +290,225 @@ GROUP BY mp.Colaborador
 """.strip()
 
 
+def promoters_adherence_sql(day_start: date, day_end: date, month_start: date, month_end: date) -> str:
+    """Todos os promotores (mp.Colaborador) numa consulta só: ontem + mês + telefone.
+
+    O dia precisa estar contido no mês ([month_start, month_end)); as colunas do dia
+    são agregadas condicionalmente sobre as mesmas linhas do mês. Só contagens: os
+    percentuais saem delas em report_builder.build_promoter_messages.
+    """
+    d_start = sql_date(day_start)
+    d_end = sql_date(day_end)
+    start = sql_date(month_start)
+    end = sql_date(month_end)
+    periodo = (month_start, month_end)
+    checkins = _checkin_in_list_sql(periodo)
+    fora_ok = _fora_do_roteiro_nao_sql("mp", periodo)
+    not_holiday = _not_holiday_sql("mp", "DataVisita", periodo)
+    no_dia = f"mp.DataVisita >= CAST('{d_start}' AS DATE) AND mp.DataVisita < CAST('{d_end}' AS DATE)"
+
+    return f"""
+SELECT
+    mp.Colaborador AS colaborador,
+    MAX(t.telefone) AS telefone,
+    SUM(CASE WHEN {no_dia} AND mp.tipocheckin IN {checkins} THEN 1 ELSE 0 END) AS visitas_feitas_dia,
+    SUM(CASE WHEN {no_dia} AND mp.visitaid IS NOT NULL THEN 1 ELSE 0 END) AS visitas_planejadas_dia,
+    SUM(CASE WHEN mp.tipocheckin IN {checkins} THEN 1 ELSE 0 END) AS visitas_feitas,
+    COUNT(mp.visitaid) AS visitas_planejadas
+FROM {TABLE_MONITORAMENTO} mp
+LEFT JOIN (
+    SELECT nome_colaborador, MAX(telefone) AS telefone
+    FROM {TABLE_TELEFONE_PROMOTOR}
+    GROUP BY nome_colaborador
+) t
+    ON t.nome_colaborador = mp.Colaborador
+WHERE mp.DataVisita >= CAST('{start}' AS DATE)
+  AND mp.DataVisita < CAST('{end}' AS DATE)
+    AND {fora_ok}
+        AND {not_holiday}
+GROUP BY mp.Colaborador
+ORDER BY mp.Colaborador
+""".strip()
+
+
+def daily_visit_facts_sql(dt_start: date, dt_end: date) -> str:
+    """Fatos diários de visita (dia x área x colaborador) para o modo de recuperação.
+
+    Mesmas regras das consultas de aderência; as métricas geral/áreas/área/colaboradores
+    de qualquer período dentro de [dt_start, dt_end) saem da soma destas linhas.
+    Também é a fonte do rollup diário (daily_rollup), por isso o superior vem junto.
+    dimAreaMerchan entra com uma linha por colaborador_superior (a menor área, se ele
+    estiver listado mais de uma vez): cada visita aparece uma vez só, e a soma de todas
+    as linhas bate com overall_adherence_sql.
+    """
+    start = sql_date(dt_start)
+    end = sql_date(dt_end)
+    periodo = (dt_start, dt_end)
+    checkins = _checkin_in_list_sql(periodo)
+    fora_ok = _fora_do_roteiro_nao_sql("mp", periodo)
+    not_holiday = _not_holiday_sql("mp", "DataVisita", periodo)
+
+    return f"""
+SELECT
+    CAST(mp.DataVisita AS DATE) AS data_visita,
+    dam.area_merchan AS area_merchan,
+    CASE WHEN dam.colaborador_superior IS NULL THEN 0 ELSE 1 END AS area_mapeada,
+    mp.ColaboradorSuperior AS colaborador_superior,
+    mp.Colaborador AS colaborador,
+    SUM(CASE WHEN mp.tipocheckin IN {checkins} THEN 1 ELSE 0 END) AS visitas_feitas,
+    COUNT(mp.visitaid) AS visitas_planejadas
+FROM {TABLE_MONITORAMENTO} mp
+LEFT JOIN (
+    SELECT colaborador_superior, MIN(area_merchan) AS area_merchan
+    FROM {TABLE_AREA_MERCHAN}
+    GROUP BY colaborador_superior
+) dam
+    ON dam.colaborador_superior = mp.ColaboradorSuperior
+WHERE mp.DataVisita >= CAST('{start}' AS DATE)
+  AND mp.DataVisita < CAST('{end}' AS DATE)
+    AND {fora_ok}
+        AND {not_holiday}
+GROUP BY
+    CAST(mp.DataVisita AS DATE),
+    dam.area_merchan,
+    CASE WHEN dam.colaborador_superior IS NULL THEN 0 ELSE 1 END,
+    mp.ColaboradorSuperior,
+    mp.Colaborador
+""".strip()
+
+
+def promoter_phones_sql() -> str:
+    return f"""
+SELECT nome_colaborador AS colaborador, MAX(telefone) AS telefone
+FROM {TABLE_TELEFONE_PROMOTOR}
+GROUP BY nome_colaborador
+""".strip()
+
+
+def freshness_probe_sql(dias: list[date]) -> str:
+    """Volume carregado (visitas e check-ins válidos) de cada dia pedido, para a sonda de frescor.
+
+    Um intervalo por dia (usa o índice de DataVisita) em vez de varrer as semanas entre eles.
+    """
+    checkins = _checkin_in_list_sql((min(dias), max(dias) + timedelta(days=1)))
+    faixas = "\n    OR ".join(
+        f"(mp.DataVisita >= CAST('{sql_date(d)}' AS DATE) AND mp.DataVisita < CAST('{sql_date(d + timedelta(days=1))}' AS DATE))"
+        for d in dias
+    )
+
+    return f"""
+SELECT
+    CAST(mp.DataVisita AS DATE) AS data_visita,
+    SUM(CASE WHEN mp.tipocheckin IN {checkins} THEN 1 ELSE 0 END) AS visitas_feitas,
+    COUNT(mp.visitaid) AS visitas_planejadas
+FROM {TABLE_MONITORAMENTO} mp
+WHERE {faixas}
+GROUP BY CAST(mp.DataVisita AS DATE)
+""".strip()
+
+
+def predicate_variants_sql(dt_start: date, dt_end: date) -> str:
+    """Grafias distintas de ForaDoRoteiro/tipocheckin no período (modo indexável)."""
+    return f"""
+SELECT DISTINCT
+    mp.ForaDoRoteiro AS fora_do_roteiro,
+    mp.tipocheckin AS tipocheckin
+FROM {TABLE_MONITORAMENTO} mp
+WHERE mp.DataVisita >= CAST('{sql_date(dt_start)}' AS DATE)
+  AND mp.DataVisita < CAST('{sql_date(dt_end)}' AS DATE)
+""".strip()
+
+
+def holidays_between_sql(dt_start: date, dt_end: date) -> str:
+    return f"""
+SELECT f.data
+FROM {TABLE_FERIADO_MERCHAN} f
+WHERE f.data >= CAST('{sql_date(dt_start)}' AS DATE)
+  AND f.data < CAST('{sql_date(dt_end)}' AS DATE)
+""".strip()
+
+
+def holiday_check_sql(dia: date) -> str:
+    return f"""
+SELECT COUNT(*) AS feriado
+FROM {TABLE_FERIADO_MERCHAN} f
+WHERE f.data = CAST('{sql_date(dia)}' AS DATE)
+""".strip()
+
+
+def intraday_visits_sql(
+    dia: date,
+    desde_visitaid: int | None = None,
+    pendentes: list[int] | None = None,
+    coluna_alteracao: str | None = None,
+    desde_alteracao: str | None = None,
+) -> str:
+    """Visitas do dia (uma linha por visita) para o modo parcial (--parcial).
+
+    Sem marca d'água (desde_visitaid=None) traz o dia inteiro. Com marca, traz só:
+    - visitas novas (visitaid > desde_visitaid);
+    - visitas alteradas: coluna_alteracao > desde_alteracao, se a coluna estiver
+      configurada; senão, as visitas ainda pendentes que já têm check-in válido.
+      A lista de pendentes vai num IN literal: quem chama limita o tamanho
+      (INTRADIA_MAX_PENDENTES) e, acima disso, relê o dia inteiro.
+    """
+    start = sql_date(dia)
+    end = sql_date(dia + timedelta(days=1))
+    periodo = (dia, dia + timedelta(days=1))
+    checkins = _checkin_in_list_sql(periodo)
+    fora_ok = _fora_do_roteiro_nao_sql("mp", periodo)
+    not_holiday = _not_holiday_sql("mp", "DataVisita", periodo)
+
+    delta = "1 = 1"
+    if desde_visitaid is not None:
+        partes = [f"mp.visitaid > {int(desde_visitaid)}"]
+        if coluna_alteracao and desde_alteracao:
+            partes.append(f"mp.{coluna_alteracao} > CAST('{desde_alteracao}' AS DATETIME)")
+        elif pendentes:
+            ids = ", ".join(str(int(v)) for v in pendentes)
+            partes.append(f"(mp.visitaid IN ({ids}) AND mp.tipocheckin IN {checkins})")
+        delta = " OR ".join(partes)
+    marca = f",\n    CONVERT(VARCHAR(23), mp.{coluna_alteracao}, 121) AS alterado_em" if coluna_alteracao else ""
+
+    return f"""
+SELECT
+    mp.visitaid,
+    dam.area_merchan AS area_merchan,
+    CASE WHEN dam.colaborador_superior IS NULL THEN 0 ELSE 1 END AS area_mapeada,
+    mp.Colaborador AS colaborador,
+    CASE WHEN mp.tipocheckin IN {checkins} THEN 1 ELSE 0 END AS feita{marca}
+FROM {TABLE_MONITORAMENTO} mp
+LEFT JOIN {TABLE_AREA_MERCHAN} dam
+    ON dam.colaborador_superior = mp.ColaboradorSuperior
+WHERE mp.DataVisita >= CAST('{start}' AS DATE)
+  AND mp.DataVisita < CAST('{end}' AS DATE)
+  AND mp.visitaid IS NOT NULL
+    AND {fora_ok}
+        AND {not_holiday}
+  AND ({delta})
+""".strip()
+
+
 def unidades_importantes_sql(
     dt_start: date,
     dt_end_exclusive: date,
     *,
     include_grupos: bool = True,
     include_redes: bool = True,
+    por_dia: bool = False,
 ) -> str:
     """Aderência por unidades importantes (Grupos Econômicos e/ou Redes).
 
     Observação: o período é [dt_start, dt_end_exclusive).
+    por_dia=True devolve os fatos diários (data_visita, tipo_unidade, unidade, contagens)
+    para o modo de recuperação agregar vários períodos a partir de uma única extração.
     """
     start = sql_date(dt_start)
     end = sql_date(dt_end_exclusive)
-    checkins = _checkin_in_list_sql()
-    fora_ok = _fora_do_roteiro_nao_sql("mp")
-    not_holiday = _not_holiday_sql("mp", "DataVisita")
+    periodo = (dt_start, dt_end_exclusive)
+    checkins = _checkin_in_list_sql(periodo)
+    fora_ok = _fora_do_roteiro_nao_sql("mp", periodo)
+    not_holiday = _not_holiday_sql("mp", "DataVisita", periodo)
 
     if not include_grupos and not include_redes:
         # Query vazia (retorna 0 linhas)
@@ -259,6 +520,7 @@ def unidades_importantes_sql(
     ge_in = ", ".join([f"'{x.replace("'", "''")}'" for x in GRUPOS_ECONOMICOS_IMPORTANTES])
     rede_in = ", ".join([f"'{x.replace("'", "''")}'" for x in REDES_IMPORTANTES])
 
+    colunas_dia = ",\n        bc.data_visita,\n        '{tipo}' AS tipo_unidade" if por_dia else ""
     union_parts: list[str] = []
 
     if include_grupos:
@@ -267,7 +529,7 @@ def unidades_importantes_sql(
     SELECT
         dge.nomegrupo AS Unidade_Agregadora,
         bc.visitaid,
-        bc.tipocheckin
+        bc.tipocheckin{colunas_dia.format(tipo="grupo")}
     FROM BaseComCodigo bc
     INNER JOIN bi_rbdistrib.dbo.dimgrupoeconomico dge ON dge.codcliente = bc.codcliente_limpo
     WHERE dge.nomegrupo IN ({ge_in})
@@ -280,7 +542,7 @@ def unidades_importantes_sql(
     SELECT
         drc.nomeRede AS Unidade_Agregadora,
         bc.visitaid,
-        bc.tipocheckin
+        bc.tipocheckin{colunas_dia.format(tipo="rede")}
     FROM BaseComCodigo bc
     INNER JOIN bi_rbdistrib.dbo.dimcliente dc ON dc.codCliente = bc.codcliente_limpo
     INNER JOIN BI_RBDISTRIB.dbo.dimRedeCliente drc ON drc.codRede = dc.codRede
@@ -290,12 +552,39 @@ def unidades_importantes_sql(
 
     union_sql = "\n\n    UNION ALL\n\n".join(union_parts)
 
+    if por_dia:
+        select_final = f"""
+SELECT
+    data_visita,
+    tipo_unidade,
+    Unidade_Agregadora AS unidade,
+    SUM(CASE WHEN tipocheckin IN {checkins} THEN 1 ELSE 0 END) AS visitas_feitas,
+    COUNT(visitaid) AS visitas_planejadas
+FROM UniaoVisoes
+GROUP BY data_visita, tipo_unidade, Unidade_Agregadora
+"""
+    else:
+        select_final = f"""
+SELECT
+    Unidade_Agregadora AS unidade,
+    CAST(
+        (CAST(SUM(CASE WHEN tipocheckin IN {checkins} THEN 1 ELSE 0 END) AS FLOAT) /
+        NULLIF(COUNT(visitaid), 0)) * 100
+    AS DECIMAL(10,2)) AS aderencia_pct,
+    SUM(CASE WHEN tipocheckin IN {checkins} THEN 1 ELSE 0 END) AS visitas_feitas,
+    COUNT(visitaid) AS visitas_planejadas
+FROM UniaoVisoes
+GROUP BY Unidade_Agregadora
+ORDER BY visitas_planejadas DESC
+"""
+
     return f"""
 WITH BaseLimpa AS (
     SELECT
         mp.visitaid,
         mp.tipocheckin,
         mp.DataVisita,
+        CAST(mp.DataVisita AS DATE) AS data_visita,
         mp.ColaboradorSuperior,
         LTRIM(RTRIM(LEFT(mp.pontodevenda, CHARINDEX('-', mp.pontodevenda + '-') - 1))) AS cod_extraido
     FROM {TABLE_MONITORAMENTO} mp
@@ -315,19 +604,7 @@ BaseComCodigo AS (
 ),
 UniaoVisoes AS (
 {union_sql}
-)
-SELECT
-    Unidade_Agregadora AS unidade,
-    CAST(
-        (CAST(SUM(CASE WHEN tipocheckin IN {checkins} THEN 1 ELSE 0 END) AS FLOAT) /
-        NULLIF(COUNT(visitaid), 0)) * 100
-    AS DECIMAL(10,2)) AS aderencia_pct,
-    SUM(CASE WHEN tipocheckin IN {checkins} THEN 1 ELSE 0 END) AS visitas_feitas,
-    COUNT(visitaid) AS visitas_planejadas
-FROM UniaoVisoes
-GROUP BY Unidade_Agregadora
-ORDER BY visitas_planejadas DESC
-""".strip()
+){select_final}""".strip()
 
 
 def grupo_rede_month_sql(month_start: date, month_end_exclusive: date) -> str:
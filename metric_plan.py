@@ -0,0 +1,632 @@
+"""Plano de métricas sob demanda.
+
+Cada tipo de mensagem declara as métricas de que precisa. O planejador resolve
+os destinatários (roster + regras do dia + filtros da linha de comando), junta e
+deduplica as métricas e só então executa as consultas necessárias.
+
+Ex.: numa terça com --somente-area "Trad" só rodam as 4 consultas da área Trad;
+numa segunda com --somente-diretoria, só as 6 consultas da Diretoria.
+
+Promotores (tipo "promotor") são centenas de destinatários: entram no plano como um
+único destinatário-lote, com uma consulta para todos e uma mensagem por linha.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+
+import config
+import tenants
+from report_builder import (
+    AdherenceMetric,
+    build_area_leader_message,
+    build_diretoria_message,
+    build_general_leader_message,
+    build_org_leader_message,
+    build_promoter_messages,
+    metric_from_row,
+    normalize_phone_to_e164,
+)
+from stage_profiler import etapa
+from report_calendar import (
+    JANELA_DIA,
+    JANELA_MES,
+    JANELA_SEMANA_ANTERIOR,
+    ReportContext,
+)
+from recipient_index import motivo_telefone_invalido
+
+
+# Famílias de métricas -> nome da função em merchan_queries (importada só ao executar)
+FAMILIAS_SQL = {
+    "geral": "overall_adherence_sql",
+    "areas": "area_totals_sql",
+    "area": "area_total_by_area_sql",
+    "colaboradores": "area_collaborators_sql",
+    "grupo_rede": "grupo_rede_month_sql",
+    "grupos": "grupos_importantes_sql",
+    "promotores": "promoters_adherence_sql",
+}
+# Famílias cuja consulta recebe também o dia de referência: fn(dia_ini, dia_fim, ini, fim)
+FAMILIAS_DIA_E_JANELA = {"promotores"}
+# Famílias calculadas localmente: "modulo.funcao"(ctx, db) -> linhas
+FAMILIAS_LOCAIS = {
+    "moveis": "rolling_window.linhas_janelas_moveis",
+    "org": "org_tree.linhas_org",
+}
+
+# Famílias que saem das linhas de outra família da mesma janela, se ela estiver no
+# plano: área X = linha X das áreas. O geral continua com a própria consulta: as áreas
+# vêm de um LEFT JOIN em dimAreaMerchan e um superior repetido lá duplica visitas
+# nas áreas, mas não no geral
+FAMILIAS_DERIVADAS = {"area": "areas"}
+
+ENVIAR_PROMOTORES = getattr(config, "ENVIAR_PROMOTORES", False)
+# Colunas extras de janela móvel (dias úteis), ex.: (7, 28); vazio = desligado
+JANELAS_MOVEIS = tuple(getattr(config, "JANELAS_MOVEIS", ()) or ())
+
+
+@dataclass(frozen=True)
+class Metrica:
+    familia: str
+    janela: str
+    area: str | None = None
+
+    def descricao(self, ctx: ReportContext) -> str:
+        ini, fim = ctx.janela(self.janela)
+        alvo = f" [{self.area}]" if self.area else ""
+        return f"{self.familia}{alvo} {self.janela} ({ini.isoformat()} a {fim.isoformat()})"
+
+    def sql(self, ctx: ReportContext) -> str:
+        import merchan_queries
+
+        fn = getattr(merchan_queries, FAMILIAS_SQL[self.familia])
+        ini, fim = ctx.janela(self.janela)
+        if self.familia in FAMILIAS_DIA_E_JANELA:
+            return fn(ctx.dt_start, ctx.dt_end, ini, fim)
+        if self.area is not None:
+            return fn(self.area, ini, fim)
+        return fn(ini, fim)
+
+
+@dataclass
+class Destinatario:
+    tipo: str
+    nome: str
+    telefone: str
+    area: str | None = None
+
+
+def _funcao_local(familia: str):
+    import importlib
+
+    modulo, funcao = FAMILIAS_LOCAIS[familia].rsplit(".", 1)
+    return getattr(importlib.import_module(modulo), funcao)
+
+
+def _metricas_moveis() -> list["Metrica"]:
+    return [Metrica("moveis", JANELA_DIA)] if JANELAS_MOVEIS else []
+
+
+def _moveis(r: dict):
+    """chave -> {dias: métrica} das janelas móveis, ou None se o plano não as tiver."""
+    linhas = r.get(Metrica("moveis", JANELA_DIA))
+    if linhas is None:
+        return None
+    from rolling_window import moveis_por_chave
+
+    por_chave = moveis_por_chave(linhas)
+    tamanhos = sorted({int(x["dias"]) for x in linhas}) or sorted(JANELAS_MOVEIS)
+
+    def rolling(chave: str) -> dict[int, AdherenceMetric]:
+        atual = por_chave.get(chave, {})
+        return {k: atual.get(k, AdherenceMetric()) for k in tamanhos}
+
+    return rolling
+
+
+def scalar_metric(rows: list[dict] | None) -> AdherenceMetric:
+    if not rows:
+        return AdherenceMetric()
+    return metric_from_row(rows[0])
+
+
+def _norm_area(v: str | None) -> str:
+    return (v or "").strip().casefold()
+
+
+# ----------------------------------------------------------------------
+# Tipos de mensagem: métricas necessárias + montagem
+# ----------------------------------------------------------------------
+class TipoMensagem:
+    tipo = ""
+
+    def ativo(self, ctx: ReportContext) -> bool:
+        return True
+
+    def metricas(self, ctx: ReportContext, dest: Destinatario) -> list[Metrica]:
+        raise NotImplementedError
+
+    def montar(self, ctx: ReportContext, dest: Destinatario, r: dict[Metrica, list[dict]]) -> str | None:
+        """Monta a mensagem; None = não envia (ex.: área sem colaboradores)."""
+        raise NotImplementedError
+
+    def montar_lote(self, ctx: ReportContext, dest: Destinatario, r: dict[Metrica, list[dict]]) -> list[dict]:
+        """Itens de envio do destinatário (um por padrão; vários para destinatários-lote)."""
+        msg = self.montar(ctx, dest, r)
+        if msg is None:
+            return []
+        item = {"destinatario": dest.nome, "telefone": dest.telefone, "mensagens": [msg], "tipo": self.tipo}
+        if dest.area:
+            item["area"] = dest.area
+        return [item]
+
+
+class MensagemLiderMerchan(TipoMensagem):
+    tipo = "lider_merchan"
+
+    def metricas(self, ctx, dest):
+        m = [
+            Metrica("geral", JANELA_DIA),
+            Metrica("geral", JANELA_MES),
+            Metrica("areas", JANELA_DIA),
+            Metrica("areas", JANELA_MES),
+        ]
+        if ctx.include_grupo_rede_merchan:
+            m += [Metrica("grupo_rede", JANELA_DIA), Metrica("grupo_rede", JANELA_MES)]
+        return m + _metricas_moveis()
+
+    def montar(self, ctx, dest, r):
+        areas_month_by_name: dict[str, AdherenceMetric] = {}
+        for row in r[Metrica("areas", JANELA_MES)]:
+            name = (row.get("area_merchan") or "Não Identificada").strip()
+            areas_month_by_name[name] = metric_from_row(row)
+
+        moveis = _moveis(r)
+        areas_rolling_by_name = None
+        if moveis is not None:
+            areas_rolling_by_name = {}
+            for row in r[Metrica("areas", JANELA_DIA)]:
+                name = (row.get("area_merchan") or "Não Identificada").strip()
+                areas_rolling_by_name[name] = moveis(f"area|{name.casefold()}")
+
+        return build_general_leader_message(
+            ref_date=ctx.ref,
+            day_label=ctx.ontem_label,
+            period2_label=ctx.month_label,
+            overall_day=scalar_metric(r[Metrica("geral", JANELA_DIA)]),
+            overall_period2=scalar_metric(r[Metrica("geral", JANELA_MES)]),
+            areas_day=r[Metrica("areas", JANELA_DIA)],
+            areas_month_by_name=areas_month_by_name,
+            include_grupo_rede=ctx.include_grupo_rede_merchan,
+            grupo_rede_day_rows=r.get(Metrica("grupo_rede", JANELA_DIA)),
+            grupo_rede_month_rows=r.get(Metrica("grupo_rede", JANELA_MES)),
+            grupo_rede_section_title="🏪 Grupos/Redes Importantes",
+            period2_title="Mês",
+            overall_rolling=moveis("geral") if moveis is not None else None,
+            areas_rolling_by_name=areas_rolling_by_name,
+        )
+
+
+class MensagemDiretoria(TipoMensagem):
+    tipo = "diretoria"
+
+    def ativo(self, ctx):
+        return ctx.include_grupos_diretoria
+
+    def metricas(self, ctx, dest):
+        return [
+            Metrica("geral", JANELA_SEMANA_ANTERIOR),
+            Metrica("geral", JANELA_MES),
+            Metrica("areas", JANELA_SEMANA_ANTERIOR),
+            Metrica("areas", JANELA_MES),
+            Metrica("grupos", JANELA_SEMANA_ANTERIOR),
+            Metrica("grupos", JANELA_MES),
+        ]
+
+    def montar(self, ctx, dest, r):
+        areas_mes_by_name: dict[str, AdherenceMetric] = {}
+        for row in r[Metrica("areas", JANELA_MES)]:
+            name = (row.get("area_merchan") or "Não Identificada").strip()
+            areas_mes_by_name[name] = metric_from_row(row)
+
+        return build_diretoria_message(
+            ref_date=ctx.ref,
+            semana_label=ctx.prev_week_label,
+            mes_label=ctx.month_label,
+            overall_semana=scalar_metric(r[Metrica("geral", JANELA_SEMANA_ANTERIOR)]),
+            overall_mes=scalar_metric(r[Metrica("geral", JANELA_MES)]),
+            areas_semana=r[Metrica("areas", JANELA_SEMANA_ANTERIOR)],
+            areas_mes_by_name=areas_mes_by_name,
+            include_areas_section=True,
+            grupos_semana_rows=r[Metrica("grupos", JANELA_SEMANA_ANTERIOR)],
+            grupos_mes_rows=r[Metrica("grupos", JANELA_MES)],
+            grupos_section_title="🏪 Grupos Econômicos Importantes",
+        )
+
+
+class MensagemLiderArea(TipoMensagem):
+    tipo = "lider_area"
+
+    def metricas(self, ctx, dest):
+        # Área (ontem e mês): deve refletir a área como um todo, mesmo que existam vários líderes.
+        # Colaboradores (ontem e mês) - por ÁREA (não por líder)
+        return [
+            Metrica("area", JANELA_DIA, dest.area),
+            Metrica("area", JANELA_MES, dest.area),
+            Metrica("colaboradores", JANELA_DIA, dest.area),
+            Metrica("colaboradores", JANELA_MES, dest.area),
+        ] + _metricas_moveis()
+
+    def montar(self, ctx, dest, r):
+        area_name = dest.area
+        area_day_rows = r[Metrica("area", JANELA_DIA, dest.area)]
+        if area_day_rows:
+            maybe_area = (area_day_rows[0].get("area_merchan") or "").strip()
+            if maybe_area:
+                area_name = maybe_area
+
+        coll_day_by_name: dict[str, AdherenceMetric] = {}
+        for r2 in r[Metrica("colaboradores", JANELA_DIA, dest.area)]:
+            name = (r2.get("colaborador") or "").strip()
+            if name:
+                coll_day_by_name[name] = metric_from_row(r2)
+
+        coll_month_by_name: dict[str, AdherenceMetric] = {}
+        for r2 in r[Metrica("colaboradores", JANELA_MES, dest.area)]:
+            name = (r2.get("colaborador") or "").strip()
+            if name:
+                coll_month_by_name[name] = metric_from_row(r2)
+
+        # Se a área não tiver nenhum colaborador no período,
+        # não envia mensagem "vazia" (apenas cabeçalho).
+        if not (set(coll_month_by_name) | set(coll_day_by_name)):
+            print(f"⚠ Pulando envio para {dest.nome} ({area_name}): área sem colaboradores no período.")
+            return None
+
+        moveis = _moveis(r)
+        area_rolling = coll_rolling_by_name = None
+        if moveis is not None:
+            area_key = (dest.area or "").strip().casefold()
+            area_rolling = moveis(f"area|{area_key}")
+            coll_rolling_by_name = {name: moveis(f"colab|{area_key}|{name.casefold()}") for name in coll_day_by_name}
+
+        return build_area_leader_message(
+            area_name=area_name,
+            leader_name=dest.nome,
+            ref_date=ctx.ref,
+            month_label=ctx.month_label,
+            area_day=scalar_metric(area_day_rows),
+            area_month=scalar_metric(r[Metrica("area", JANELA_MES, dest.area)]),
+            collaborators_day_by_name=coll_day_by_name,
+            collaborators_month_by_name=coll_month_by_name,
+            area_rolling=area_rolling,
+            collaborators_rolling_by_name=coll_rolling_by_name,
+        )
+
+
+class MensagemLiderOrg(TipoMensagem):
+    """Líder com sub-líderes na ORG_PAIS: total da subárvore + uma linha por equipe abaixo."""
+
+    tipo = "lider_org"
+
+    def metricas(self, ctx, dest):
+        # Uma família para todos os nós da árvore (uma extração, agregação em memória)
+        return [Metrica("org", JANELA_DIA)]
+
+    def montar(self, ctx, dest, r):
+        from org_tree import MetricasOrg, id_lider
+
+        org = MetricasOrg(r[Metrica("org", JANELA_DIA)])
+        no = id_lider(dest.nome)
+        equipes = org.equipes(no, (JANELA_DIA, JANELA_MES))
+        if no not in org.nos or not equipes:
+            print(f"⚠ Pulando envio para {dest.nome}: equipe sem visitas planejadas no período.")
+            return None
+
+        return build_org_leader_message(
+            node_name=org.nos[no]["nome"],
+            ref_date=ctx.ref,
+            day_label=ctx.ontem_label,
+            month_label=ctx.month_label,
+            total_day=org.metrica(no, JANELA_DIA),
+            total_month=org.metrica(no, JANELA_MES),
+            teams=[(nome, dia, mes) for nome, (dia, mes) in equipes],
+        )
+
+
+class MensagemPromotor(TipoMensagem):
+    """Todos os promotores de uma vez: o destinatário é o lote e cada linha vira um envio.
+
+    dest.telefone preenchido (número de teste): sai uma mensagem de amostra só, e não
+    uma por promotor no mesmo telefone.
+    """
+
+    tipo = "promotor"
+
+    def metricas(self, ctx, dest):
+        return [Metrica("promotores", JANELA_MES)]
+
+    def montar_lote(self, ctx, dest, r):
+        renderizadas = build_promoter_messages(
+            r[Metrica("promotores", JANELA_MES)], ctx.ontem_label, ctx.month_label
+        )
+        if dest.telefone:
+            if not renderizadas:
+                return []
+            row, msg = renderizadas[0]
+            print(f"🧪 Número de teste: 1 mensagem de amostra de {len(renderizadas)} promotor(es).")
+            nome = (row.get("colaborador") or "").strip()
+            return [
+                {
+                    "destinatario": f"Promotores (amostra: {nome})",
+                    "telefone": dest.telefone,
+                    "mensagens": [msg],
+                    "tipo": self.tipo,
+                }
+            ]
+
+        lote: list[dict] = []
+        sem_telefone = 0
+        for row, msg in renderizadas:
+            telefone = normalize_phone_to_e164(row.get("telefone") or "")
+            if motivo_telefone_invalido(telefone):
+                sem_telefone += 1
+                continue
+            lote.append(
+                {
+                    "destinatario": (row.get("colaborador") or "").strip(),
+                    "telefone": telefone,
+                    "mensagens": [msg],
+                    "tipo": self.tipo,
+                }
+            )
+        if sem_telefone:
+            print(f"⚠ {sem_telefone} promotor(es) sem telefone válido: não recebem a mensagem.")
+        return lote
+
+
+TIPOS_MENSAGEM: dict[str, TipoMensagem] = {
+    t.tipo: t
+    for t in (MensagemLiderMerchan(), MensagemDiretoria(), MensagemLiderArea(), MensagemLiderOrg(), MensagemPromotor())
+}
+
+
+# ----------------------------------------------------------------------
+# Planejamento
+# ----------------------------------------------------------------------
+@dataclass
+class FiltroExecucao:
+    somente_diretoria: bool = False
+    somente_areas: list[str] = field(default_factory=list)
+    somente_tipos: list[str] = field(default_factory=list)
+    incluir_promotores: bool = ENVIAR_PROMOTORES
+
+    def sem_filtros(self) -> bool:
+        """Execução completa do dia (nenhum recorte por tipo/área)."""
+        return not (self.somente_diretoria or self.somente_areas or self.somente_tipos)
+
+    def aceita(self, tipo: str, area: str | None = None) -> bool:
+        if tipo == "promotor" and not (self.incluir_promotores or "promotor" in self.somente_tipos):
+            return False
+        if self.somente_tipos and tipo not in self.somente_tipos:
+            return False
+        if self.somente_diretoria:
+            return tipo == "diretoria"
+        if self.somente_areas:
+            alvos = {_norm_area(a) for a in self.somente_areas}
+            return tipo in ("lider_area", "lider_org") and _norm_area(area) in alvos
+        return True
+
+
+def erro_config_promotores(filtro: FiltroExecucao) -> str | None:
+    """Promotores no lote sem TABLE_TELEFONE_PROMOTOR (da empresa ativa): o motivo; senão None."""
+    if not filtro.aceita("promotor") or tenants.valor("TABLE_TELEFONE_PROMOTOR"):
+        return None
+    return "promotores ligados (ENVIAR_PROMOTORES/--promotores) exigem TABLE_TELEFONE_PROMOTOR no config"
+
+
+def resolver_destinatarios(
+    leaders_rows: list[dict],
+    ctx: ReportContext,
+    filtro: FiltroExecucao,
+    telefone_teste: str | None = None,
+) -> list[Destinatario]:
+    """Roster -> destinatários do dia (papel, regras do dia e filtros).
+
+    leaders_rows vem de recipient_index (uma linha por pessoa e papel, telefone já
+    validado); contato com telefone inválido fica de fora, salvo com número de teste.
+    Líder que é pai de alguém na ORG_PAIS recebe o relatório da subárvore (lider_org).
+    """
+    from org_tree import org_pais
+
+    def telefone(row: dict) -> str:
+        raw_phone = (row.get("telefone") or "").strip()
+        return telefone_teste if telefone_teste else normalize_phone_to_e164(raw_phone)
+
+    merchan: list[Destinatario] = []
+    diretoria: list[Destinatario] = []
+    areas: list[Destinatario] = []
+    # Rede de segurança para linhas que não passaram pelo índice: um destinatário por líder de área
+    seen_area_leaders: set[str] = set()
+    pais_org = {_norm_area(p): p.strip() for p in org_pais().values()}
+
+    for row in leaders_rows:
+        if row.get("telefone_invalido") and not telefone_teste:
+            continue
+        papel = _norm_area(row.get("area_merchan"))
+        nome = (row.get("colaborador_superior") or "").strip()
+        if papel == "merchan":
+            merchan.append(Destinatario("lider_merchan", nome or "Líder Merchan", telefone(row)))
+        elif papel == "diretoria":
+            diretoria.append(Destinatario("diretoria", nome or "Diretoria", telefone(row)))
+        else:
+            if not nome or nome in seen_area_leaders:
+                continue
+            seen_area_leaders.add(nome)
+            area = (row.get("area_merchan") or "Não Identificada").strip() or "Não Identificada"
+            tipo = "lider_org" if _norm_area(nome) in pais_org else "lider_area"
+            areas.append(Destinatario(tipo, nome, telefone(row), area))
+
+    no_roster = {_norm_area(row.get(c)) for row in leaders_rows for c in ("colaborador_superior", "area_merchan")}
+    for chave in sorted(set(pais_org) - no_roster):
+        print(f"⚠ ORG_PAIS: {pais_org[chave]} não está no roster (sem telefone): não recebe o relatório da equipe.")
+
+    # Promotores não vêm do roster: um destinatário-lote, resolvido na montagem
+    promotores = [Destinatario("promotor", "Promotores", telefone_teste or "")]
+    erro = erro_config_promotores(filtro)
+    if erro:
+        raise ValueError(erro)
+
+    destinatarios = []
+    for dest in merchan + diretoria + areas + promotores:
+        if not TIPOS_MENSAGEM[dest.tipo].ativo(ctx):
+            continue
+        if not filtro.aceita(dest.tipo, dest.area):
+            continue
+        destinatarios.append(dest)
+    return destinatarios
+
+
+@dataclass
+class PlanoMetricas:
+    ctx: ReportContext
+    destinatarios: list[Destinatario]
+    metricas: list[Metrica]
+    por_destinatario: list[tuple[Destinatario, list[Metrica]]]
+
+
+def planejar(ctx: ReportContext, destinatarios: list[Destinatario]) -> PlanoMetricas:
+    metricas: list[Metrica] = []
+    vistas: set[Metrica] = set()
+    por_destinatario = []
+    for dest in destinatarios:
+        necessarias = TIPOS_MENSAGEM[dest.tipo].metricas(ctx, dest)
+        por_destinatario.append((dest, necessarias))
+        for m in necessarias:
+            if m not in vistas:
+                vistas.add(m)
+                metricas.append(m)
+    return PlanoMetricas(ctx, destinatarios, metricas, por_destinatario)
+
+
+def derivacoes(plano: PlanoMetricas, metricas: list[Metrica] | None = None) -> dict[Metrica, Metrica]:
+    """Métrica -> métrica do plano de onde ela sai em memória, sem consulta.
+
+    - mesmo período absoluto de outra da mesma família/área (ex.: dia 2, "mês" = "ontem"):
+      reaproveita o resultado;
+    - FAMILIAS_DERIVADAS: soma/filtra as linhas da família de origem na mesma janela.
+    """
+    ctx = plano.ctx
+    no_plano = set(plano.metricas)
+    primeira: dict[tuple, Metrica] = {}
+    origem: dict[Metrica, Metrica] = {}
+    for m in plano.metricas:
+        chave = (m.familia, m.area, ctx.janela(m.janela))
+        if m.familia in FAMILIAS_LOCAIS:
+            continue
+        if chave in primeira:
+            origem[m] = primeira[chave]
+            continue
+        primeira[chave] = m
+        fonte = Metrica(FAMILIAS_DERIVADAS[m.familia], m.janela) if m.familia in FAMILIAS_DERIVADAS else None
+        if fonte is not None and fonte in no_plano:
+            origem[m] = fonte
+    if metricas is not None:
+        origem = {m: f for m, f in origem.items() if m in metricas}
+    return origem
+
+
+def derivar(m: Metrica, fonte: Metrica, linhas: list[dict]) -> list[dict]:
+    """Linhas de m (mesmo formato da consulta) a partir das linhas de fonte."""
+    if m.familia == fonte.familia:
+        return linhas
+    if m.familia == "area":
+        alvo = _norm_area(m.area)
+        return [r for r in linhas if _norm_area(r.get("area_merchan") or "Não Identificada") == alvo]
+    raise ValueError(f"Família sem derivação: {m.familia}")
+
+
+def explicar(plano: PlanoMetricas) -> None:
+    ctx = plano.ctx
+    print("\n" + "=" * 60)
+    print("PLANO DE EXECUÇÃO")
+    print("=" * 60)
+    print(f"Data de execução: {ctx.hoje.isoformat()} | Referência (ontem): {ctx.ref.isoformat()}")
+    print(f"Destinatários: {len(plano.destinatarios)}")
+    for dest, metricas in plano.por_destinatario:
+        alvo = f" ({dest.area})" if dest.area else ""
+        print(f"- {dest.tipo.upper()}: {dest.nome}{alvo} -> {len(metricas)} métricas")
+    origem = derivacoes(plano)
+    print(f"\nConsultas a executar: {len(plano.metricas) - len(origem)} (sem contar o roster)")
+    for i, m in enumerate(plano.metricas, 1):
+        fonte = origem.get(m)
+        derivada = f"  <- em memória, de {fonte.familia} {fonte.janela}" if fonte is not None else ""
+        print(f"  {i:>2}. {m.descricao(ctx)}{derivada}")
+    print("=" * 60)
+
+
+def _preparar_predicados(plano: PlanoMetricas, db, metricas: list[Metrica]) -> None:
+    """Modo indexável: grafias/feriados descobertos uma vez para o período de todas as consultas."""
+    import sargable_predicates
+
+    if not metricas or not sargable_predicates.ativo():
+        return
+    periodos = [plano.ctx.janela(m.janela) for m in metricas]
+    if any(m.familia in FAMILIAS_DIA_E_JANELA for m in metricas):
+        periodos.append((plano.ctx.dt_start, plano.ctx.dt_end))
+    with etapa("metricas;predicados"):
+        sargable_predicates.preparar(db, min(p[0] for p in periodos), max(p[1] for p in periodos))
+
+
+def executar(plano: PlanoMetricas, db, cache: dict | None = None) -> dict[Metrica, list[dict]]:
+    """Roda cada métrica do plano uma única vez.
+
+    cache: dict opcional (modo serviço) reaproveitado entre execuções; a chave
+    inclui o período absoluto, então um cache antigo nunca serve outra data.
+    """
+    resultados: dict[Metrica, list[dict]] = {}
+    pendentes = [m for m in plano.metricas if cache is None or (m, plano.ctx.janela(m.janela)) not in cache]
+    # Janelas já publicadas no rollup diário (ROLLUP_LER) saem de uma leitura só
+    from daily_rollup import resultados_do_rollup
+
+    do_rollup = resultados_do_rollup(plano, db, pendentes) if pendentes else {}
+    # Geral/área/mesmo período saem de linhas que o plano já traz (somando contagens)
+    origem = derivacoes(plano, [m for m in pendentes if m not in do_rollup])
+    _preparar_predicados(
+        plano,
+        db,
+        [m for m in pendentes if m not in do_rollup and m not in origem and m.familia not in FAMILIAS_LOCAIS],
+    )
+
+    def resolver(m: Metrica) -> list[dict]:
+        if m in resultados:
+            return resultados[m]
+        chave = (m, plano.ctx.janela(m.janela))
+        if cache is not None and chave in cache:
+            resultados[m] = cache[chave]
+            return resultados[m]
+        linhas_fonte = resolver(origem[m]) if m in origem and m not in do_rollup else None
+        with etapa(f"metricas;{m.familia}"):
+            if m in do_rollup:
+                resultados[m] = do_rollup[m]
+            elif linhas_fonte is not None:
+                resultados[m] = derivar(m, origem[m], linhas_fonte)
+            elif m.familia in FAMILIAS_LOCAIS:
+                resultados[m] = _funcao_local(m.familia)(plano.ctx, db)
+            else:
+                resultados[m] = db.query_rows(m.sql(plano.ctx))
+        if cache is not None:
+            cache[chave] = resultados[m]
+        return resultados[m]
+
+    for m in plano.metricas:
+        resolver(m)
+    return {m: resultados[m] for m in plano.metricas}
+
+
+def montar_mensagens(plano: PlanoMetricas, resultados: dict[Metrica, list[dict]]) -> list[dict]:
+    mensagens_envio: list[dict] = []
+    for dest in plano.destinatarios:
+        mensagens_envio.extend(TIPOS_MENSAGEM[dest.tipo].montar_lote(plano.ctx, dest, resultados))
+    return mensagens_envio
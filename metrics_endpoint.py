@@ -0,0 +1,274 @@
+"""Consulta local (somente leitura) das métricas e mensagens já calculadas.
+
+"Quanto deu a área X ontem?" sem rodar o main de novo e sem consultar o banco:
+as respostas saem dos snapshots de SNAPSHOT_DIR (toda execução grava um). Todos os
+snapshots do dia entram, o mais recente valendo por métrica/destinatário, então
+uma reexecução filtrada (--somente-area) não esconde o resto do dia. Cada arquivo
+é lido uma vez e fica em memória (os METRICAS_CACHE_SNAPSHOTS usados por último);
+a execução do próprio processo (modo serviço) entra direto, sem reler o arquivo.
+
+Rotas (GET, JSON):
+- /metricas?data=2026-01-12&area=Trad&colaborador=Joao&empresa=outra
+- /mensagens?data=2026-01-12&area=Trad&destinatario=Ana&tipo=lider_area
+`data` é o dia de referência ("ontem" do relatório); sem `data`, o mais recente.
+Resposta com ETag; If-None-Match igual devolve 304 sem corpo.
+
+Uso: python main.py --metricas  (no modo serviço, as rotas ficam na SERVICO_PORTA)
+"""
+
+from __future__ import annotations
+
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import config
+import tenants
+from metric_plan import Metrica
+from report_calendar import ReportContext, reference_date
+from run_snapshot import carregar_snapshot
+
+
+METRICAS_HOST = getattr(config, "METRICAS_HOST", "127.0.0.1")
+METRICAS_PORTA = getattr(config, "METRICAS_PORTA", 8766)
+# Snapshots mantidos em memória (os usados por último); o processo do serviço roda por meses
+METRICAS_CACHE_SNAPSHOTS = getattr(config, "METRICAS_CACHE_SNAPSHOTS", 32)
+
+ROTAS = ("/metricas", "/mensagens")
+
+_NOME_SNAPSHOT = re.compile(r"snapshot_(\d{4}-\d{2}-\d{2})_(\d{6})\.json(\.gz)?$")
+
+
+def _norm(v) -> str:
+    return str(v or "").strip().casefold()
+
+
+@dataclass
+class Execucao:
+    """Uma execução lida de um snapshot (ou registrada pelo próprio processo)."""
+
+    versao: str
+    ctx: ReportContext
+    gerado_em: str
+    resultados: dict[Metrica, list[dict]]
+    # Sem telefone: a consulta é sobre números do relatório, não sobre contatos
+    mensagens: list[dict]
+
+
+def _execucao(versao: str, ctx: ReportContext, gerado_em: str, resultados: dict, mensagens_envio: list[dict]) -> Execucao:
+    mensagens = [{k: v for k, v in item.items() if k != "telefone"} for item in mensagens_envio]
+    return Execucao(versao, ctx, gerado_em, resultados, mensagens)
+
+
+_lock = threading.Lock()
+# caminho -> (mtime, execução): cada snapshot é lido uma vez; LRU limitado a METRICAS_CACHE_SNAPSHOTS
+_lidos: OrderedDict[str, tuple[float, Execucao]] = OrderedDict()
+
+
+def _guardar(arquivo: str, mtime: float, execucao: Execucao) -> None:
+    with _lock:
+        _lidos[arquivo] = (mtime, execucao)
+        _lidos.move_to_end(arquivo)
+        while len(_lidos) > max(1, METRICAS_CACHE_SNAPSHOTS):
+            _lidos.popitem(last=False)
+
+
+def registrar(arquivo: str | None, ctx: ReportContext, resultados: dict, mensagens_envio: list[dict]) -> None:
+    """Execução deste processo: entra em memória sem reler o snapshot recém-gravado."""
+    if not arquivo:
+        return
+    try:
+        mtime = os.path.getmtime(arquivo)
+    except OSError:
+        return
+    gerado_em = datetime.fromtimestamp(mtime).isoformat(timespec="seconds")
+    _guardar(arquivo, mtime, _execucao(f"{arquivo}@{mtime}", ctx, gerado_em, resultados, mensagens_envio))
+
+
+def _ler(arquivo: str) -> Execucao | None:
+    try:
+        mtime = os.path.getmtime(arquivo)
+    except OSError:
+        return None
+    with _lock:
+        lido = _lidos.get(arquivo)
+        if lido is not None and lido[0] == mtime:
+            _lidos.move_to_end(arquivo)
+            return lido[1]
+    try:
+        snap = carregar_snapshot(arquivo)
+    except Exception as e:
+        print(f"⚠ Snapshot ilegível ignorado ({arquivo}): {e}")
+        return None
+    execucao = _execucao(f"{arquivo}@{mtime}", snap.ctx, snap.gerado_em, snap.resultados, snap.mensagens_envio)
+    _guardar(arquivo, mtime, execucao)
+    return execucao
+
+
+def _snapshots() -> list[tuple[date, str, str]]:
+    """(dia de execução, hora, caminho) dos snapshots da empresa ativa, do mais antigo ao mais recente."""
+    diretorio = tenants.arquivo_da_empresa(getattr(config, "SNAPSHOT_DIR", "snapshots"))
+    if not diretorio:
+        return []
+    saida = []
+    for caminho in glob.glob(os.path.join(diretorio, "snapshot_*.json*")):
+        m = _NOME_SNAPSHOT.search(os.path.basename(caminho))
+        if m:
+            saida.append((date.fromisoformat(m.group(1)), m.group(2), caminho))
+    return sorted(saida)
+
+
+def execucoes_do_dia(ref: date | None) -> list[Execucao]:
+    """Execuções cuja referência é `ref` (None = a referência mais recente), da mais antiga à mais nova."""
+    arquivos = _snapshots()
+    if ref is None:
+        if not arquivos:
+            return []
+        ref = reference_date(arquivos[-1][0])
+    # Referência -> dias de execução possíveis (segunda referencia o sábado)
+    dias = {ref + timedelta(days=1), ref + timedelta(days=2)}
+    execucoes = [_ler(caminho) for dia, _, caminho in arquivos if dia in dias and reference_date(dia) == ref]
+    return [e for e in execucoes if e is not None]
+
+
+def _area_e_colaborador(m: Metrica, r: dict) -> tuple[str, str]:
+    area = m.area or r.get("area_merchan") or ""
+    colaborador = r.get("colaborador") or ""
+    if m.familia == "org" and r.get("tipo") == "area":
+        area = r.get("nome") or ""
+    chave = r.get("chave")
+    if chave:
+        # Janelas móveis: "area|<área>" / "colab|<área>|<colaborador>"
+        partes = str(chave).split("|")
+        if len(partes) > 1:
+            area = partes[1]
+        if len(partes) > 2:
+            colaborador = partes[2]
+    return _norm(area), _norm(colaborador)
+
+
+def _periodo(ctx: ReportContext, m: Metrica, r: dict) -> dict:
+    """{"de", "ate"} da linha; janelas móveis (linha com "dias") não têm período fixo."""
+    if "dias" in r:
+        return {}
+    janela = r.get("janela") if m.familia == "org" else m.janela
+    ini, fim = ctx.janela(janela)
+    return {"de": ini.isoformat(), "ate": (fim - timedelta(days=1)).isoformat()}
+
+
+def consultar(rota: str, filtros: dict[str, str]) -> tuple[str, dict] | None:
+    """(ETag, corpo) da rota com os filtros; None = nenhuma execução para a data."""
+    ref = date.fromisoformat(filtros["data"]) if filtros.get("data") else None
+    execucoes = execucoes_do_dia(ref)
+    if not execucoes:
+        return None
+    etag = hashlib.sha1(
+        json.dumps([rota, sorted(filtros.items()), [e.versao for e in execucoes]]).encode("utf-8")
+    ).hexdigest()
+    recente = execucoes[-1]
+    corpo = {
+        "referencia": recente.ctx.ref.isoformat(),
+        "gerado_em": recente.gerado_em,
+        "execucoes": len(execucoes),
+    }
+    area, colaborador = _norm(filtros.get("area")), _norm(filtros.get("colaborador"))
+
+    if rota == "/metricas":
+        # A execução mais recente vale por métrica (família/janela/área)
+        por_metrica: dict[Metrica, tuple[ReportContext, list[dict]]] = {}
+        for e in execucoes:
+            por_metrica.update((m, (e.ctx, linhas)) for m, linhas in e.resultados.items())
+        metricas = []
+        for m, (ctx, linhas) in por_metrica.items():
+            for r in linhas:
+                a, c = _area_e_colaborador(m, r)
+                if (area and a != area) or (colaborador and c != colaborador):
+                    continue
+                metricas.append({"familia": m.familia, "janela": m.janela, **_periodo(ctx, m, r), **r})
+        corpo["metricas"] = metricas
+    else:
+        destinatario, tipo = _norm(filtros.get("destinatario")), _norm(filtros.get("tipo"))
+        por_destinatario: dict[tuple, dict] = {}
+        for e in execucoes:
+            for item in e.mensagens:
+                por_destinatario[(_norm(item.get("tipo")), _norm(item.get("destinatario")))] = item
+        corpo["mensagens"] = [
+            item
+            for (t, d), item in por_destinatario.items()
+            if (not destinatario or d == destinatario)
+            and (not tipo or t == tipo)
+            and (not area or _norm(item.get("area")) == area)
+        ]
+    return etag, corpo
+
+
+def atender(handler: BaseHTTPRequestHandler, empresa_padrao: str | None = None) -> None:
+    """Responde um GET de ROTAS num handler do http.server (daqui ou do modo serviço)."""
+    url = urlparse(handler.path)
+    q = parse_qs(url.query)
+    filtros = {k: v[0].strip() for k, v in q.items() if v and v[0].strip()}
+
+    def responder(codigo: int, corpo: dict | None, etag: str | None = None) -> None:
+        dados = json.dumps(corpo, ensure_ascii=False, default=str).encode("utf-8") if corpo is not None else b""
+        handler.send_response(codigo)
+        if etag:
+            handler.send_header("ETag", f'"{etag}"')
+            handler.send_header("Cache-Control", "no-cache")
+        if corpo is not None:
+            handler.send_header("Content-Type", "application/json; charset=utf-8")
+        handler.send_header("Content-Length", str(len(dados)))
+        handler.end_headers()
+        handler.wfile.write(dados)
+
+    if url.path not in ROTAS:
+        responder(404, {"erro": "rota não encontrada"})
+        return
+    empresa = filtros.pop("empresa", None)
+    erros = tenants.validar([empresa]) if empresa else []
+    if erros:
+        responder(400, {"erro": erros[0]})
+        return
+    try:
+        with tenants.usar_empresa(empresa or empresa_padrao):
+            resposta = consultar(url.path, filtros)
+    except ValueError:
+        responder(400, {"erro": "data inválida (use YYYY-MM-DD)"})
+        return
+    if resposta is None:
+        responder(404, {"erro": "nenhuma execução gravada para a data"})
+        return
+    etag, corpo = resposta
+    if handler.headers.get("If-None-Match", "").strip('" ') == etag:
+        responder(304, None, etag)
+        return
+    responder(200, corpo, etag)
+
+
+def servir(host: str = METRICAS_HOST, porta: int = METRICAS_PORTA) -> int:
+    # --empresa NOME: as threads do servidor não herdam o contexto, a empresa vira o padrão
+    empresa = tenants.empresa_atual()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            atender(self, empresa)
+
+        def log_message(self, format, *args):
+            pass
+
+    http = ThreadingHTTPServer((host, porta), Handler)
+    print(f"📈 Métricas (somente leitura): http://{host}:{porta}/metricas?area=...  |  /mensagens?destinatario=...")
+    try:
+        http.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⚠ Consulta de métricas interrompida (Ctrl+C).")
+    finally:
+        http.server_close()
+    return 0
@@ -0,0 +1,236 @@
+"""Árvore da liderança com as métricas de todos os nós numa passada só.
+
+A hierarquia padrão é a do dimAreaMerchan: geral -> área -> líder (ColaboradorSuperior).
+ORG_PAIS pendura um nó embaixo de outro, para regiões com sub-líderes:
+
+    ORG_PAIS = {"Ana": "Regional Norte", "Caio": "Regional Norte", "Regional Norte": "Trad"}
+
+(o pai pode ser uma área, um líder ou um nó novo, como um regional sem visitas próprias).
+
+Uma extração de fatos diários cobre as janelas do relatório (dia, semana anterior,
+mês); cada linha soma no nó do seu superior e uma passada de baixo para cima (filhos
+antes dos pais) leva as contagens até a raiz: O(nós + fatos), sem consulta por nó.
+Líderes do roster que são pais na ORG_PAIS recebem o relatório da sua subárvore
+(tipo "lider_org") no lugar do relatório da área.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+import sargable_predicates
+import tenants
+from daily_facts import FatosDiarios
+from report_builder import AdherenceBatch, AdherenceMetric
+from report_calendar import JANELA_DIA, JANELA_MES, JANELA_SEMANA_ANTERIOR, ReportContext
+from stage_profiler import etapa
+
+
+RAIZ = "geral"
+ORG_JANELAS = (JANELA_DIA, JANELA_SEMANA_ANTERIOR, JANELA_MES)
+EQUIPE_DIRETA = "Equipe direta"
+
+_NAO_IDENTIFICADA = "Não Identificada"
+
+
+def org_pais() -> dict[str, str]:
+    """ORG_PAIS da empresa ativa: nome do nó -> nome do pai."""
+    return dict(tenants.valor("ORG_PAIS", None) or {})
+
+
+def _chave(nome: str | None) -> str:
+    return (nome or "").strip().casefold()
+
+
+def id_area(nome: str | None) -> str:
+    return f"area|{_chave(nome or _NAO_IDENTIFICADA)}"
+
+
+def id_lider(nome: str) -> str:
+    return f"lider|{_chave(nome)}"
+
+
+@dataclass
+class No:
+    id: str
+    nome: str
+    tipo: str  # "geral", "area" ou "lider"
+    pai: str | None = None
+    filhos: list[str] = field(default_factory=list)
+
+
+class ArvoreOrg:
+    def __init__(self):
+        self.nos: dict[str, No] = {RAIZ: No(RAIZ, "Geral", "geral")}
+        # Preenchidos por agregar(): ordem de baixo para cima e posição de cada nó nos lotes
+        self.ordem: list[str] = []
+        self.indice: dict[str, int] = {}
+
+    def _novo(self, id: str, nome: str, tipo: str, pai: str) -> str:
+        if id not in self.nos:
+            self.nos[id] = No(id, nome, tipo, pai)
+            self.nos[pai].filhos.append(id)
+        return id
+
+    def area(self, nome: str | None) -> str:
+        nome = (nome or "").strip() or _NAO_IDENTIFICADA
+        return self._novo(id_area(nome), nome, "area", RAIZ)
+
+    def lider(self, nome: str, area: str | None) -> str:
+        id = id_lider(nome)
+        if id in self.nos:
+            return id
+        return self._novo(id, nome.strip(), "lider", self.area(area))
+
+    def resolver(self, nome: str) -> str:
+        """Nome da ORG_PAIS -> nó: área já existente, senão líder (novo: pendurado na raiz)."""
+        if id_area(nome) in self.nos:
+            return id_area(nome)
+        return self._novo(id_lider(nome), nome.strip(), "lider", RAIZ)
+
+    def pendurar(self, filho: str, pai: str) -> bool:
+        """Move `filho` (com a subárvore) para baixo de `pai`; False se formaria um ciclo."""
+        acima: str | None = pai
+        while acima is not None:
+            if acima == filho:
+                return False
+            acima = self.nos[acima].pai
+        no = self.nos[filho]
+        self.nos[no.pai].filhos.remove(filho)
+        no.pai = pai
+        self.nos[pai].filhos.append(filho)
+        return True
+
+    @classmethod
+    def montar(cls, visitas, pais: dict[str, str] | None = None) -> "ArvoreOrg":
+        """Árvore a partir das linhas de FatosDiarios (superior, área) + ORG_PAIS."""
+        arvore = cls()
+        for r in visitas:
+            if r["superior"]:
+                arvore.lider(r["superior"], r["area"])
+            else:
+                arvore.area(r["area"])
+        for filho, pai in (pais or {}).items():
+            a, b = arvore.resolver(filho), arvore.resolver(pai)
+            if a == RAIZ or not arvore.pendurar(a, b):
+                print(f"⚠ ORG_PAIS: {filho} -> {pai} formaria um ciclo; ignorado.")
+        return arvore
+
+    def _de_baixo_para_cima(self) -> list[str]:
+        # Pré-ordem (pai antes dos filhos) invertida: todo nó vem depois dos seus descendentes
+        saida, pilha = [], [RAIZ]
+        while pilha:
+            id = pilha.pop()
+            saida.append(id)
+            pilha.extend(reversed(self.nos[id].filhos))
+        saida.reverse()
+        return saida
+
+    def agregar(self, fatos: FatosDiarios, janelas: dict[str, tuple[date, date]]) -> dict[str, AdherenceBatch]:
+        """Janela -> lote com a métrica de cada nó (subárvore inteira), na posição self.indice[id]."""
+        self.ordem = self._de_baixo_para_cima()
+        self.indice = {id: i for i, id in enumerate(self.ordem)}
+        lotes: dict[str, AdherenceBatch] = {}
+        for nome in janelas:
+            lote = lotes[nome] = AdherenceBatch()
+            for id in self.ordem:
+                lote.append(id, 0, 0)
+
+        # Fatos: cada linha soma no seu nó, em cada janela que contém o dia
+        ini = min(a for a, _ in janelas.values())
+        fim = max(b for _, b in janelas.values())
+        d = ini
+        while d < fim:
+            ativos = [lotes[n] for n, (a, b) in janelas.items() if a <= d < b]
+            for r in fatos.visitas(d, d + timedelta(days=1)):
+                i = self.indice[id_lider(r["superior"]) if r["superior"] else id_area(r["area"])]
+                for lote in ativos:
+                    lote.feitas[i] += r["visitas_feitas"]
+                    lote.planejadas[i] += r["visitas_planejadas"]
+            d += timedelta(days=1)
+
+        # Uma passada de baixo para cima: o total do nó já está completo quando sobe ao pai
+        for i, id in enumerate(self.ordem):
+            pai = self.nos[id].pai
+            if pai is None:
+                continue
+            j = self.indice[pai]
+            for lote in lotes.values():
+                lote.feitas[j] += lote.feitas[i]
+                lote.planejadas[j] += lote.planejadas[i]
+        return lotes
+
+    def linhas(self, lotes: dict[str, AdherenceBatch]) -> list[dict]:
+        """Uma linha por nó e janela (formato das consultas, para snapshot/montagem)."""
+        saida = []
+        for id in reversed(self.ordem):
+            no = self.nos[id]
+            i = self.indice[id]
+            for janela, lote in lotes.items():
+                saida.append(lote[i].como_linha(no=id, nome=no.nome, tipo=no.tipo, pai=no.pai, janela=janela))
+        return saida
+
+
+def janelas_org(ctx: ReportContext) -> dict[str, tuple[date, date]]:
+    return {j: ctx.janela(j) for j in ORG_JANELAS}
+
+
+def periodo_org(ctx: ReportContext) -> tuple[date, date]:
+    janelas = janelas_org(ctx).values()
+    return min(a for a, _ in janelas), max(b for _, b in janelas)
+
+
+def linhas_de_fatos(fatos: FatosDiarios, ctx: ReportContext) -> list[dict]:
+    """Linhas da família "org" a partir de fatos já extraídos (modo de recuperação)."""
+    arvore = ArvoreOrg.montar(fatos.visitas(*periodo_org(ctx)), org_pais())
+    return arvore.linhas(arvore.agregar(fatos, janelas_org(ctx)))
+
+
+def linhas_org(ctx: ReportContext, db) -> list[dict]:
+    """Família local "org" do plano de métricas."""
+    import merchan_queries
+
+    ini, fim = periodo_org(ctx)
+    with etapa("org;predicados"):
+        sargable_predicates.preparar(db, ini, fim)
+    with etapa("org;fatos"):
+        rows = db.query_rows(merchan_queries.daily_visit_facts_sql(ini, fim))
+    with etapa("org;agregacao"):
+        return linhas_de_fatos(FatosDiarios(ini, fim, rows), ctx)
+
+
+class MetricasOrg:
+    """Leitura das linhas da família "org" (nós, filhos e métrica por nó/janela)."""
+
+    def __init__(self, linhas: list[dict]):
+        self.nos: dict[str, dict] = {}
+        self.filhos: dict[str, list[str]] = {}
+        self._metricas: dict[tuple[str, str], AdherenceMetric] = {}
+        for r in linhas or []:
+            id = r["no"]
+            if id not in self.nos:
+                self.nos[id] = r
+                if r.get("pai") is not None:
+                    self.filhos.setdefault(r["pai"], []).append(id)
+            self._metricas[(id, r["janela"])] = AdherenceMetric(
+                int(r["visitas_feitas"]), int(r["visitas_planejadas"])
+            )
+
+    def metrica(self, id: str, janela: str) -> AdherenceMetric:
+        return self._metricas.get((id, janela), AdherenceMetric())
+
+    def proprias(self, id: str, janela: str) -> AdherenceMetric:
+        """Visitas do próprio nó (sem os filhos)."""
+        filhos = sum((self.metrica(f, janela) for f in self.filhos.get(id, ())), AdherenceMetric())
+        total = self.metrica(id, janela)
+        return AdherenceMetric(
+            total.visitas_feitas - filhos.visitas_feitas, total.visitas_planejadas - filhos.visitas_planejadas
+        )
+
+    def equipes(self, id: str, janelas: tuple[str, ...]) -> list[tuple[str, list[AdherenceMetric]]]:
+        """(nome, métricas por janela) de cada filho e da equipe direta, só com visitas planejadas."""
+        saida = [(self.nos[f]["nome"], [self.metrica(f, j) for j in janelas]) for f in self.filhos.get(id, ())]
+        if id in self.filhos:
+            saida.append((EQUIPE_DIRETA, [self.proprias(id, j) for j in janelas]))
+        return [(nome, ms) for nome, ms in saida if any(m.visitas_planejadas for m in ms)]
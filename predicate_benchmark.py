@@ -0,0 +1,180 @@
+"""Compara os predicados normais e os indexáveis (sargable_predicates) num banco sintético.
+
+Monta em SQLite uma cópia sintética de Monitoramento_Promotor (com grafias
+variadas de ForaDoRoteiro/tipocheckin), dimAreaMerchan e dimFeriadoMerchan,
+gera as consultas reais de merchan_queries nos dois modos, traduz o dialeto
+(CAST AS DATE -> date(), ISNULL -> IFNULL, COLLATE ..._CI_AI -> uma collation equivalente) e mostra o
+plano (EXPLAIN QUERY PLAN) e o tempo de cada uma. O SQLite não é o SQL Server,
+mas a mudança de plano é a mesma: coluna envolvida em função não usa o índice.
+
+Uso:
+    python predicate_benchmark.py
+    python predicate_benchmark.py --linhas 1000000 --repeticoes 5
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import re
+import sqlite3
+import statistics
+import time
+from datetime import date, timedelta
+
+import merchan_queries
+import sargable_predicates
+from report_calendar import JANELA_MES, ReportContext
+
+
+FORA_VARIANTES = [("Não", 60), ("NAO", 10), (" nao ", 5), (None, 5), ("Sim", 20)]
+CHECKIN_VARIANTES = [("Manual", 45), ("Manual e GPS", 25), ("MANUAL", 5), ("GPS", 10), (None, 15)]
+AREAS = ["Trad", "Filial", "Capital", "Interior", None]
+
+
+def para_sqlite(sql: str) -> str:
+    sql = re.sub(r"\b\w+\.dbo\.(\w+)", r"\1", sql, flags=re.IGNORECASE)
+    sql = re.sub(r"CAST\(([^()]+) AS DATE\)", r"date(\1)", sql)
+    sql = sql.replace("ISNULL(", "IFNULL(")
+    return sql.replace("COLLATE Latin1_General_CI_AI", "COLLATE CI_AI")
+
+
+def _comparar_ci_ai(a: str, b: str) -> int:
+    # Equivalente ao COLLATE Latin1_General_CI_AI do SQL Server
+    a, b = sargable_predicates.normalizar(a), sargable_predicates.normalizar(b)
+    return (a > b) - (a < b)
+
+
+def _sortear(rng: random.Random, pesos):
+    valores, w = zip(*pesos)
+    return rng.choices(valores, weights=w)[0]
+
+
+def criar_banco(conn: sqlite3.Connection, linhas: int, inicio: date, dias: int, semente: int) -> list[date]:
+    rng = random.Random(semente)
+    conn.executescript(
+        """
+CREATE TABLE Monitoramento_Promotor (
+    visitaid INTEGER PRIMARY KEY,
+    DataVisita TEXT NOT NULL,
+    Colaborador TEXT,
+    ColaboradorSuperior TEXT,
+    -- Colunas sem diferença de caixa, como a collation padrão do banco de origem
+    ForaDoRoteiro TEXT COLLATE NOCASE,
+    tipocheckin TEXT COLLATE NOCASE
+);
+CREATE TABLE dimAreaMerchan (colaborador_superior TEXT PRIMARY KEY, area_merchan TEXT);
+CREATE TABLE dimFeriadoMerchan (data TEXT PRIMARY KEY);
+"""
+    )
+    superiores = [f"Lider {i}" for i in range(40)]
+    conn.executemany(
+        "INSERT INTO dimAreaMerchan VALUES (?, ?)",
+        [(s, AREAS[i % len(AREAS)]) for i, s in enumerate(superiores) if AREAS[i % len(AREAS)]],
+    )
+    # Um feriado a cada ~30 dias, sempre com um nos últimos dias (dentro do mês consultado)
+    feriados = rng.sample([inicio + timedelta(days=k) for k in range(dias)], k=max(1, dias // 30))
+    feriados = sorted(set(feriados) | {inicio + timedelta(days=dias - 3)})
+    conn.executemany("INSERT INTO dimFeriadoMerchan VALUES (?)", [(d.isoformat(),) for d in feriados])
+    conn.executemany(
+        "INSERT INTO Monitoramento_Promotor VALUES (?, ?, ?, ?, ?, ?)",
+        (
+            (
+                i,
+                (inicio + timedelta(days=rng.randrange(dias))).isoformat() + " 00:00:00",
+                f"Promotor {rng.randrange(800)}",
+                rng.choice(superiores),
+                _sortear(rng, FORA_VARIANTES),
+                _sortear(rng, CHECKIN_VARIANTES),
+            )
+            for i in range(1, linhas + 1)
+        ),
+    )
+    conn.executescript(
+        """
+CREATE INDEX ix_mon_data ON Monitoramento_Promotor (DataVisita);
+CREATE INDEX ix_mon_fora_data ON Monitoramento_Promotor (ForaDoRoteiro, DataVisita, tipocheckin, ColaboradorSuperior);
+ANALYZE;
+"""
+    )
+    conn.commit()
+    return feriados
+
+
+class BancoSqlite:
+    """query_rows() sobre o SQLite, com o SQL traduzido (usado também na descoberta das grafias)."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def query_rows(self, sql: str) -> list[dict]:
+        cur = self.conn.execute(para_sqlite(sql))
+        cols = [c[0] for c in cur.description]
+        return [dict(zip(cols, r)) for r in cur.fetchall()]
+
+    def plano(self, sql: str) -> list[str]:
+        return [r[3] for r in self.conn.execute("EXPLAIN QUERY PLAN " + para_sqlite(sql))]
+
+    def medir(self, sql: str, repeticoes: int) -> tuple[float, list[dict]]:
+        tempos = []
+        rows: list[dict] = []
+        for _ in range(repeticoes):
+            t0 = time.perf_counter()
+            rows = self.query_rows(sql)
+            tempos.append(time.perf_counter() - t0)
+        return statistics.median(tempos), rows
+
+
+def consultas(ini: date, fim: date) -> list[tuple[str, str]]:
+    return [
+        ("geral (mês)", merchan_queries.overall_adherence_sql(ini, fim)),
+        ("áreas (mês)", merchan_queries.area_totals_sql(ini, fim)),
+        ("colaboradores Trad (mês)", merchan_queries.area_collaborators_sql("Trad", ini, fim)),
+    ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Predicados normais x indexáveis num banco SQLite sintético")
+    parser.add_argument("--linhas", type=int, default=300_000, help="Visitas sintéticas")
+    parser.add_argument("--dias", type=int, default=120, help="Dias cobertos pelas visitas (até a data)")
+    parser.add_argument("--data", type=str, default=None, help="Data de execução simulada (YYYY-MM-DD)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções por consulta (mediana)")
+    parser.add_argument("--semente", type=int, default=7)
+    parser.add_argument("--arquivo", type=str, default=":memory:", help="Arquivo SQLite (padrão: memória)")
+    args = parser.parse_args()
+
+    hoje = date.fromisoformat(args.data) if args.data else date.today()
+    ctx = ReportContext.para_data(hoje)
+    ini, fim = ctx.janela(JANELA_MES)
+    conn = sqlite3.connect(args.arquivo)
+    conn.create_collation("CI_AI", _comparar_ci_ai)
+    t0 = time.perf_counter()
+    feriados = criar_banco(conn, args.linhas, ctx.dt_end - timedelta(days=args.dias), args.dias, args.semente)
+    print(f"Banco sintético: {args.linhas} visitas, {len(feriados)} feriado(s), {time.perf_counter() - t0:.1f}s")
+    db = BancoSqlite(conn)
+
+    resultados: dict[str, dict[str, tuple[float, list[dict]]]] = {}
+    for modo in sargable_predicates.MODOS:
+        sargable_predicates.PREDICADOS_MODO = modo
+        sargable_predicates.limpar()
+        print(f"\n=== {modo} ===")
+        if sargable_predicates.ativo():
+            t0 = time.perf_counter()
+            sargable_predicates.preparar(db, ini, fim)
+            print(f"(descoberta: {(time.perf_counter() - t0) * 1000:.0f} ms)")
+        for nome, sql in consultas(ini, fim):
+            tempo, rows = db.medir(sql, args.repeticoes)
+            resultados.setdefault(nome, {})[modo] = (tempo, rows)
+            print(f"\n{nome}: {tempo * 1000:.1f} ms")
+            for linha in db.plano(sql):
+                print(f"    {linha}")
+
+    print(f"\n{'Consulta':<28} {'normalizado':>12} {'indexavel':>12} {'ganho':>7}  mesmo resultado")
+    for nome, por_modo in resultados.items():
+        (t_norm, r_norm), (t_idx, r_idx) = por_modo["normalizado"], por_modo["indexavel"]
+        print(f"{nome:<28} {t_norm * 1000:>10.1f}ms {t_idx * 1000:>10.1f}ms {t_norm / t_idx:>6.1f}x  {'sim' if r_norm == r_idx else 'NÃO'}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
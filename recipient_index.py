@@ -0,0 +1,185 @@
+"""Índice de destinatários: roster em cache, deduplicado e com telefones validados.
+
+O roster (dimAreaMerchan + telefones da liderança) quase nunca muda, mas era
+consultado inteiro a cada execução, e telefone ruim só aparecia no envio, depois de
+o WhatsApp Web gastar um ciclo inteiro (45–90 s) num número que nunca ia funcionar.
+
+- Cache: o roster fica em ROSTER_CACHE_ARQUIVO com a assinatura da tabela
+  (COUNT + SHA-256 do conteúdo, roster_checksum_sql); a execução só consulta a assinatura
+  e relê o roster quando ela muda. No mesmo processo (modo serviço) o índice fica
+  em memória.
+- Duplicidade: uma linha por pessoa e papel (mesma pessoa em duas linhas fica com o
+  primeiro telefone válido); o mesmo telefone em dois contatos da liderança merchan
+  ou da diretoria recebe a mensagem uma vez só.
+- Validação: telefone normalizado (normalize_phone_to_e164) tem de ser E.164
+  (+ e 8 a 15 dígitos), com DDI em TELEFONE_DDI_ACEITOS; número brasileiro com
+  DDD + 8 ou 9 dígitos. Contato inválido fica fora do lote (com número de teste,
+  entra: o telefone dele não é usado) e aparece no relatório antes do envio.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+from dataclasses import dataclass, field
+
+import config
+import tenants
+from report_builder import normalize_phone_to_e164
+from stage_profiler import etapa
+
+
+ROSTER_CACHE_ARQUIVO = getattr(config, "ROSTER_CACHE_ARQUIVO", "roster_cache.json")
+
+# Papéis com uma mensagem igual para todos: o mesmo telefone não recebe duas vezes
+_PAPEIS_MENSAGEM_UNICA = ("merchan", "diretoria")
+
+_E164 = re.compile(r"\+[1-9]\d{7,14}")
+
+
+def _norm(v) -> str:
+    return str(v or "").strip().casefold()
+
+
+def ddis_aceitos() -> tuple[str, ...]:
+    return tuple(str(d).lstrip("+") for d in (tenants.valor("TELEFONE_DDI_ACEITOS", ("55",)) or ()))
+
+
+def motivo_telefone_invalido(telefone: str) -> str | None:
+    """None se o telefone (já normalizado) pode receber mensagem; senão, o motivo."""
+    if not telefone:
+        return "sem telefone"
+    if not _E164.fullmatch(telefone):
+        return "fora do E.164 (+ e 8 a 15 dígitos)"
+    digitos = telefone[1:]
+    aceitos = ddis_aceitos()
+    ddi = next((d for d in aceitos if digitos.startswith(d)), None)
+    if aceitos and ddi is None:
+        return f"DDI fora de TELEFONE_DDI_ACEITOS ({', '.join(aceitos)})"
+    if ddi == "55":
+        nacional = digitos[2:]
+        if len(nacional) not in (10, 11) or nacional.startswith("0"):
+            return "número brasileiro sem DDD + 8 ou 9 dígitos"
+    return None
+
+
+@dataclass
+class IndiceDestinatarios:
+    checksum: str
+    # Linhas no formato do roster, telefone já normalizado; inválidas com "telefone_invalido" = motivo
+    linhas: list[dict] = field(default_factory=list)
+    duplicadas: int = 0
+    avisos: list[str] = field(default_factory=list)
+
+    @classmethod
+    def montar(cls, checksum: str, rows: list[dict]) -> "IndiceDestinatarios":
+        indice = cls(checksum)
+        por_pessoa: dict[tuple[str, str], int] = {}
+        por_telefone: dict[tuple[str, str], str] = {}
+        for row in rows:
+            papel = _norm(row.get("area_merchan"))
+            grupo = papel if papel in _PAPEIS_MENSAGEM_UNICA else "area"
+            nome = (row.get("colaborador_superior") or "").strip()
+            bruto = (row.get("telefone") or "").strip()
+            telefone = normalize_phone_to_e164(bruto)
+            motivo = motivo_telefone_invalido(telefone)
+            linha = {**row, "colaborador_superior": nome, "telefone": telefone if motivo is None else bruto}
+            if motivo is not None:
+                linha["telefone_invalido"] = motivo
+
+            # Mesma pessoa no mesmo papel: fica a primeira linha (ou a primeira com telefone válido)
+            chave = (grupo, _norm(nome) or f"tel|{telefone}")
+            i = por_pessoa.get(chave)
+            if i is not None:
+                indice.duplicadas += 1
+                anterior = indice.linhas[i]
+                if anterior.get("telefone_invalido") and motivo is None:
+                    indice.linhas[i] = linha
+                elif motivo is None and anterior["telefone"] != telefone:
+                    indice.avisos.append(f"{nome}: mais de um telefone no roster; usado {anterior['telefone']}")
+                continue
+
+            if motivo is None and grupo in _PAPEIS_MENSAGEM_UNICA:
+                outro = por_telefone.get((grupo, telefone))
+                if outro is not None:
+                    indice.duplicadas += 1
+                    indice.avisos.append(f"{nome or papel}: mesmo telefone de {outro}; recebe uma vez só")
+                    continue
+                por_telefone[(grupo, telefone)] = nome or papel
+
+            por_pessoa[chave] = len(indice.linhas)
+            indice.linhas.append(linha)
+        return indice
+
+    def invalidas(self) -> list[dict]:
+        return [r for r in self.linhas if r.get("telefone_invalido")]
+
+    def relatorio(self) -> None:
+        """Resumo antes do lote: contatos fora do envio e duplicidades."""
+        invalidas = self.invalidas()
+        print(
+            f"📇 Roster: {len(self.linhas)} contato(s), {len(invalidas)} com telefone inválido"
+            + (f", {self.duplicadas} linha(s) duplicada(s) ignorada(s)" if self.duplicadas else "")
+        )
+        for r in invalidas:
+            nome = r["colaborador_superior"] or r.get("area_merchan") or "?"
+            telefone = f" ({r['telefone']})" if r["telefone"] else ""
+            print(f"  ⚠ {nome}{telefone}: {r['telefone_invalido']} — fora do lote de envio")
+        for aviso in self.avisos:
+            print(f"  ⚠ {aviso}")
+
+
+# Processo longo (modo serviço): arquivo de cache/empresa -> índice já montado
+_memoria: dict[str, IndiceDestinatarios] = {}
+
+
+def _ler_cache(arquivo: str | None) -> tuple[str, list[dict]] | None:
+    if not arquivo or not os.path.exists(arquivo):
+        return None
+    try:
+        with open(arquivo, "r", encoding="utf-8") as f:
+            conteudo = json.load(f)
+        return conteudo["checksum"], conteudo["linhas"]
+    except Exception as e:
+        print(f"⚠ Cache do roster ilegível ({arquivo}): {e}")
+        return None
+
+
+def _gravar_cache(arquivo: str | None, checksum: str, rows: list[dict]) -> None:
+    if not arquivo:
+        return
+    try:
+        with open(arquivo, "w", encoding="utf-8") as f:
+            json.dump({"checksum": checksum, "linhas": rows}, f, ensure_ascii=False, indent=2, default=str)
+    except Exception as e:
+        print(f"⚠ Não foi possível gravar o cache do roster ({arquivo}): {e}")
+
+
+def carregar_indice(db, forcar: bool = False) -> IndiceDestinatarios:
+    """Índice do roster da empresa ativa; o roster só é relido quando a assinatura da tabela muda."""
+    from merchan_queries import leaders_with_area_and_phone_sql, roster_checksum_sql
+
+    with etapa("roster;checksum"):
+        assinatura = (db.query_rows(roster_checksum_sql()) or [{}])[0]
+    checksum = f"{assinatura.get('linhas')}:{assinatura.get('roster_checksum')}"
+
+    arquivo = tenants.arquivo_da_empresa(ROSTER_CACHE_ARQUIVO)
+    chave = arquivo or f"empresa|{tenants.empresa_atual()}"
+    indice = None if forcar else _memoria.get(chave)
+    if indice is not None and indice.checksum == checksum:
+        return indice
+
+    cache = None if forcar else _ler_cache(arquivo)
+    if cache is not None and cache[0] == checksum:
+        rows = cache[1]
+        print("📇 Roster sem mudanças: usando o cache.")
+    else:
+        with etapa("roster"):
+            rows = db.query_rows(leaders_with_area_and_phone_sql())
+        _gravar_cache(arquivo, checksum, rows)
+
+    indice = IndiceDestinatarios.montar(checksum, rows)
+    indice.relatorio()
+    _memoria[chave] = indice
+    return indice
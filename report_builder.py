@@ -2,17 +2,86 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
+import heapq
+from array import array
 from datetime import date
+from decimal import ROUND_HALF_UP, Decimal
 
-from config import AREAS_ORDEM_PADRAO
+import config
+from tenants import PorEmpresa
+
+
+# Ordem preferencial das áreas da empresa ativa (tenants)
+AREAS_ORDEM_PADRAO = PorEmpresa("AREAS_ORDEM_PADRAO")
+# Mensagem do líder de área: N piores + N melhores do mês (0 = todos, em ordem alfabética)
+RANKING_COLABORADORES = getattr(config, "RANKING_COLABORADORES", 0)
+# Teto de caracteres da mensagem do líder de área (None = sem teto)
+MENSAGEM_MAX_CARACTERES = getattr(config, "MENSAGEM_MAX_CARACTERES", None)
+
+_CENTESIMO = Decimal("0.01")
+
+
+def _pct(feitas: int, planejadas: int) -> float | None:
+    """feitas/planejadas em %, com 2 casas e metade para cima, como o CAST(... AS DECIMAL(10,2))
+    das consultas (1 de 32 = 3,125 -> 3,13; round() daria 3,12)."""
+    if not planejadas:
+        return None
+    return float((Decimal(feitas) * 100 / Decimal(planejadas)).quantize(_CENTESIMO, ROUND_HALF_UP))
 
 
-@dataclass(frozen=True)
 class AdherenceMetric:
-    visitas_feitas: int
-    visitas_planejadas: int
-    aderencia_pct: float | None
+    """Visitas feitas/planejadas; a aderência sai das contagens, na hora em que é lida.
+
+    Soma como contagem (`a + b`, `sum(metricas)`), então uma área, o geral ou uma
+    janela maior saem exatos de métricas mais finas já em memória — somar
+    percentuais arredondados não daria o mesmo número.
+    """
+
+    __slots__ = ("visitas_feitas", "visitas_planejadas")
+
+    def __init__(self, visitas_feitas: int = 0, visitas_planejadas: int = 0):
+        object.__setattr__(self, "visitas_feitas", visitas_feitas)
+        object.__setattr__(self, "visitas_planejadas", visitas_planejadas)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} é imutável")
+
+    @property
+    def aderencia_pct(self) -> float | None:
+        return _pct(self.visitas_feitas, self.visitas_planejadas)
+
+    def __add__(self, other):
+        if isinstance(other, AdherenceMetric):
+            return AdherenceMetric(
+                self.visitas_feitas + other.visitas_feitas,
+                self.visitas_planejadas + other.visitas_planejadas,
+            )
+        if other == 0:
+            return self
+        return NotImplemented
+
+    # sum() começa em 0
+    __radd__ = __add__
+
+    def __eq__(self, other):
+        if not isinstance(other, AdherenceMetric):
+            return NotImplemented
+        return (self.visitas_feitas, self.visitas_planejadas) == (other.visitas_feitas, other.visitas_planejadas)
+
+    def __hash__(self):
+        return hash((self.visitas_feitas, self.visitas_planejadas))
+
+    def __repr__(self):
+        return f"AdherenceMetric({self.visitas_feitas}, {self.visitas_planejadas})"
+
+    def como_linha(self, **extra) -> dict:
+        """Linha no formato das consultas (visitas_feitas, visitas_planejadas, aderencia_pct)."""
+        return {
+            **extra,
+            "visitas_feitas": self.visitas_feitas,
+            "visitas_planejadas": self.visitas_planejadas,
+            "aderencia_pct": self.aderencia_pct,
+        }
 
 
 def _safe_int(x) -> int:
@@ -23,14 +92,64 @@ def _safe_int(x) -> int:
 
 
 def metric_from_row(row) -> AdherenceMetric:
-    feitas = _safe_int(row.get("visitas_feitas", 0))
-    planejadas = _safe_int(row.get("visitas_planejadas", 0))
-    pct = row.get("aderencia_pct", None)
-    try:
-        pct_val = float(pct) if pct is not None else None
-    except Exception:
-        pct_val = None
-    return AdherenceMetric(feitas, planejadas, pct_val)
+    # aderencia_pct da linha é ignorada: recalculada das contagens
+    return AdherenceMetric(_safe_int(row.get("visitas_feitas", 0)), _safe_int(row.get("visitas_planejadas", 0)))
+
+
+class AdherenceBatch:
+    """Muitas métricas em colunas (array de inteiros), sem um objeto por linha.
+
+    Para somar/agrupar linhas de consulta ou de fatos: `total()`, `agrupar()` e
+    `pcts()` percorrem as colunas de uma vez.
+    """
+
+    __slots__ = ("chaves", "feitas", "planejadas")
+
+    def __init__(self):
+        self.chaves: list = []
+        self.feitas = array("q")
+        self.planejadas = array("q")
+
+    @classmethod
+    def from_rows(cls, rows, chave=None) -> "AdherenceBatch":
+        """chave(row) -> chave de agrupamento (None = todas as linhas na mesma)."""
+        lote = cls()
+        for r in rows:
+            lote.append(
+                chave(r) if chave is not None else None,
+                _safe_int(r.get("visitas_feitas", 0)),
+                _safe_int(r.get("visitas_planejadas", 0)),
+            )
+        return lote
+
+    def append(self, chave, feitas: int, planejadas: int) -> None:
+        self.chaves.append(chave)
+        self.feitas.append(feitas)
+        self.planejadas.append(planejadas)
+
+    def __len__(self) -> int:
+        return len(self.chaves)
+
+    def __getitem__(self, i: int) -> AdherenceMetric:
+        return AdherenceMetric(self.feitas[i], self.planejadas[i])
+
+    def total(self) -> AdherenceMetric:
+        return AdherenceMetric(sum(self.feitas), sum(self.planejadas))
+
+    def agrupar(self) -> dict:
+        """chave -> métrica somada, na ordem em que as chaves aparecem."""
+        soma: dict = {}
+        for chave, f, p in zip(self.chaves, self.feitas, self.planejadas):
+            acc = soma.get(chave)
+            if acc is None:
+                soma[chave] = [f, p]
+            else:
+                acc[0] += f
+                acc[1] += p
+        return {k: AdherenceMetric(f, p) for k, (f, p) in soma.items()}
+
+    def pcts(self) -> list[float | None]:
+        return [_pct(f, p) for f, p in zip(self.feitas, self.planejadas)]
 
 
 def fmt_pct(p: float | None, *, with_icon: bool = False) -> str:
@@ -76,6 +195,13 @@ def normalize_phone_to_e164(raw: str) -> str:
     return "+" + digits if digits else ""
 
 
+def fmt_rolling(rolling: dict[int, AdherenceMetric] | None, sep: str = " ") -> str:
+    """Colunas extras de janela móvel: "  |  7d 80.0%  |  28d 85.2%" (vazio se não houver)."""
+    if rolling is None:
+        return ""
+    return "".join(f"  |  {n}d{sep}{fmt_pct(m.aderencia_pct)}" for n, m in sorted(rolling.items()))
+
+
 def order_areas(area_rows: list[dict]) -> list[dict]:
     order_index = {name.lower(): i for i, name in enumerate(AREAS_ORDEM_PADRAO)}
 
@@ -101,6 +227,8 @@ def build_general_leader_message(
     grupo_rede_section_title: str = "🏪 Grupos/Redes Importantes",
     include_areas_section: bool = True,
     period2_title: str = "Mês",
+    overall_rolling: dict[int, AdherenceMetric] | None = None,
+    areas_rolling_by_name: dict[str, dict[int, AdherenceMetric]] | None = None,
 ) -> str:
     lines: list[str] = []
     lines.append("📊 Relatório Merchandising")
@@ -110,6 +238,7 @@ def build_general_leader_message(
     lines.append("")
     lines.append(
         f"Ontem: {fmt_pct(overall_day.aderencia_pct)}  |  {period2_title}: {fmt_pct(overall_period2.aderencia_pct, with_icon=True)}"
+        f"{fmt_rolling(overall_rolling, ': ')}"
     )
     lines.append("")
 
@@ -120,10 +249,12 @@ def build_general_leader_message(
         for r in order_areas(areas_day):
             area = (r.get("area_merchan") or "Não Identificada").strip()
             day_metric = metric_from_row(r)
-            month_metric = areas_month_by_name.get(area, AdherenceMetric(0, 0, None))
+            month_metric = areas_month_by_name.get(area, AdherenceMetric())
+            area_rolling = areas_rolling_by_name.get(area) if areas_rolling_by_name is not None else None
             lines.append(f"- {area}:")
             lines.append(
                 f"Ontem {fmt_pct(day_metric.aderencia_pct)}  |  {period2_title} {fmt_pct(month_metric.aderencia_pct, with_icon=True)}"
+                f"{fmt_rolling(area_rolling)}"
             )
             lines.append("")
 
@@ -150,20 +281,8 @@ def build_general_leader_message(
             day_r = day_by_unit.get(unidade, {})
             month_r = month_by_unit.get(unidade, {})
             
-            day_pct = None
-            month_pct = None
-            
-            try:
-                if day_r.get("aderencia_pct") is not None:
-                    day_pct = float(day_r.get("aderencia_pct"))
-            except Exception:
-                pass
-            
-            try:
-                if month_r.get("aderencia_pct") is not None:
-                    month_pct = float(month_r.get("aderencia_pct"))
-            except Exception:
-                pass
+            day_pct = metric_from_row(day_r).aderencia_pct
+            month_pct = metric_from_row(month_r).aderencia_pct
             
             lines.append(f"- {unidade}:")
             lines.append(
@@ -174,6 +293,24 @@ def build_general_leader_message(
     return "\n".join(lines).strip() + "\n"
 
 
+def rank_collaborators(
+    names: list[str], month_by_name: dict[str, AdherenceMetric], n: int
+) -> tuple[list[str], list[str]]:
+    """(n piores, n melhores) pela aderência do mês, por seleção parcial (heap): O(len(names) log n)."""
+
+    def pct(name: str) -> float:
+        p = month_by_name.get(name, AdherenceMetric()).aderencia_pct
+        return p if p is not None else -1.0
+
+    # Empates em ordem alfabética nos dois lados
+    worst = heapq.nsmallest(n, names, key=lambda name: (pct(name), name.casefold()))
+    chosen = set(worst)
+    best = heapq.nsmallest(
+        n, (name for name in names if name not in chosen), key=lambda name: (-pct(name), name.casefold())
+    )
+    return worst, best
+
+
 def build_area_leader_message(
     area_name: str,
     leader_name: str,
@@ -183,19 +320,28 @@ def build_area_leader_message(
     area_month: AdherenceMetric,
     collaborators_day_by_name: dict[str, AdherenceMetric],
     collaborators_month_by_name: dict[str, AdherenceMetric],
+    area_rolling: dict[int, AdherenceMetric] | None = None,
+    collaborators_rolling_by_name: dict[str, dict[int, AdherenceMetric]] | None = None,
+    ranking_n: int | None = None,
+    max_chars: int | None = None,
 ) -> str:
-    lines: list[str] = []
-    lines.append(f"📊 Relatório Merchan - {area_name}")
-    lines.append("")
-    lines.append("")
-    lines.append(f"Aderência ao Roteiro {area_name}")
-    lines.append("")
-    lines.append(
+    """ranking_n: só os N piores e os N melhores do mês, o resto numa linha de resumo.
+    max_chars: teto de caracteres; quem não cabe também vai para o resumo.
+    None = valores do config (RANKING_COLABORADORES, MENSAGEM_MAX_CARACTERES)."""
+    ranking_n = RANKING_COLABORADORES if ranking_n is None else ranking_n
+    max_chars = MENSAGEM_MAX_CARACTERES if max_chars is None else max_chars
+
+    head: list[str] = []
+    head.append(f"📊 Relatório Merchan - {area_name}")
+    head.append("")
+    head.append("")
+    head.append(f"Aderência ao Roteiro {area_name}")
+    head.append("")
+    head.append(
         f"Ontem: {fmt_pct(area_day.aderencia_pct)}  |  Mês: {fmt_pct(area_month.aderencia_pct, with_icon=True)}"
+        f"{fmt_rolling(area_rolling, ': ')}"
     )
-    lines.append("")
-    lines.append("👥 Colaboradores (ordem alfabética)")
-    lines.append("")
+    head.append("")
 
     def sort_key(name: str):
         return name.casefold()
@@ -209,13 +355,126 @@ def build_area_leader_message(
     ]
 
     if not eligible_names:
-        lines.append("Sem colaboradores com visitas planejadas ontem.")
-        lines.append("")
+        lines = head + ["👥 Colaboradores (ordem alfabética)", "", "Sem colaboradores com visitas planejadas ontem.", ""]
         return "\n".join(lines).strip() + "\n"
 
-    for name in sorted(eligible_names, key=sort_key):
-        d = collaborators_day_by_name.get(name, AdherenceMetric(0, 0, None))
-        m = collaborators_month_by_name.get(name, AdherenceMetric(0, 0, None))
+    def day_of(name: str) -> AdherenceMetric:
+        return collaborators_day_by_name.get(name, AdherenceMetric())
+
+    def month_of(name: str) -> AdherenceMetric:
+        return collaborators_month_by_name.get(name, AdherenceMetric())
+
+    # Seções (título, nomes na ordem de exibição) e prioridade de quem entra se faltar espaço
+    if ranking_n and len(eligible_names) > 2 * ranking_n:
+        worst, best = rank_collaborators(eligible_names, collaborators_month_by_name, ranking_n)
+        sections = [("🔻 Menor aderência no mês", worst), ("🔺 Maior aderência no mês", best)]
+        priority = [name for pair in zip(worst, best) for name in pair] + worst[len(best):]
+    else:
+        ordered = sorted(eligible_names, key=sort_key)
+        sections = [("👥 Colaboradores (ordem alfabética)", ordered)]
+        priority = ordered
+
+    def collaborator_lines(name: str) -> list[str]:
+        d, m = day_of(name), month_of(name)
+        rolling = collaborators_rolling_by_name.get(name) if collaborators_rolling_by_name is not None else None
+        return [
+            f"- {name}:",
+            f"Ontem {fmt_pct(d.aderencia_pct)}  |  Mês {fmt_pct(m.aderencia_pct, with_icon=True)}{fmt_rolling(rolling)}",
+            "",
+        ]
+
+    def others_lines(count: int, d: AdherenceMetric, m: AdherenceMetric) -> list[str]:
+        # Resumo exato do resto: soma das contagens, não média dos percentuais
+        if not count:
+            return []
+        return [
+            f"➕ Demais {count} colaboradores:",
+            f"Ontem {fmt_pct(d.aderencia_pct)}  |  Mês {fmt_pct(m.aderencia_pct, with_icon=True)}",
+            "",
+        ]
+
+    def render(shown: set[str]) -> str:
+        lines = list(head)
+        for title, names in sections:
+            names = [name for name in names if name in shown]
+            if not names:
+                continue
+            lines.append(title)
+            lines.append("")
+            for name in names:
+                lines.extend(collaborator_lines(name))
+        others = [name for name in eligible_names if name not in shown]
+        day_rest, month_rest = sum(map(day_of, others), AdherenceMetric()), sum(map(month_of, others), AdherenceMetric())
+        lines.extend(others_lines(len(others), day_rest, month_rest))
+        return "\n".join(lines).strip() + "\n"
+
+    msg = render(set(priority))
+    if not max_chars or len(msg) <= max_chars:
+        return msg
+
+    # Acima do teto: entram um por um, na ordem de prioridade, enquanto couber. O tamanho
+    # é somado das linhas de cada um (calculadas uma vez), sem remontar a mensagem
+    # a cada candidato; strip() só encurta, então a soma nunca fica abaixo do real.
+    def size(lines: list[str]) -> int:
+        return sum(len(line) + 1 for line in lines)
+
+    section_of = {name: title for title, names in sections for name in names}
+    used = size(head)
+    opened: set[str] = set()
+    shown: set[str] = set()
+    rest_count = len(eligible_names)
+    rest_day = sum(map(day_of, eligible_names), AdherenceMetric())
+    rest_month = sum(map(month_of, eligible_names), AdherenceMetric())
+    for name in priority:
+        cost = size(collaborator_lines(name))
+        title = section_of[name]
+        if title not in opened:
+            cost += size([title, ""])
+        d, m = day_of(name), month_of(name)
+        day_left = AdherenceMetric(
+            rest_day.visitas_feitas - d.visitas_feitas, rest_day.visitas_planejadas - d.visitas_planejadas
+        )
+        month_left = AdherenceMetric(
+            rest_month.visitas_feitas - m.visitas_feitas, rest_month.visitas_planejadas - m.visitas_planejadas
+        )
+        if used + cost + size(others_lines(rest_count - 1, day_left, month_left)) - 1 > max_chars:
+            break
+        used += cost
+        opened.add(title)
+        shown.add(name)
+        rest_count, rest_day, rest_month = rest_count - 1, day_left, month_left
+
+    msg = render(shown)
+    if len(msg) > max_chars:
+        print(
+            f"⚠ Mensagem de {area_name}: {len(msg)} caracteres mesmo sem colaboradores "
+            f"(cabeçalho + resumo); acima de MENSAGEM_MAX_CARACTERES = {max_chars}."
+        )
+    return msg
+
+
+def build_org_leader_message(
+    node_name: str,
+    ref_date: date,
+    day_label: str,
+    month_label: str,
+    total_day: AdherenceMetric,
+    total_month: AdherenceMetric,
+    teams: list[tuple[str, AdherenceMetric, AdherenceMetric]],
+) -> str:
+    """Líder com sub-líderes (org_tree): total da subárvore + uma linha por equipe abaixo."""
+    lines: list[str] = []
+    lines.append(f"📊 Relatório Merchan - {node_name}")
+    lines.append("")
+    lines.append("")
+    lines.append(f"Aderência ao Roteiro - Equipe {node_name} (Ontem {day_label} | Mês {month_label})")
+    lines.append("")
+    lines.append(f"Ontem: {fmt_pct(total_day.aderencia_pct)}  |  Mês: {fmt_pct(total_month.aderencia_pct, with_icon=True)}")
+    lines.append("")
+    lines.append("👥 Equipes (ordem alfabética)")
+    lines.append("")
+
+    for name, d, m in sorted(teams, key=lambda t: t[0].casefold()):
         lines.append(f"- {name}:")
         lines.append(f"Ontem {fmt_pct(d.aderencia_pct)}  |  Mês {fmt_pct(m.aderencia_pct, with_icon=True)}")
         lines.append("")
@@ -223,6 +482,75 @@ def build_area_leader_message(
     return "\n".join(lines).strip() + "\n"
 
 
+def fmt_progress(m: AdherenceMetric) -> str:
+    return f"{fmt_pct(m.aderencia_pct)} ({m.visitas_feitas} de {m.visitas_planejadas})"
+
+
+def build_progress_message(
+    title: str,
+    hora_label: str,
+    total_label: str,
+    total: AdherenceMetric,
+    section_title: str,
+    rows: list[tuple[str, AdherenceMetric]],
+) -> str:
+    """Parcial do dia (modo --parcial): total + uma linha por área/colaborador."""
+    lines: list[str] = []
+    lines.append(f"⏱ {title} (até {hora_label})")
+    lines.append("")
+    lines.append(f"{total_label}: {fmt_progress(total)}")
+    lines.append("")
+    lines.append(section_title)
+    lines.append("")
+    if not rows:
+        lines.append("Sem visitas planejadas hoje.")
+        lines.append("")
+    for name, m in rows:
+        lines.append(f"- {name}: {fmt_progress(m)}")
+    return "\n".join(lines).strip() + "\n"
+
+
+# Mensagem individual do promotor; montada uma vez por linha da consulta de promotores
+PROMOTOR_MODELO = (
+    "📊 Relatório Merchan - {nome}\n"
+    "\n"
+    "Sua Aderência ao Roteiro\n"
+    "\n"
+    "Ontem {dia}: {pct_dia}  |  Mês {mes}: {pct_mes}\n"
+    "Visitas ontem: {feitas_dia} de {planejadas_dia}\n"
+)
+
+
+def build_promoter_messages(rows: list[dict], day_label: str, month_label: str) -> list[tuple[dict, str]]:
+    """(linha, mensagem) de cada promotor com visitas planejadas ontem.
+
+    Mesma regra dos líderes de área: quem não tinha visita planejada ontem não recebe.
+    Os percentuais saem das contagens do dia e do mês (AdherenceMetric).
+    """
+    render = PROMOTOR_MODELO.format
+    saida: list[tuple[dict, str]] = []
+    for r in rows:
+        dia = AdherenceMetric(_safe_int(r.get("visitas_feitas_dia", 0)), _safe_int(r.get("visitas_planejadas_dia", 0)))
+        nome = (r.get("colaborador") or "").strip()
+        if dia.visitas_planejadas <= 0 or not nome:
+            continue
+        saida.append(
+            (
+                r,
+                render(
+                    nome=nome,
+                    dia=day_label,
+                    mes=month_label,
+                    pct_dia=fmt_pct(dia.aderencia_pct),
+                    pct_mes=fmt_pct(metric_from_row(r).aderencia_pct, with_icon=True),
+                    feitas_dia=dia.visitas_feitas,
+                    planejadas_dia=dia.visitas_planejadas,
+                ),
+            )
+        )
+    return saida
+
+
 def build_diretoria_message(
     ref_date: date,
     semana_label: str,
@@ -257,7 +585,7 @@ def build_diretoria_message(
         for r in order_areas(areas_semana):
             area = (r.get("area_merchan") or "Não Identificada").strip()
             semana_metric = metric_from_row(r)
-            mes_metric = areas_mes_by_name.get(area, AdherenceMetric(0, 0, None))
+            mes_metric = areas_mes_by_name.get(area, AdherenceMetric())
             lines.append(f"- {area}:")
             lines.append(
                 f"Semana {fmt_pct(semana_metric.aderencia_pct, with_icon=False)}  |  Mês {fmt_pct(mes_metric.aderencia_pct, with_icon=True)}"
@@ -284,20 +612,8 @@ def build_diretoria_message(
             semana_r = semana_by_unit.get(unidade, {})
             mes_r = mes_by_unit.get(unidade, {})
 
-            semana_pct = None
-            mes_pct = None
-
-            try:
-                if semana_r.get("aderencia_pct") is not None:
-                    semana_pct = float(semana_r.get("aderencia_pct"))
-            except Exception:
-                pass
-
-            try:
-                if mes_r.get("aderencia_pct") is not None:
-                    mes_pct = float(mes_r.get("aderencia_pct"))
-            except Exception:
-                pass
+            semana_pct = metric_from_row(semana_r).aderencia_pct
+            mes_pct = metric_from_row(mes_r).aderencia_pct
 
             lines.append(f"- {unidade}:")
             lines.append(f"Semana {fmt_pct(semana_pct, with_icon=False)}  |  Mês {fmt_pct(mes_pct, with_icon=True)}")
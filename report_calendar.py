@@ -0,0 +1,89 @@
+"""Datas de referência do relatório (ontem, mês até ontem, semana anterior)."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+
+def should_send_today(today: date) -> bool:
+    # weekday: 0=segunda ... 6=domingo
+    return today.weekday() != 6
+
+
+def reference_date(today: date) -> date:
+    # segunda -> sábado
+    if today.weekday() == 0:
+        return today - timedelta(days=2)
+    return today - timedelta(days=1)
+
+
+def month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def week_start(d: date) -> date:
+    # Monday as start-of-week
+    return d - timedelta(days=d.weekday())
+
+
+JANELA_DIA = "dia"
+JANELA_MES = "mes"
+JANELA_SEMANA_ANTERIOR = "semana_anterior"
+
+
+@dataclass(frozen=True)
+class ReportContext:
+    hoje: date
+    ref: date
+    dt_start: date
+    dt_end: date
+    ms: date
+    me: date
+    ws_prev: date
+    we_prev: date
+    include_grupo_rede_merchan: bool
+    include_grupos_diretoria: bool
+
+    @classmethod
+    def para_data(cls, hoje: date) -> "ReportContext":
+        ref = reference_date(hoje)
+        ms = month_start(ref)
+        # Diretoria (segunda): a "semana anterior" é a semana que termina no sábado de referência (ref).
+        # Ex.: se hoje é 19/01 (seg), ref=17/01 (sáb) => semana desejada: 12/01 a 17/01.
+        ws_prev = week_start(ref)  # segunda-feira da semana do ref
+        return cls(
+            hoje=hoje,
+            ref=ref,
+            dt_start=ref,
+            dt_end=ref + timedelta(days=1),
+            ms=ms,
+            me=hoje,  # mês até ontem (exclui o dia de execução)
+            ws_prev=ws_prev,
+            we_prev=ws_prev + timedelta(days=6),  # fim exclusivo (domingo), inclui segunda..sábado
+            include_grupo_rede_merchan=True,  # TODO DIA
+            include_grupos_diretoria=hoje.weekday() == 0,  # SOMENTE SEGUNDA
+        )
+
+    @property
+    def month_label(self) -> str:
+        return f"{self.ms.strftime('%m')}"
+
+    @property
+    def ontem_label(self) -> str:
+        # 'Ontem' na mensagem refere-se ao dia consultado em dt_start/dt_end (ref)
+        return self.ref.strftime("%d/%m")
+
+    @property
+    def prev_week_label(self) -> str:
+        return f"{self.ws_prev.strftime('%d/%m')} a {(self.ws_prev + timedelta(days=5)).strftime('%d/%m')}"
+
+    def janela(self, nome: str) -> tuple[date, date]:
+        """Período [início, fim) de uma janela nomeada."""
+        if nome == JANELA_DIA:
+            return self.dt_start, self.dt_end
+        if nome == JANELA_MES:
+            return self.ms, self.me
+        if nome == JANELA_SEMANA_ANTERIOR:
+            return self.ws_prev, self.we_prev
+        raise ValueError(f"Janela desconhecida: {nome}")
@@ -0,0 +1,270 @@
+"""Janelas móveis de aderência (ex.: últimos 7 e 28 dias úteis) com atualização incremental.
+
+Cada chave (geral, área, colaborador da área) tem um anel com as contagens diárias
+(feitas, planejadas) dos últimos N dias úteis e a soma corrente de cada tamanho de
+janela. Entrar um dia novo custa O(1) por chave: soma o dia que entra e subtrai o
+que sai de cada janela.
+
+Dia útil = segunda a sábado com alguma visita planejada. Feriados já são excluídos
+dos fatos (dimFeriadoMerchan), então ficam vazios e não ocupam posição no anel.
+
+O estado fica em JANELAS_MOVEIS_ARQUIVO e só guarda dias já assentados (até
+ref - JANELAS_MOVEIS_DIAS_REABERTOS): check-ins lançados com atraso mudam os dias
+recentes, então esses são consultados de novo a cada execução e só entram em memória.
+Sem estado, ou com um buraco maior que a janela, o histórico é reconstruído com uma
+consulta cobrindo as últimas semanas. Prévias (somente_leitura) não gravam o estado.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+from datetime import date, timedelta
+
+import config
+from daily_facts import FatosDiarios
+from report_builder import AdherenceMetric
+from report_calendar import ReportContext
+from stage_profiler import etapa
+from tenants import arquivo_da_empresa
+
+
+JANELAS_MOVEIS = tuple(getattr(config, "JANELAS_MOVEIS", ()) or ())
+JANELAS_MOVEIS_ARQUIVO = getattr(config, "JANELAS_MOVEIS_ARQUIVO", "janelas_moveis.json")
+JANELAS_MOVEIS_DIAS_REABERTOS = max(0, int(getattr(config, "JANELAS_MOVEIS_DIAS_REABERTOS", 3) or 0))
+
+VERSAO_ESTADO = 1
+
+# Prévias (--teste/MODO_TESTE, prévia do modo serviço): o estado é lido mas não gravado
+_somente_leitura = False
+
+
+def somente_leitura(ativo: bool = True) -> None:
+    global _somente_leitura
+    _somente_leitura = ativo
+
+
+def dias_de_historico(tamanho: int) -> int:
+    """Dias corridos que cobrem `tamanho` dias úteis (seg-sáb), com folga para feriados."""
+    return math.ceil(tamanho * 7 / 6) + 14
+
+
+def chaves_da_linha(r: dict) -> list[str]:
+    """Chaves de uma linha de fatos normalizada (FatosDiarios); nomes em casefold."""
+    area = r["area"].casefold()
+    chaves = ["geral", f"area|{area}"]
+    # Colaboradores por área seguem a consulta da área (INNER JOIN em dimAreaMerchan)
+    if r["area_mapeada"]:
+        chaves.append(f"colab|{area}|{r['colaborador'].casefold()}")
+    return chaves
+
+
+class _Anel:
+    __slots__ = ("feitas", "planejadas", "pos", "dia", "somas")
+
+    def __init__(self, n: int, tamanhos: tuple[int, ...]):
+        self.feitas = [0] * n
+        self.planejadas = [0] * n
+        self.pos = -1
+        self.dia = -1  # índice do último dia útil gravado
+        self.somas = {k: [0, 0] for k in tamanhos}
+
+    def empurrar(self, feitas: int, planejadas: int) -> None:
+        n = len(self.feitas)
+        pos = (self.pos + 1) % n
+        for k, soma in self.somas.items():
+            # valor de k dias atrás sai da janela k (para k == n é a posição sobrescrita)
+            saida = (pos - k) % n
+            soma[0] += feitas - self.feitas[saida]
+            soma[1] += planejadas - self.planejadas[saida]
+        self.feitas[pos] = feitas
+        self.planejadas[pos] = planejadas
+        self.pos = pos
+        self.dia += 1
+
+    def alcancar(self, dia: int) -> None:
+        """Completa com zeros os dias úteis em que a chave não apareceu."""
+        faltam = min(dia - self.dia, len(self.feitas))
+        for _ in range(faltam):
+            self.empurrar(0, 0)
+        self.dia = max(self.dia, dia)
+
+    def valores(self) -> list[list[int]]:
+        """Do mais antigo para o mais recente."""
+        n = len(self.feitas)
+        return [[self.feitas[(self.pos + 1 + i) % n], self.planejadas[(self.pos + 1 + i) % n]] for i in range(n)]
+
+
+class JanelasMoveis:
+    def __init__(self, tamanhos: tuple[int, ...]):
+        self.tamanhos = tuple(sorted({int(k) for k in tamanhos if int(k) > 0}))
+        self.n = max(self.tamanhos)
+        self.dia_indice = -1
+        self.ultimo_dia: date | None = None
+        self._aneis: dict[str, _Anel] = {}
+
+    def avancar(self, dia: date, linhas: list[dict]) -> bool:
+        """Entra com as linhas de fatos de um dia; False se não for dia útil."""
+        self.ultimo_dia = dia
+        if dia.weekday() == 6 or not any(r["visitas_planejadas"] for r in linhas):
+            return False
+
+        do_dia: dict[str, list[int]] = {}
+        for r in linhas:
+            for chave in chaves_da_linha(r):
+                acc = do_dia.setdefault(chave, [0, 0])
+                acc[0] += r["visitas_feitas"]
+                acc[1] += r["visitas_planejadas"]
+
+        self.dia_indice += 1
+        for chave, (feitas, planejadas) in do_dia.items():
+            anel = self._aneis.get(chave)
+            if anel is None:
+                anel = self._aneis[chave] = _Anel(self.n, self.tamanhos)
+                anel.dia = self.dia_indice - 1
+            anel.alcancar(self.dia_indice - 1)
+            anel.empurrar(feitas, planejadas)
+        return True
+
+    def avancar_fatos(self, fatos: FatosDiarios, ate: date) -> None:
+        """Entra com os dias de fatos.inicio (ou do dia seguinte ao último) até `ate`, inclusive."""
+        d = fatos.inicio if self.ultimo_dia is None else max(fatos.inicio, self.ultimo_dia + timedelta(days=1))
+        while d <= ate:
+            self.avancar(d, list(fatos.visitas(d, d + timedelta(days=1))))
+            d += timedelta(days=1)
+
+    def metricas(self, chave: str) -> dict[int, AdherenceMetric]:
+        anel = self._aneis.get(chave)
+        if anel is None:
+            return {}
+        anel.alcancar(self.dia_indice)
+        return {k: AdherenceMetric(feitas, planejadas) for k, (feitas, planejadas) in anel.somas.items()}
+
+    def linhas(self) -> list[dict]:
+        """Uma linha por chave e tamanho (formato das consultas, para snapshot/montagem)."""
+        saida = []
+        for chave in sorted(self._aneis):
+            for k, m in self.metricas(chave).items():
+                if m.visitas_planejadas:
+                    saida.append(m.como_linha(chave=chave, dias=k))
+        return saida
+
+    # ------------------------------------------------------------------
+    # Estado em disco
+    # ------------------------------------------------------------------
+    def salvar(self, arquivo: str) -> None:
+        chaves = {}
+        for chave, anel in self._aneis.items():
+            # Janela inteira zerada: a chave sai do estado
+            if anel.dia < self.dia_indice - self.n:
+                continue
+            anel.alcancar(self.dia_indice)
+            chaves[chave] = anel.valores()
+        conteudo = {
+            "versao": VERSAO_ESTADO,
+            "tamanhos": list(self.tamanhos),
+            "ultimo_dia": self.ultimo_dia.isoformat() if self.ultimo_dia else None,
+            "chaves": chaves,
+        }
+        with open(arquivo, "w", encoding="utf-8") as f:
+            json.dump(conteudo, f, ensure_ascii=False, separators=(",", ":"))
+
+    @classmethod
+    def carregar(cls, arquivo: str, tamanhos: tuple[int, ...]) -> "JanelasMoveis | None":
+        """Estado salvo, ou None se não existir/for de outra configuração."""
+        if not arquivo or not os.path.exists(arquivo):
+            return None
+        try:
+            with open(arquivo, "r", encoding="utf-8") as f:
+                conteudo = json.load(f)
+        except Exception as e:
+            print(f"⚠ Estado das janelas móveis ilegível ({arquivo}): {e}")
+            return None
+        janelas = cls(tamanhos)
+        if conteudo.get("versao") != VERSAO_ESTADO or tuple(conteudo.get("tamanhos") or ()) != janelas.tamanhos:
+            return None
+        if not conteudo.get("ultimo_dia"):
+            return None
+        janelas.ultimo_dia = date.fromisoformat(conteudo["ultimo_dia"])
+        janelas.dia_indice = janelas.n - 1
+        for chave, valores in (conteudo.get("chaves") or {}).items():
+            anel = _Anel(janelas.n, janelas.tamanhos)
+            for feitas, planejadas in valores[-janelas.n:]:
+                anel.empurrar(int(feitas), int(planejadas))
+            anel.alcancar(janelas.dia_indice)
+            janelas._aneis[chave] = anel
+        return janelas
+
+
+def _extrair(db, inicio: date, fim: date) -> FatosDiarios:
+    import merchan_queries
+
+    with etapa("janelas_moveis;fatos"):
+        rows = db.query_rows(merchan_queries.daily_visit_facts_sql(inicio, fim))
+    return FatosDiarios(inicio, fim, rows)
+
+
+def janelas_ate(
+    db,
+    ref: date,
+    tamanhos: tuple[int, ...] = JANELAS_MOVEIS,
+    arquivo: str | None = JANELAS_MOVEIS_ARQUIVO,
+    reabertos: int = JANELAS_MOVEIS_DIAS_REABERTOS,
+) -> JanelasMoveis:
+    """Janelas atualizadas até `ref` (inclusive).
+
+    Consulta os dias que faltam no estado mais os últimos `reabertos` dias até `ref`,
+    que podem ainda receber check-ins; o estado só é gravado até ref - reabertos.
+    """
+    historico = dias_de_historico(max(tamanhos))
+    assentado = ref - timedelta(days=reabertos)
+    janelas = JanelasMoveis.carregar(arquivo, tamanhos) if arquivo else None
+
+    if janelas is not None and janelas.ultimo_dia > assentado:
+        # Estado à frente do dia assentado não volta atrás: reconstrói. Execução simulada
+        # no passado (--data) faz isso só em memória, sem mexer no estado
+        if janelas.ultimo_dia > ref:
+            arquivo = None
+        janelas = None
+    if janelas is not None and (ref - janelas.ultimo_dia).days > historico:
+        janelas = None
+
+    if janelas is None:
+        janelas = JanelasMoveis(tamanhos)
+        inicio = ref - timedelta(days=historico)
+    else:
+        inicio = janelas.ultimo_dia + timedelta(days=1)
+
+    fatos = _extrair(db, inicio, ref + timedelta(days=1))
+    if inicio <= assentado:
+        janelas.avancar_fatos(fatos, assentado)
+        if arquivo and not _somente_leitura:
+            try:
+                janelas.salvar(arquivo)
+            except Exception as e:
+                print(f"⚠ Não foi possível gravar o estado das janelas móveis ({arquivo}): {e}")
+    # Dias reabertos: só em memória
+    janelas.avancar_fatos(fatos, ref)
+    return janelas
+
+
+def linhas_janelas_moveis(ctx: ReportContext, db) -> list[dict]:
+    """Família local "moveis" do plano de métricas."""
+    return janelas_ate(db, ctx.ref, arquivo=arquivo_da_empresa(JANELAS_MOVEIS_ARQUIVO)).linhas()
+
+
+def janelas_de_fatos(fatos: FatosDiarios, ref: date, tamanhos: tuple[int, ...] = JANELAS_MOVEIS) -> list[dict]:
+    """Mesmas linhas a partir de fatos já extraídos (modo de recuperação)."""
+    janelas = JanelasMoveis(tamanhos)
+    janelas.avancar_fatos(fatos, ref)
+    return janelas.linhas()
+
+
+def moveis_por_chave(linhas: list[dict] | None) -> dict[str, dict[int, AdherenceMetric]]:
+    por_chave: dict[str, dict[int, AdherenceMetric]] = {}
+    for r in linhas or []:
+        por_chave.setdefault(r["chave"], {})[int(r["dias"])] = AdherenceMetric(
+            int(r["visitas_feitas"]), int(r["visitas_planejadas"])
+        )
+    return por_chave
@@ -0,0 +1,111 @@
+"""Prazo da execução inteira (EXECUCAO_PRAZO_MINUTOS / --prazo-minutos).
+
+Com o prazo ativo, cada etapa (`stage_profiler.etapa`) e cada consulta
+(`Database.query_rows`) confere o tempo restante antes de começar, e o timeout
+das consultas é limitado ao que falta. Estourou: PrazoEstourado com a etapa/consulta
+em que o prazo acabou e as etapas que mais consumiram tempo até ali.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+import config
+
+
+EXECUCAO_PRAZO_MINUTOS = getattr(config, "EXECUCAO_PRAZO_MINUTOS", None)
+
+
+class PrazoEstourado(RuntimeError):
+    pass
+
+
+_total: float | None = None
+_fim: float | None = None
+_inicio: float = 0.0
+_local = threading.local()
+_lock = threading.Lock()
+# caminho da etapa -> segundos (etapas concluídas)
+_tempos: dict[str, float] = {}
+
+
+def ativar(segundos: float) -> None:
+    global _total, _fim, _inicio
+    _inicio = time.monotonic()
+    _total = float(segundos)
+    _fim = _inicio + _total
+    _tempos.clear()
+
+
+def desativar() -> None:
+    global _total, _fim
+    _total = _fim = None
+
+
+def ativo() -> bool:
+    return _fim is not None
+
+
+def restante() -> float | None:
+    """Segundos até o prazo (None = sem prazo)."""
+    if _fim is None:
+        return None
+    return _fim - time.monotonic()
+
+
+def _pilha() -> list[str]:
+    pilha = getattr(_local, "pilha", None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    return pilha
+
+
+def etapa_atual() -> str:
+    return ";".join(_pilha()) or "execucao"
+
+
+def _fmt_segundos(s: float) -> str:
+    return f"{s / 60:.1f} min" if s >= 90 else f"{s:.1f}s"
+
+
+def estourar(onde: str) -> PrazoEstourado:
+    decorrido = time.monotonic() - _inicio
+    with _lock:
+        maiores = sorted(_tempos.items(), key=lambda x: x[1], reverse=True)[:3]
+    msg = f"Prazo da execução ({_fmt_segundos(_total or 0)}) estourado em '{onde}' após {_fmt_segundos(decorrido)}"
+    if maiores:
+        msg += "; etapas mais longas: " + ", ".join(f"{c} {_fmt_segundos(s)}" for c, s in maiores)
+    return PrazoEstourado(msg)
+
+
+def verificar(onde: str | None = None) -> None:
+    """Levanta PrazoEstourado se o prazo já acabou (no-op sem prazo)."""
+    r = restante()
+    if r is not None and r <= 0:
+        raise estourar(onde or etapa_atual())
+
+
+@contextmanager
+def etapa(nome: str):
+    """"metricas;geral" = etapa "geral" dentro de "metricas" (um nível por segmento)."""
+    with ExitStack() as niveis:
+        for segmento in nome.split(";"):
+            niveis.enter_context(_nivel(segmento))
+        yield
+
+
+@contextmanager
+def _nivel(nome: str):
+    pilha = _pilha()
+    pilha.append(nome)
+    caminho = ";".join(pilha)
+    t0 = time.monotonic()
+    try:
+        verificar(caminho)
+        yield
+    finally:
+        pilha.pop()
+        with _lock:
+            _tempos[caminho] = _tempos.get(caminho, 0.0) + time.monotonic() - t0
@@ -0,0 +1,106 @@
+"""Registro local das entregas por dia de execução (base do modo --recuperar).
+
+Cada item enviado com sucesso fica registrado no(s) dia(s) de execução a que se
+refere ("datas_execucao" do item). Um dia fica completo quando todos os itens
+esperados daquele dia foram entregues numa execução sem filtros.
+
+Dias úteis (segunda a sábado) sem registro completo desde o primeiro dia do
+registro são os dias perdidos que o modo de recuperação gera e envia.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from datetime import date, datetime, timedelta
+
+from report_calendar import should_send_today
+
+
+# Dias mais antigos que isto são descartados ao gravar
+DIAS_RETIDOS = 60
+
+
+def chave_item(item: dict) -> str:
+    return f"{item.get('tipo') or ''}|{item.get('telefone') or ''}|{item.get('destinatario') or ''}"
+
+
+def marcar_data_execucao(mensagens_envio: list[dict], hoje: date) -> list[dict]:
+    for item in mensagens_envio:
+        item["datas_execucao"] = [hoje.isoformat()]
+    return mensagens_envio
+
+
+class LedgerExecucoes:
+    def __init__(self, arquivo: str):
+        self.arquivo = arquivo
+        self._lock = threading.Lock()
+        self._dias: dict[str, dict] = {}
+        if os.path.exists(arquivo):
+            try:
+                with open(arquivo, "r", encoding="utf-8") as f:
+                    self._dias = json.load(f).get("dias") or {}
+            except Exception as e:
+                print(f"⚠ Não foi possível ler o registro de execuções ({arquivo}): {e}")
+
+    def _dia(self, dia: str) -> dict:
+        return self._dias.setdefault(dia, {"completo": False, "entregues": []})
+
+    def _salvar(self) -> None:
+        limite = (datetime.now().date() - timedelta(days=DIAS_RETIDOS)).isoformat()
+        self._dias = {d: v for d, v in self._dias.items() if d >= limite}
+        try:
+            with open(self.arquivo, "w", encoding="utf-8") as f:
+                json.dump({"dias": self._dias}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        except Exception as e:
+            print(f"  ⚠ Não foi possível gravar o registro de execuções ({self.arquivo}): {e}")
+
+    def registrar_entrega(self, item: dict, sucesso: bool = True) -> None:
+        """Assinatura compatível com ao_concluir_item(item, sucesso) do envio."""
+        if not sucesso or not item.get("datas_execucao"):
+            return
+        chave = chave_item(item)
+        with self._lock:
+            for dia in item["datas_execucao"]:
+                registro = self._dia(dia)
+                if chave not in registro["entregues"]:
+                    registro["entregues"].append(chave)
+                registro["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+            self._salvar()
+
+    def entregues(self, dia: date) -> set[str]:
+        with self._lock:
+            return set((self._dias.get(dia.isoformat()) or {}).get("entregues") or [])
+
+    def completo(self, dia: date) -> bool:
+        with self._lock:
+            return bool((self._dias.get(dia.isoformat()) or {}).get("completo"))
+
+    def concluir_se_entregue(self, dia: date, itens: list[dict]) -> bool:
+        """Marca o dia como completo se todos os itens esperados já foram entregues."""
+        pendentes = {chave_item(i) for i in itens} - self.entregues(dia)
+        if pendentes:
+            return False
+        with self._lock:
+            self._dia(dia.isoformat())["completo"] = True
+            self._salvar()
+        return True
+
+    def dias_pendentes(self, hoje: date, max_dias: int) -> list[date]:
+        """Dias úteis até hoje (inclusive) sem registro completo, a partir do início do registro.
+
+        Sem histórico, só `hoje` é considerado (não inventa atrasos na primeira execução).
+        """
+        with self._lock:
+            conhecidos = sorted(self._dias)
+        inicio = hoje
+        if conhecidos:
+            inicio = max(date.fromisoformat(conhecidos[0]), hoje - timedelta(days=max_dias))
+        dias = []
+        d = inicio
+        while d <= hoje:
+            if should_send_today(d) and not self.completo(d):
+                dias.append(d)
+            d += timedelta(days=1)
+        return dias
@@ -0,0 +1,118 @@
+"""Snapshot da execução: datas, métricas e mensagens prontas, em JSON compactado.
+
+Toda execução grava um snapshot. Com `--de-snapshot <arquivo>`, o main carrega o
+lote daqui e vai direto para a prévia/envio: sem pyodbc e sem consultar o banco.
+Assim, a prévia aprovada é exatamente o que será enviado.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+
+from metric_plan import Metrica
+from report_calendar import ReportContext
+
+
+VERSAO_SNAPSHOT = 1
+
+
+def _json_default(v):
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, (date, datetime)):
+        return v.isoformat()
+    raise TypeError(f"Tipo não serializável no snapshot: {type(v).__name__}")
+
+
+@dataclass
+class Snapshot:
+    versao: int
+    gerado_em: str
+    ctx: ReportContext
+    resultados: dict[Metrica, list[dict]]
+    mensagens_envio: list[dict]
+    telefone_teste: bool = False
+    arquivo: str | None = None
+
+
+def _ctx_para_dict(ctx: ReportContext) -> dict:
+    return {
+        "hoje": ctx.hoje.isoformat(),
+        "ref": ctx.ref.isoformat(),
+        "dt_start": ctx.dt_start.isoformat(),
+        "dt_end": ctx.dt_end.isoformat(),
+        "ms": ctx.ms.isoformat(),
+        "me": ctx.me.isoformat(),
+        "ws_prev": ctx.ws_prev.isoformat(),
+        "we_prev": ctx.we_prev.isoformat(),
+        "include_grupo_rede_merchan": ctx.include_grupo_rede_merchan,
+        "include_grupos_diretoria": ctx.include_grupos_diretoria,
+    }
+
+
+def _ctx_de_dict(d: dict) -> ReportContext:
+    datas = {k: date.fromisoformat(d[k]) for k in ("hoje", "ref", "dt_start", "dt_end", "ms", "me", "ws_prev", "we_prev")}
+    return ReportContext(
+        include_grupo_rede_merchan=bool(d["include_grupo_rede_merchan"]),
+        include_grupos_diretoria=bool(d["include_grupos_diretoria"]),
+        **datas,
+    )
+
+
+def salvar_snapshot(
+    diretorio: str,
+    ctx: ReportContext,
+    resultados: dict[Metrica, list[dict]],
+    mensagens_envio: list[dict],
+    telefone_teste: bool = False,
+) -> str:
+    os.makedirs(diretorio, exist_ok=True)
+    agora = datetime.now()
+    arquivo = os.path.join(
+        diretorio, f"snapshot_{ctx.hoje.isoformat()}_{agora.strftime('%H%M%S')}.json.gz"
+    )
+    conteudo = {
+        "versao": VERSAO_SNAPSHOT,
+        "gerado_em": agora.isoformat(timespec="seconds"),
+        "telefone_teste": telefone_teste,
+        "datas": _ctx_para_dict(ctx),
+        "metricas": [
+            {"familia": m.familia, "janela": m.janela, "area": m.area, "linhas": linhas}
+            for m, linhas in resultados.items()
+        ],
+        "mensagens_envio": mensagens_envio,
+    }
+    with gzip.open(arquivo, "wt", encoding="utf-8") as f:
+        json.dump(conteudo, f, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+    return arquivo
+
+
+def carregar_snapshot(arquivo: str) -> Snapshot:
+    abrir = gzip.open if arquivo.endswith(".gz") else open
+    with abrir(arquivo, "rt", encoding="utf-8") as f:
+        conteudo = json.load(f)
+
+    versao = int(conteudo.get("versao") or 0)
+    if versao > VERSAO_SNAPSHOT:
+        raise ValueError(
+            f"Snapshot {arquivo} tem versão {versao}; esta versão do script lê até {VERSAO_SNAPSHOT}."
+        )
+
+    resultados = {
+        Metrica(m["familia"], m["janela"], m.get("area")): m.get("linhas") or []
+        for m in conteudo.get("metricas") or []
+    }
+    return Snapshot(
+        versao=versao,
+        gerado_em=conteudo.get("gerado_em") or "",
+        ctx=_ctx_de_dict(conteudo["datas"]),
+        resultados=resultados,
+        mensagens_envio=conteudo.get("mensagens_envio") or [],
+        telefone_teste=bool(conteudo.get("telefone_teste")),
+        arquivo=arquivo,
+    )
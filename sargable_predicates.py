@@ -0,0 +1,147 @@
+"""Modo de predicados indexáveis (PREDICADOS_MODO = "indexavel").
+
+No modo normal, os filtros das consultas envolvem a coluna em funções:
+`LTRIM(RTRIM(ISNULL(ForaDoRoteiro, 'Não'))) COLLATE ... = 'Nao'` e o feriado por
+`CAST(DataVisita AS DATE)` numa subconsulta — o otimizador não usa índice nelas.
+
+No modo indexável, uma vez por execução (e por empresa), duas consultas pequenas
+trazem as grafias distintas de ForaDoRoteiro/tipocheckin e os feriados do período
+que cobre o plano; a normalização (espaços, caixa, acentos) é feita aqui, e as
+consultas passam a usar:
+- `ForaDoRoteiro IN ('Não', 'NAO', ...) OR ForaDoRoteiro IS NULL`;
+- `tipocheckin IN (<grafias presentes que equivalem a CHECKIN_VALIDOS>)`;
+- feriados como faixas de data (`NOT (DataVisita >= d AND DataVisita < d+1)`).
+
+Consulta montada para um período fora do que foi descoberto: predicados normais.
+Comparação dos planos num banco sintético: python predicate_benchmark.py
+"""
+
+from __future__ import annotations
+
+import threading
+import unicodedata
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+
+import config
+import tenants
+
+
+PREDICADOS_MODO = getattr(config, "PREDICADOS_MODO", "normalizado")
+MODOS = ("normalizado", "indexavel")
+
+
+def normalizar(valor) -> str:
+    """' NÃO ' -> 'nao' (mesma equivalência do COLLATE ..._CI_AI com LTRIM/RTRIM)."""
+    texto = unicodedata.normalize("NFKD", str(valor or "").strip())
+    return "".join(c for c in texto if not unicodedata.combining(c)).casefold()
+
+
+def _como_data(v) -> date:
+    if isinstance(v, datetime):
+        return v.date()
+    if isinstance(v, date):
+        return v
+    return date.fromisoformat(str(v)[:10])
+
+
+@dataclass
+class Variantes:
+    ini: date
+    fim: date
+    fora_nao: list[str] = field(default_factory=list)
+    # NULL conta como 'Não' (ISNULL(..., 'Não') do modo normal)
+    fora_nulo: bool = False
+    checkins: list[str] = field(default_factory=list)
+    feriados: list[date] = field(default_factory=list)
+
+    def cobre(self, periodo: tuple[date, date]) -> bool:
+        return self.ini <= periodo[0] and periodo[1] <= self.fim
+
+    def faixas_feriados(self) -> list[tuple[date, date]]:
+        """Feriados seguidos viram uma faixa só: [(ini, fim exclusivo), ...]."""
+        faixas: list[list[date]] = []
+        for dia in sorted(set(self.feriados)):
+            if faixas and faixas[-1][1] == dia:
+                faixas[-1][1] = dia + timedelta(days=1)
+            else:
+                faixas.append([dia, dia + timedelta(days=1)])
+        return [(a, b) for a, b in faixas]
+
+
+def _chave_checkin(valor) -> str:
+    # tipocheckin IN (...) do modo normal: caixa e espaços à direita não importam, acentos sim
+    return str(valor).rstrip().casefold()
+
+
+def montar_variantes(ini: date, fim: date, rows: list[dict], feriados: list[dict], checkins_validos) -> Variantes:
+    alvos_checkin = {_chave_checkin(x) for x in checkins_validos}
+    v = Variantes(ini, fim)
+    fora: set[str] = set()
+    checkins: set[str] = set()
+    for r in rows:
+        valor = r.get("fora_do_roteiro")
+        if valor is None:
+            v.fora_nulo = True
+        elif normalizar(valor) == "nao":
+            fora.add(str(valor))
+        tipo = r.get("tipocheckin")
+        if tipo is not None and _chave_checkin(tipo) in alvos_checkin:
+            checkins.add(str(tipo))
+    v.fora_nao = sorted(fora)
+    v.checkins = sorted(checkins)
+    v.feriados = sorted({_como_data(r["data"]) for r in feriados if r.get("data") is not None})
+    return v
+
+
+_lock = threading.Lock()
+# empresa ativa (None = config) -> variantes descobertas nesta execução
+_descobertas: dict[str | None, Variantes] = {}
+
+
+def ativo() -> bool:
+    return PREDICADOS_MODO == "indexavel"
+
+
+def limpar() -> None:
+    """Nova execução (modo serviço): as grafias são descobertas de novo."""
+    with _lock:
+        _descobertas.clear()
+
+
+def variantes(periodo: tuple[date, date] | None) -> Variantes | None:
+    """Variantes que cobrem o período, ou None (usar os predicados normais)."""
+    if periodo is None or not ativo():
+        return None
+    with _lock:
+        v = _descobertas.get(tenants.empresa_atual())
+    return v if v is not None and v.cobre(periodo) else None
+
+
+def preparar(db, ini: date, fim: date) -> Variantes | None:
+    """Descobre (uma vez por execução/empresa) as grafias e os feriados de [ini, fim)."""
+    if not ativo():
+        return None
+    existente = variantes((ini, fim))
+    if existente is not None:
+        return existente
+
+    with _lock:
+        atual = _descobertas.get(tenants.empresa_atual())
+    if atual is not None:
+        # Período maior que o já descoberto: descobre a união de uma vez
+        ini, fim = min(ini, atual.ini), max(fim, atual.fim)
+
+    import merchan_queries
+
+    rows = db.query_rows(merchan_queries.predicate_variants_sql(ini, fim))
+    feriados = db.query_rows(merchan_queries.holidays_between_sql(ini, fim))
+    v = montar_variantes(ini, fim, rows, feriados, merchan_queries.CHECKIN_VALIDOS)
+    with _lock:
+        _descobertas[tenants.empresa_atual()] = v
+    print(
+        f"🔎 Predicados indexáveis ({ini.strftime('%d/%m')} a {(fim - timedelta(days=1)).strftime('%d/%m')}): "
+        f"{len(v.fora_nao) + v.fora_nulo} grafia(s) de ForaDoRoteiro, {len(v.checkins)} de tipocheckin, "
+        f"{len(v.feriados)} feriado(s)"
+    )
+    return v
@@ -0,0 +1,318 @@
+"""Agenda do lote de envio: prioridade, adjacência por telefone e ETA.
+
+- Cada item recebe uma duração estimada a partir dos tempos configurados no
+  WhatsAppSender (wait_time, espera pós-envio, intervalos) ou dos tempos
+  aprendidos em execuções anteriores (arquivo JSON ao lado do script).
+- A ordem final respeita a classe de prioridade (Merchan > Diretoria > áreas)
+  e mantém juntos os itens do mesmo telefone (não reabre a aba à toa).
+- Com prazo configurado (ex.: "08:00"), itens que terminariam depois do prazo
+  são sinalizados; os de baixa prioridade podem ser adiados (ficam fora do lote).
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, time as dt_time, timedelta
+
+
+# Menor valor = enviado antes
+PRIORIDADE_POR_TIPO = {
+    "lider_merchan": 0,
+    "diretoria": 1,
+    "lider_area": 2,
+    "lider_org": 2,
+    "promotor": 3,
+}
+PRIORIDADE_PADRAO = 3
+
+# Overhead aproximado do pywhatkit além do wait_time (abrir aba, digitar, clicar)
+OVERHEAD_PYWHATKIT_SEGUNDOS = 6.0
+
+# Peso da amostra nova na média móvel dos tempos aprendidos
+PESO_AMOSTRA_NOVA = 0.3
+
+
+def prioridade_do_tipo(tipo: str | None) -> int:
+    return PRIORIDADE_POR_TIPO.get((tipo or "").strip().casefold(), PRIORIDADE_PADRAO)
+
+
+def parse_prazo(valor: str | None, base: datetime) -> datetime | None:
+    """Converte "HH:MM" no datetime correspondente no dia de `base`."""
+    if not valor:
+        return None
+    try:
+        hh, mm = str(valor).strip().split(":", 1)
+        return datetime.combine(base.date(), dt_time(int(hh), int(mm)))
+    except Exception:
+        print(f"⚠ Prazo de envio inválido ({valor!r}); seguindo sem prazo.")
+        return None
+
+
+def fmt_duracao(segundos: float) -> str:
+    segundos = max(0, int(round(segundos)))
+    minutos, seg = divmod(segundos, 60)
+    if minutos >= 60:
+        horas, minutos = divmod(minutos, 60)
+        return f"{horas}h{minutos:02d}min"
+    if minutos:
+        return f"{minutos}min{seg:02d}s"
+    return f"{seg}s"
+
+
+@dataclass
+class ItemAgendado:
+    item: dict
+    indice_original: int
+    prioridade: int
+    duracao_estimada: float
+    fim_estimado: datetime | None = None
+    atrasado: bool = False
+
+
+@dataclass
+class PlanoEnvio:
+    itens: list[ItemAgendado]
+    adiados: list[ItemAgendado] = field(default_factory=list)
+    inicio: datetime | None = None
+    prazo: datetime | None = None
+    preparacao_segundos: float = 0.0
+
+    @property
+    def fim_estimado(self) -> datetime | None:
+        if not self.itens:
+            return self.inicio
+        return self.itens[-1].fim_estimado
+
+    def restante_apos(self, posicao: int) -> float:
+        """Segundos estimados para os itens depois de `posicao` (0-based)."""
+        return sum(x.duracao_estimada for x in self.itens[posicao + 1 :])
+
+
+class AgendaEnvio:
+    def __init__(
+        self,
+        wait_time_primeira=90,
+        wait_time_padrao=45,
+        espera_pos_envio=10,
+        intervalo_entre_mensagens=15,
+        intervalo_mesmo_numero=8,
+        warmup_segundos=25,
+        prazo: str | None = None,
+        acao_prazo: str = "sinalizar",
+        prioridade_minima_adiavel: int = PRIORIDADE_POR_TIPO["lider_area"],
+        arquivo_tempos: str | None = None,
+    ):
+        self.wait_time_primeira = wait_time_primeira
+        self.wait_time_padrao = wait_time_padrao
+        self.espera_pos_envio = espera_pos_envio
+        self.intervalo = intervalo_entre_mensagens
+        self.intervalo_mesmo_numero = intervalo_mesmo_numero
+        self.warmup_segundos = warmup_segundos
+        self.prazo = prazo
+        self.acao_prazo = (acao_prazo or "sinalizar").strip().casefold()
+        self.prioridade_minima_adiavel = prioridade_minima_adiavel
+        self.arquivo_tempos = arquivo_tempos
+        # tipo -> segundos por mensagem (média móvel das execuções anteriores)
+        self.tempos_aprendidos: dict[str, float] = {}
+        # Compartilhada entre sessões de envio paralelas (sender_pool)
+        self._lock = threading.Lock()
+        self._carregar_tempos()
+
+    @classmethod
+    def do_sender(cls, sender, **kwargs) -> "AgendaEnvio":
+        """Cria a agenda usando os mesmos tempos configurados no WhatsAppSender."""
+        return cls(
+            wait_time_primeira=sender.wait_time_primeira,
+            wait_time_padrao=sender.wait_time_padrao,
+            espera_pos_envio=sender.espera_pos_envio,
+            intervalo_entre_mensagens=sender.intervalo,
+            intervalo_mesmo_numero=sender.intervalo_mesmo_numero,
+            warmup_segundos=sender.warmup_segundos,
+            **kwargs,
+        )
+
+    # ------------------------------------------------------------------
+    # Tempos aprendidos
+    # ------------------------------------------------------------------
+    def _carregar_tempos(self) -> None:
+        if not self.arquivo_tempos or not os.path.exists(self.arquivo_tempos):
+            return
+        try:
+            with open(self.arquivo_tempos, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.tempos_aprendidos = {
+                str(k): float(v) for k, v in (data.get("segundos_por_mensagem") or {}).items()
+            }
+        except Exception as e:
+            print(f"⚠ Não foi possível ler tempos aprendidos ({self.arquivo_tempos}): {e}")
+
+    def salvar_tempos(self) -> None:
+        if not self.arquivo_tempos:
+            return
+        try:
+            with self._lock, open(self.arquivo_tempos, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "atualizado_em": datetime.now().isoformat(timespec="seconds"),
+                        "segundos_por_mensagem": self.tempos_aprendidos,
+                    },
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+        except Exception as e:
+            print(f"⚠ Não foi possível gravar tempos aprendidos ({self.arquivo_tempos}): {e}")
+
+    def registrar_duracao(self, tipo: str | None, qtd_mensagens: int, segundos: float) -> None:
+        """Atualiza a média móvel de segundos por mensagem do tipo informado."""
+        if qtd_mensagens <= 0 or segundos <= 0:
+            return
+        chave = (tipo or "").strip().casefold() or "padrao"
+        amostra = segundos / qtd_mensagens
+        with self._lock:
+            atual = self.tempos_aprendidos.get(chave)
+            if atual is None:
+                self.tempos_aprendidos[chave] = amostra
+            else:
+                self.tempos_aprendidos[chave] = (1 - PESO_AMOSTRA_NOVA) * atual + PESO_AMOSTRA_NOVA * amostra
+
+    # ------------------------------------------------------------------
+    # Estimativas
+    # ------------------------------------------------------------------
+    def estimar_mensagem(self, primeira: bool = False) -> float:
+        """Duração de um enviar_mensagem, com base nos tempos configurados."""
+        wait_time = self.wait_time_primeira if primeira else self.wait_time_padrao
+        enter = 1.0 + 3 * 0.6
+        pos_envio = 0.0
+        if self.espera_pos_envio and self.espera_pos_envio > 0:
+            pos_envio = max(self.espera_pos_envio, 5) + 3
+        return wait_time + OVERHEAD_PYWHATKIT_SEGUNDOS + enter + pos_envio
+
+    def estimar_preparacao(self) -> float:
+        """Warm-up do WhatsApp Web + mensagem de kickoff (1ª mensagem, wait maior)."""
+        return float(self.warmup_segundos or 0) + self.estimar_mensagem(primeira=True)
+
+    def estimar_item(self, item: dict, fecha_aba: bool = True) -> float:
+        qtd = len(item.get("mensagens") or [])
+        if qtd == 0:
+            return 0.0
+        chave = (item.get("tipo") or "").strip().casefold() or "padrao"
+        aprendido = self.tempos_aprendidos.get(chave)
+        if aprendido is not None:
+            # A amostra aprendida já inclui as pausas entre mensagens do mesmo número
+            total = aprendido * qtd
+        else:
+            total = self.estimar_mensagem() * qtd + self.intervalo_mesmo_numero * (qtd - 1)
+        total += self.intervalo if fecha_aba else 1
+        return total
+
+    # ------------------------------------------------------------------
+    # Ordenação + prazo
+    # ------------------------------------------------------------------
+    def ordenar(self, mensagens_envio: list[dict]) -> list[tuple[int, dict]]:
+        """Ordena por prioridade, mantendo itens do mesmo telefone adjacentes.
+
+        Cada telefone forma um grupo que herda a maior prioridade (menor valor)
+        entre os seus itens; a ordem original desempata.
+        """
+        grupos: dict[str, list[tuple[int, dict]]] = {}
+        for i, item in enumerate(mensagens_envio):
+            grupos.setdefault(item.get("telefone") or "", []).append((i, item))
+
+        def chave_item(par: tuple[int, dict]):
+            i, item = par
+            return (prioridade_do_tipo(item.get("tipo")), i)
+
+        def chave_grupo(itens: list[tuple[int, dict]]):
+            return min(chave_item(p) for p in itens)
+
+        ordenado: list[tuple[int, dict]] = []
+        for itens in sorted(grupos.values(), key=chave_grupo):
+            ordenado.extend(sorted(itens, key=chave_item))
+        return ordenado
+
+    def planejar(
+        self,
+        mensagens_envio: list[dict],
+        inicio: datetime | None = None,
+        incluir_preparacao: bool = True,
+    ) -> PlanoEnvio:
+        inicio = inicio or datetime.now()
+        prazo_dt = parse_prazo(self.prazo, inicio)
+        ordenado = self.ordenar(mensagens_envio)
+
+        def montar(pares: list[tuple[int, dict]]) -> list[ItemAgendado]:
+            itens: list[ItemAgendado] = []
+            for pos, (i, item) in enumerate(pares):
+                prox_tel = pares[pos + 1][1].get("telefone") if pos + 1 < len(pares) else None
+                fecha_aba = prox_tel != item.get("telefone")
+                itens.append(
+                    ItemAgendado(
+                        item=item,
+                        indice_original=i,
+                        prioridade=prioridade_do_tipo(item.get("tipo")),
+                        duracao_estimada=self.estimar_item(item, fecha_aba=fecha_aba),
+                    )
+                )
+            return itens
+
+        preparacao = self.estimar_preparacao() if incluir_preparacao else 0.0
+        itens = montar(ordenado)
+        adiados: list[ItemAgendado] = []
+
+        if prazo_dt is not None and self.acao_prazo == "adiar":
+            # Remove do fim (menor prioridade) enquanto o lote não couber no prazo
+            while itens:
+                fim = inicio + timedelta(seconds=preparacao + sum(x.duracao_estimada for x in itens))
+                if fim <= prazo_dt:
+                    break
+                candidatos = [x for x in itens if x.prioridade >= self.prioridade_minima_adiavel]
+                if not candidatos:
+                    break
+                ultimo = candidatos[-1]
+                adiados.insert(0, ultimo)
+                restantes = [(x.indice_original, x.item) for x in itens if x is not ultimo]
+                itens = montar(restantes)
+
+        acumulado = preparacao
+        for x in itens:
+            acumulado += x.duracao_estimada
+            x.fim_estimado = inicio + timedelta(seconds=acumulado)
+            x.atrasado = prazo_dt is not None and x.fim_estimado > prazo_dt
+
+        return PlanoEnvio(
+            itens=itens,
+            adiados=adiados,
+            inicio=inicio,
+            prazo=prazo_dt,
+            preparacao_segundos=preparacao,
+        )
+
+    def imprimir_plano(self, plano: PlanoEnvio) -> None:
+        print(f"\n{'='*60}")
+        print("AGENDA DO LOTE")
+        print(f"{'='*60}")
+        if plano.preparacao_segundos:
+            print(f"Preparação (warm-up + kickoff): ~{fmt_duracao(plano.preparacao_segundos)}")
+        for pos, x in enumerate(plano.itens, 1):
+            fim = x.fim_estimado.strftime("%H:%M:%S") if x.fim_estimado else "?"
+            alerta = "  ⚠ APÓS O PRAZO" if x.atrasado else ""
+            print(
+                f"[{pos}/{len(plano.itens)}] {(x.item.get('tipo') or '').upper()}: "
+                f"{x.item.get('destinatario')} (~{fmt_duracao(x.duracao_estimada)}, até {fim}){alerta}"
+            )
+        if plano.fim_estimado is not None:
+            print(f"Término estimado: {plano.fim_estimado.strftime('%H:%M:%S')}")
+        if plano.prazo is not None:
+            print(f"Prazo: {plano.prazo.strftime('%H:%M')}")
+            atrasados = [x for x in plano.itens if x.atrasado]
+            if atrasados:
+                print(f"⚠ {len(atrasados)} item(ns) devem terminar depois do prazo.")
+        if plano.adiados:
+            print(f"⏭ Adiados (não cabem no prazo): {len(plano.adiados)}")
+            for x in plano.adiados:
+                print(f"  - {(x.item.get('tipo') or '').upper()}: {x.item.get('destinatario')}")
+        print(f"{'='*60}\n")
@@ -0,0 +1,395 @@
+"""Simulador do envio em relógio virtual: mede o ritmo do lote sem abrir o WhatsApp.
+
+O `WhatsAppSender` real roda com relógio, pywhatkit, pyautogui e navegador
+substituídos: cada `sleep` só avança o relógio virtual e o pywhatkit simulado
+consome o `wait_time` + uma latência sorteada, falhando com a probabilidade
+configurada. Um lote de 500 destinatários roda em milissegundos.
+
+Uso (parâmetros de envio vêm do config; listas viram cenários comparados):
+    python send_simulator.py --destinatarios 500
+    python send_simulator.py --intervalo 15 10 5 --falha-pct 3 --latencia lognormal:4:2
+    python send_simulator.py --travamento-pct 1 --watchdog 0 60 120
+    python send_simulator.py --de-snapshot snapshots\\<arquivo>.json.gz
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import math
+import os
+import random
+import time
+from contextlib import redirect_stdout
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+from send_scheduler import fmt_duracao
+from sender_telemetry import percentil
+
+
+TIPOS_DISTRIBUICAO = ("fixa", "normal", "lognormal", "exponencial")
+
+
+@dataclass
+class Distribuicao:
+    tipo: str = "fixa"
+    media: float = 0.0
+    desvio: float = 0.0
+
+    def sortear(self, rng: random.Random) -> float:
+        if self.tipo == "fixa" or self.media <= 0:
+            return max(0.0, self.media)
+        if self.tipo == "normal":
+            return max(0.0, rng.gauss(self.media, self.desvio))
+        if self.tipo == "exponencial":
+            return rng.expovariate(1 / self.media)
+        # lognormal parametrizada pela média/desvio da própria latência
+        sigma2 = math.log(1 + (self.desvio / self.media) ** 2)
+        mu = math.log(self.media) - sigma2 / 2
+        return rng.lognormvariate(mu, math.sqrt(sigma2))
+
+    @classmethod
+    def de_texto(cls, texto: str) -> "Distribuicao":
+        """"lognormal:4:2", "normal:4:1", "exponencial:4" ou só "4" (fixa)."""
+        partes = str(texto).split(":")
+        if partes[0] not in TIPOS_DISTRIBUICAO:
+            return cls("fixa", float(partes[0]))
+        valores = [float(x) for x in partes[1:]] + [0.0, 0.0]
+        return cls(partes[0], valores[0], valores[1])
+
+    def __str__(self) -> str:
+        if self.tipo == "fixa":
+            return f"{self.media:g}s"
+        return f"{self.tipo}({self.media:g}s ± {self.desvio:g}s)"
+
+
+@dataclass
+class PerfilSimulacao:
+    # Tempo para abrir a aba/carregar a conversa, além do wait_time do pywhatkit
+    abertura: Distribuicao = field(default_factory=lambda: Distribuicao("lognormal", 4.0, 2.0))
+    # Probabilidade de o pywhatkit falhar (aba não carregou, número inválido...)
+    prob_falha: float = 0.02
+    # Probabilidade de falhar logo depois de uma falha (instabilidade em rajada)
+    prob_falha_apos_falha: float | None = None
+    # Probabilidade de a chamada travar (navegador congelado) e por quanto tempo; com o
+    # watchdog, o lote desiste do envio no prazo (RelogioVirtual.executar_com_prazo)
+    prob_travamento: float = 0.0
+    travamento_segundos: float = 900.0
+    semente: int = 42
+
+
+class _PrazoEsgotado(BaseException):
+    """Interrompe o envio simulado no prazo do watchdog (BaseException: o sender não a engole)."""
+
+
+class RelogioVirtual:
+    def __init__(self, inicio: datetime | None = None):
+        self.inicio = inicio or datetime.now()
+        self.segundos = 0.0
+        self._prazo: float | None = None
+
+    def monotonic(self) -> float:
+        return self.segundos
+
+    def dormir(self, segundos: float) -> None:
+        if not segundos or segundos <= 0:
+            return
+        if self._prazo is not None and self.segundos + segundos >= self._prazo:
+            # O lote (thread principal) retoma no prazo; o que sobrou do envio não conta
+            self.segundos = self._prazo
+            raise _PrazoEsgotado()
+        self.segundos += segundos
+
+    def executar_com_prazo(self, funcao, segundos: float):
+        """Equivalente virtual de `whatsapp_sender.executar_em_thread`."""
+        self._prazo = self.segundos + segundos
+        try:
+            return True, funcao()
+        except _PrazoEsgotado:
+            return False, None
+        finally:
+            self._prazo = None
+
+    def agora(self) -> datetime:
+        return self.inicio + timedelta(seconds=self.segundos)
+
+
+class PyWhatKitSimulado:
+    def __init__(self, relogio: RelogioVirtual, perfil: PerfilSimulacao, rng: random.Random):
+        self.relogio = relogio
+        self.perfil = perfil
+        self.rng = rng
+        self.chamadas = 0
+        self.falhas = 0
+        self.travamentos = 0
+        self._falhou = False
+
+    def sendwhatmsg_instantly(self, phone_no, message, wait_time=15, tab_close=False, close_time=3):
+        self.chamadas += 1
+        self.relogio.dormir(self.perfil.abertura.sortear(self.rng))
+        if self.rng.random() < self.perfil.prob_travamento:
+            # Fica bloqueado até destravar sozinho; a mensagem pode ou não ter saído
+            self.travamentos += 1
+            self.relogio.dormir(self.perfil.travamento_segundos)
+            return
+        prob = self.perfil.prob_falha
+        if self._falhou and self.perfil.prob_falha_apos_falha is not None:
+            prob = self.perfil.prob_falha_apos_falha
+        self._falhou = self.rng.random() < prob
+        if self._falhou:
+            self.falhas += 1
+            raise RuntimeError("falha simulada ao abrir a conversa")
+        self.relogio.dormir(wait_time)
+        if tab_close:
+            self.relogio.dormir(close_time)
+
+
+class TecladoSimulado:
+    def __init__(self):
+        self.teclas = 0
+        self.atalhos: dict[str, int] = {}
+
+    def press(self, tecla):
+        self.teclas += 1
+
+    def hotkey(self, *teclas):
+        chave = "+".join(teclas)
+        self.atalhos[chave] = self.atalhos.get(chave, 0) + 1
+
+
+class NavegadorSimulado:
+    def __init__(self):
+        self.aberturas = 0
+        self.encerramentos = 0
+
+    def open(self, url):
+        self.aberturas += 1
+        return True
+
+    def encerrar(self):
+        self.encerramentos += 1
+
+
+@dataclass
+class ResultadoSimulacao:
+    cenario: dict
+    destinatarios: int
+    mensagens: int
+    enviadas: int
+    falhas: int
+    chamadas_pywhatkit: int
+    falhas_injetadas: int
+    travamentos: int
+    navegador_encerrado: int
+    abas_fechadas: int
+    segundos_virtuais: float
+    segundos_reais: float
+    inicio: datetime
+    duracoes_item: list[float]
+
+    @property
+    def termino(self) -> datetime:
+        return self.inicio + timedelta(seconds=self.segundos_virtuais)
+
+    def por_hora(self, quantidade: int) -> float:
+        return quantidade / self.segundos_virtuais * 3600 if self.segundos_virtuais else 0.0
+
+
+def lote_sintetico(destinatarios: int, mensagens_por_item: int = 2, repetidos_pct: float = 10, semente: int = 42) -> list[dict]:
+    """Lote no formato de mensagens_envio; parte dos itens repete o telefone anterior (líder de várias áreas)."""
+    rng = random.Random(semente)
+    lote = []
+    telefone = None
+    for i in range(destinatarios):
+        if telefone is None or rng.random() * 100 >= repetidos_pct:
+            telefone = f"+55859{i:08d}"
+        lote.append(
+            {
+                "destinatario": f"Destinatário {i + 1}",
+                "telefone": telefone,
+                "mensagens": ["x" * rng.randint(300, 1500) for _ in range(mensagens_por_item)],
+                "tipo": "lider_area",
+            }
+        )
+    return lote
+
+
+def simular_lote(
+    mensagens_envio: list[dict],
+    perfil: PerfilSimulacao | None = None,
+    inicio: datetime | None = None,
+    verbose: bool = False,
+    **sender_kwargs,
+) -> ResultadoSimulacao:
+    """Roda o `WhatsAppSender.enviar_mensagens_lote` real no relógio virtual."""
+    from whatsapp_sender import WhatsAppSender
+
+    perfil = perfil or PerfilSimulacao()
+    relogio = RelogioVirtual(inicio)
+    kit = PyWhatKitSimulado(relogio, perfil, random.Random(perfil.semente))
+    teclado = TecladoSimulado()
+    navegador = NavegadorSimulado()
+    sender = WhatsAppSender(
+        **sender_kwargs,
+        relogio=relogio.monotonic,
+        dormir=relogio.dormir,
+        agora=relogio.agora,
+        kit=kit,
+        teclado=teclado,
+        navegador=navegador,
+        matar_navegador=navegador.encerrar,
+        executar_com_prazo=relogio.executar_com_prazo,
+    )
+
+    duracoes: list[float] = []
+    inicio_item: list[float] = []
+
+    def ao_iniciar(item):
+        inicio_item[:] = [relogio.monotonic()]
+
+    def ao_concluir(item, sucesso):
+        if sucesso and inicio_item:
+            duracoes.append(relogio.monotonic() - inicio_item[0])
+
+    t0 = time.perf_counter()
+    if verbose:
+        resumo = sender.enviar_mensagens_lote(mensagens_envio, ao_iniciar_item=ao_iniciar, ao_concluir_item=ao_concluir)
+    else:
+        with open(os.devnull, "w", encoding="utf-8") as nulo, redirect_stdout(nulo):
+            resumo = sender.enviar_mensagens_lote(
+                mensagens_envio, ao_iniciar_item=ao_iniciar, ao_concluir_item=ao_concluir
+            )
+    segundos_reais = time.perf_counter() - t0
+
+    return ResultadoSimulacao(
+        cenario={k: v for k, v in sender_kwargs.items() if not isinstance(v, (bool, type(None)))},
+        destinatarios=resumo["total"],
+        mensagens=sum(len(x["mensagens"]) for x in mensagens_envio),
+        enviadas=resumo["enviadas"],
+        falhas=resumo["falhas"],
+        chamadas_pywhatkit=kit.chamadas,
+        falhas_injetadas=kit.falhas,
+        travamentos=kit.travamentos,
+        navegador_encerrado=navegador.encerramentos,
+        abas_fechadas=teclado.atalhos.get("ctrl+w", 0),
+        segundos_virtuais=relogio.segundos,
+        segundos_reais=segundos_reais,
+        inicio=relogio.inicio,
+        duracoes_item=duracoes,
+    )
+
+
+def imprimir_resultado(r: ResultadoSimulacao) -> None:
+    p50 = percentil(r.duracoes_item, 50)
+    p95 = percentil(r.duracoes_item, 95)
+    print(f"\n{'='*60}")
+    print("SIMULAÇÃO DO ENVIO " + " ".join(f"{k}={v}" for k, v in r.cenario.items()))
+    print(f"{'='*60}")
+    print(f"Destinatários: {r.destinatarios} ({r.mensagens} mensagens)")
+    print(f"Tempo projetado: {fmt_duracao(r.segundos_virtuais)} (término ~{r.termino:%H:%M})")
+    print(f"Vazão: {r.por_hora(r.enviadas):.0f} destinatários/h | {r.por_hora(r.mensagens):.0f} mensagens/h")
+    if p50 is not None:
+        print(f"Por destinatário: p50 {p50:.1f}s | p95 {p95:.1f}s")
+    print(
+        f"Falhas: {r.falhas} destinatário(s) | {r.falhas_injetadas} falha(s) injetada(s) "
+        f"em {r.chamadas_pywhatkit} chamadas ao pywhatkit"
+    )
+    if r.travamentos:
+        print(f"Travamentos: {r.travamentos} | navegador encerrado/reaberto {r.navegador_encerrado}x")
+    print(f"Abas fechadas: {r.abas_fechadas}")
+    print(f"Simulado em {r.segundos_reais * 1000:.0f} ms")
+
+
+def main() -> int:
+    import config
+    from config import (
+        WA_ESPERA_POS_ENVIO,
+        WA_INTERVALO_ENTRE_MENSAGENS,
+        WA_INTERVALO_MESMO_NUMERO,
+        WA_WAIT_TIME_PADRAO,
+        WA_WAIT_TIME_PRIMEIRA,
+        WA_WARMUP_SEGUNDOS,
+    )
+
+    parser = argparse.ArgumentParser(description="Simula o lote de envio em relógio virtual")
+    parser.add_argument("--destinatarios", type=int, default=500, help="Tamanho do lote sintético")
+    parser.add_argument("--mensagens-por-item", type=int, default=2)
+    parser.add_argument("--repetidos-pct", type=float, default=10, help="%% de itens com o mesmo telefone do anterior")
+    parser.add_argument("--de-snapshot", default=None, metavar="ARQUIVO", help="Usa o lote de um snapshot")
+    parser.add_argument("--intervalo", type=float, nargs="+", default=[WA_INTERVALO_ENTRE_MENSAGENS])
+    parser.add_argument("--intervalo-mesmo-numero", type=float, nargs="+", default=[WA_INTERVALO_MESMO_NUMERO])
+    parser.add_argument("--espera-pos-envio", type=float, nargs="+", default=[WA_ESPERA_POS_ENVIO])
+    parser.add_argument("--wait-time", type=float, nargs="+", default=[WA_WAIT_TIME_PADRAO])
+    parser.add_argument(
+        "--latencia",
+        default="lognormal:4:2",
+        help='Abertura da aba além do wait_time: "lognormal:média:desvio", "normal:...", "exponencial:média" ou segundos fixos',
+    )
+    parser.add_argument("--falha-pct", type=float, default=2.0, help="%% de chamadas ao pywhatkit que falham")
+    parser.add_argument("--falha-rajada-pct", type=float, default=None, help="%% de falha logo após uma falha")
+    parser.add_argument("--travamento-pct", type=float, default=0.0, help="%% de chamadas em que o navegador trava")
+    parser.add_argument(
+        "--watchdog",
+        type=float,
+        nargs="+",
+        default=[getattr(config, "WA_WATCHDOG_SEGUNDOS", 60) or 0],
+        help="Folga do watchdog por envio (0 = desligado)",
+    )
+    parser.add_argument("--tentativas", type=int, default=getattr(config, "WA_TENTATIVAS_ENVIO", 2))
+    parser.add_argument("--inicio", default="07:00", help="Horário (HH:MM) de início do lote simulado")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="Mostra a saída do envio (lenta em lotes grandes)")
+    args = parser.parse_args()
+
+    if args.de_snapshot:
+        from run_snapshot import carregar_snapshot
+
+        lote = carregar_snapshot(args.de_snapshot).mensagens_envio
+    else:
+        lote = lote_sintetico(args.destinatarios, args.mensagens_por_item, args.repetidos_pct, args.semente)
+
+    hh, mm = args.inicio.split(":", 1)
+    inicio = datetime.now().replace(hour=int(hh), minute=int(mm), second=0, microsecond=0)
+    perfil = PerfilSimulacao(
+        abertura=Distribuicao.de_texto(args.latencia),
+        prob_falha=args.falha_pct / 100,
+        prob_falha_apos_falha=args.falha_rajada_pct / 100 if args.falha_rajada_pct is not None else None,
+        prob_travamento=args.travamento_pct / 100,
+        semente=args.semente,
+    )
+    print(f"Latência de abertura: {perfil.abertura} | falha: {args.falha_pct:g}%")
+
+    resultados = []
+    for intervalo, mesmo_numero, pos_envio, wait_time, watchdog in itertools.product(
+        args.intervalo, args.intervalo_mesmo_numero, args.espera_pos_envio, args.wait_time, args.watchdog
+    ):
+        r = simular_lote(
+            lote,
+            perfil,
+            inicio=inicio,
+            verbose=args.verbose,
+            intervalo_entre_mensagens=intervalo,
+            intervalo_mesmo_numero=mesmo_numero,
+            espera_pos_envio=pos_envio,
+            wait_time_primeira=WA_WAIT_TIME_PRIMEIRA,
+            wait_time_padrao=wait_time,
+            warmup_segundos=WA_WARMUP_SEGUNDOS,
+            watchdog_segundos=watchdog or None,
+            tentativas_envio=args.tentativas,
+        )
+        imprimir_resultado(r)
+        resultados.append(r)
+
+    if len(resultados) > 1:
+        print(f"\n{'='*60}")
+        print("COMPARATIVO (mais rápido primeiro)")
+        print(f"{'='*60}")
+        for r in sorted(resultados, key=lambda x: x.segundos_virtuais):
+            cenario = " ".join(f"{k}={v:g}" for k, v in r.cenario.items() if k != "warmup_segundos")
+            print(f"{fmt_duracao(r.segundos_virtuais):>9}  {r.falhas:>3} falha(s)  {cenario}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,170 @@
+"""Envio em paralelo por várias sessões de WhatsApp (workers independentes).
+
+- Os destinatários são distribuídos entre as sessões pelo telefone (hash estável):
+  o mesmo número sempre cai na mesma sessão, preservando a adjacência das abas.
+- Cada worker tem o seu próprio sender (estado de sessão, warm-up, ritmo de envio).
+- Um outbox compartilhado registra o andamento de cada item (pendente/enviando/ok/falha).
+
+Observação: o ENTER vai para a janela em foco. No mesmo desktop, cada sessão tem
+o seu perfil de navegador (a sua conta do WhatsApp) e a sua área da tela; a conversa
+abre com o texto na URL e só o foco + ENTER (alguns segundos) passa pela trava
+compartilhada. O carregamento da conversa, a confirmação e os intervalos de uma
+sessão correm enquanto outra envia.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import zlib
+from datetime import datetime
+
+
+PENDENTE = "pendente"
+ENVIANDO = "enviando"
+OK = "ok"
+FALHA = "falha"
+
+
+def shard_por_telefone(mensagens_envio: list[dict], n: int) -> list[list[dict]]:
+    """Divide o lote em `n` partes pelo telefone, mantendo a ordem original em cada parte."""
+    n = max(1, int(n))
+    shards: list[list[dict]] = [[] for _ in range(n)]
+    for item in mensagens_envio:
+        telefone = (item.get("telefone") or "").encode("utf-8")
+        shards[zlib.crc32(telefone) % n].append(item)
+    return shards
+
+
+class Outbox:
+    """Estado compartilhado do lote (thread-safe), opcionalmente persistido em JSON."""
+
+    def __init__(self, mensagens_envio: list[dict], arquivo: str | None = None):
+        self.arquivo = arquivo
+        self._lock = threading.Lock()
+        self._itens: dict[int, dict] = {}
+        for item in mensagens_envio:
+            self._itens[id(item)] = {
+                "destinatario": item.get("destinatario"),
+                "telefone": item.get("telefone"),
+                "tipo": item.get("tipo"),
+                "status": PENDENTE,
+                "sessao": None,
+                "motivo": None,
+                "atualizado_em": None,
+            }
+
+    def marcar(self, item: dict, status: str, sessao: str | None = None) -> None:
+        with self._lock:
+            registro = self._itens.get(id(item))
+            if registro is None:
+                return
+            registro["status"] = status
+            if sessao is not None:
+                registro["sessao"] = sessao
+            registro["motivo"] = item.get("motivo_falha") if status == FALHA else None
+            registro["atualizado_em"] = datetime.now().isoformat(timespec="seconds")
+            self._salvar()
+
+    def _salvar(self) -> None:
+        if not self.arquivo:
+            return
+        try:
+            with open(self.arquivo, "w", encoding="utf-8") as f:
+                json.dump(list(self._itens.values()), f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"  ⚠ Não foi possível gravar o outbox ({self.arquivo}): {e}")
+
+    def contagem(self) -> dict[str, int]:
+        with self._lock:
+            contagem = {PENDENTE: 0, ENVIANDO: 0, OK: 0, FALHA: 0}
+            for r in self._itens.values():
+                contagem[r["status"]] = contagem.get(r["status"], 0) + 1
+            return contagem
+
+
+class PoolEnvio:
+    def __init__(self, sessoes: list[dict], fabrica_sender, agenda=None, arquivo_outbox: str | None = None):
+        """
+        sessoes: lista de configurações (dict com "nome" e overrides do sender).
+        fabrica_sender: callable(sessao, indice) -> objeto com enviar_mensagens_lote().
+        agenda: AgendaEnvio compartilhada (tempos aprendidos); cada worker planeja o seu shard.
+        """
+        self.sessoes = sessoes or [{"nome": "principal"}]
+        self.fabrica_sender = fabrica_sender
+        self.agenda = agenda
+        self.arquivo_outbox = arquivo_outbox
+
+    def enviar(self, mensagens_envio: list[dict], modo_teste: bool = False, ao_concluir_item=None) -> dict:
+        """ao_concluir_item(item, sucesso): chamado pela thread do worker ao fim de cada item."""
+        outbox = Outbox(mensagens_envio, self.arquivo_outbox)
+        shards = shard_por_telefone(mensagens_envio, len(self.sessoes))
+        resultados: list[dict | None] = [None] * len(self.sessoes)
+
+        print(f"\n{'='*60}")
+        print(f"ENVIO EM {len(self.sessoes)} SESSÕES")
+        for sessao, shard in zip(self.sessoes, shards):
+            print(f"- {sessao.get('nome')}: {len(shard)} destinatários")
+        print(f"{'='*60}\n")
+
+        def worker(indice: int, sessao: dict, shard: list[dict]) -> None:
+            nome = sessao.get("nome") or f"sessao{indice + 1}"
+            if not shard:
+                resultados[indice] = {"total": 0, "enviadas": 0, "falhas": 0, "adiados": []}
+                return
+            try:
+                sender = self.fabrica_sender(sessao, indice)
+
+                def ao_iniciar(item):
+                    outbox.marcar(item, ENVIANDO, nome)
+
+                def ao_concluir(item, sucesso):
+                    outbox.marcar(item, OK if sucesso else FALHA, nome)
+                    if ao_concluir_item is not None:
+                        ao_concluir_item(item, sucesso)
+
+                resultados[indice] = sender.enviar_mensagens_lote(
+                    shard,
+                    modo_teste=modo_teste,
+                    agenda=self.agenda,
+                    ao_iniciar_item=ao_iniciar,
+                    ao_concluir_item=ao_concluir,
+                )
+            except Exception as e:
+                print(f"✗ Sessão {nome} abortada: {e}")
+                for item in shard:
+                    outbox.marcar(item, FALHA, nome)
+                resultados[indice] = {"total": len(shard), "enviadas": 0, "falhas": len(shard), "adiados": []}
+
+        threads = [
+            threading.Thread(target=worker, args=(i, sessao, shard), name=f"envio-{i + 1}", daemon=True)
+            for i, (sessao, shard) in enumerate(zip(self.sessoes, shards))
+        ]
+        for t in threads:
+            t.start()
+        try:
+            for t in threads:
+                t.join()
+        except KeyboardInterrupt:
+            print("\n⚠ Envio interrompido pelo usuário (Ctrl+C).")
+
+        total = {"total": 0, "enviadas": 0, "falhas": 0, "adiados": []}
+        for r in resultados:
+            if not r:
+                continue
+            total["total"] += r.get("total", 0)
+            total["enviadas"] += r.get("enviadas", 0)
+            total["falhas"] += r.get("falhas", 0)
+            total["adiados"].extend(r.get("adiados") or [])
+
+        contagem = outbox.contagem()
+        print(f"\n{'='*60}")
+        print("RESUMO GERAL (TODAS AS SESSÕES)")
+        print(f"{'='*60}")
+        print(f"Total de destinatários: {total['total']}")
+        print(f"Enviadas com sucesso: {total['enviadas']}")
+        print(f"Falhas: {total['falhas']}")
+        if contagem.get(PENDENTE):
+            print(f"Não processados: {contagem[PENDENTE]}")
+        print(f"{'='*60}\n")
+        return total
@@ -0,0 +1,163 @@
+"""Telemetria do envio: um registro JSONL por mensagem, com tempos por fase.
+
+Fases registradas em `WhatsAppSender.enviar_mensagem`:
+- pywhatkit:  abre a aba do WhatsApp Web e aguarda o `wait_time` antes de enviar
+              (o registro traz o `wait_time` configurado; a diferença é o custo de abrir a aba)
+- abrir_conversa: o mesmo, para sessões com perfil próprio (sem pywhatkit)
+- enter:      foco + ENTERs de redundância
+- pos_envio:  espera fixa para a mensagem "subir" antes de seguir
+- fechar_aba: fechamento da aba (quando aplicável)
+
+Ao final do lote é gravado um registro de resumo com p50/p95 de cada fase.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.parse import quote
+
+
+FASES = ("pywhatkit", "abrir_conversa", "enter", "pos_envio", "fechar_aba")
+
+# Sessões de envio paralelas podem gravar no mesmo arquivo
+_LOCK_ARQUIVO = threading.Lock()
+
+
+def percentil(valores: list[float], p: float) -> float | None:
+    """Percentil com interpolação linear (p entre 0 e 100)."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    if len(ordenados) == 1:
+        return ordenados[0]
+    pos = (len(ordenados) - 1) * (p / 100.0)
+    base = int(pos)
+    frac = pos - base
+    if base + 1 >= len(ordenados):
+        return ordenados[-1]
+    return ordenados[base] + (ordenados[base + 1] - ordenados[base]) * frac
+
+
+class RegistroMensagem:
+    def __init__(self, telemetria: "TelemetriaEnvio", dados: dict):
+        self._telemetria = telemetria
+        self.dados = dados
+        self.dados.setdefault("fases", {})
+        self._t0 = time.monotonic()
+
+    @contextmanager
+    def fase(self, nome: str):
+        inicio_wall = datetime.now()
+        inicio = time.monotonic()
+        try:
+            yield
+        finally:
+            self.dados["fases"][nome] = {
+                "inicio": inicio_wall.isoformat(timespec="milliseconds"),
+                "fim": datetime.now().isoformat(timespec="milliseconds"),
+                "segundos": round(time.monotonic() - inicio, 3),
+            }
+
+    def finalizar(self, resultado: str, erro: str | None = None) -> None:
+        self.dados["resultado"] = resultado
+        self.dados["erro"] = erro
+        self.dados["segundos_total"] = round(time.monotonic() - self._t0, 3)
+        self._telemetria._gravar(self.dados)
+
+
+class TelemetriaEnvio:
+    def __init__(self, arquivo: str | None, lote_id: str | None = None):
+        self.arquivo = arquivo
+        self.lote_id = lote_id or datetime.now().strftime("%Y%m%d-%H%M%S")
+        self._registros: list[dict] = []
+
+    def iniciar_mensagem(
+        self,
+        telefone: str,
+        mensagem: str,
+        *,
+        tipo: str = "",
+        tentativa: int = 1,
+        wait_time: float | None = None,
+    ) -> RegistroMensagem:
+        mensagem = mensagem or ""
+        return RegistroMensagem(
+            self,
+            {
+                "registro": "mensagem",
+                "lote_id": self.lote_id,
+                "inicio": datetime.now().isoformat(timespec="milliseconds"),
+                "telefone": telefone,
+                "tipo": tipo,
+                "tentativa": tentativa,
+                "tamanho_caracteres": len(mensagem),
+                "tamanho_url": len(quote(mensagem)),
+                "wait_time": wait_time,
+            },
+        )
+
+    def _gravar(self, registro: dict) -> None:
+        if registro.get("registro") == "mensagem":
+            self._registros.append(registro)
+        if not self.arquivo:
+            return
+        try:
+            with _LOCK_ARQUIVO, open(self.arquivo, "a", encoding="utf-8") as f:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"  ⚠ Não foi possível gravar telemetria ({self.arquivo}): {e}")
+
+    def resumo_lote(self) -> dict:
+        """Calcula p50/p95 por fase do lote atual, imprime e grava no JSONL."""
+        por_fase: dict[str, list[float]] = {}
+        totais: list[float] = []
+        resultados: dict[str, int] = {}
+        for r in self._registros:
+            resultados[r.get("resultado") or "?"] = resultados.get(r.get("resultado") or "?", 0) + 1
+            if r.get("segundos_total") is not None:
+                totais.append(r["segundos_total"])
+            for nome, fase in (r.get("fases") or {}).items():
+                por_fase.setdefault(nome, []).append(fase["segundos"])
+
+        fases = {}
+        for nome in list(FASES) + sorted(set(por_fase) - set(FASES)):
+            valores = por_fase.get(nome)
+            if not valores:
+                continue
+            fases[nome] = {
+                "n": len(valores),
+                "p50": round(percentil(valores, 50), 3),
+                "p95": round(percentil(valores, 95), 3),
+                "soma": round(sum(valores), 3),
+            }
+
+        resumo = {
+            "registro": "resumo_lote",
+            "lote_id": self.lote_id,
+            "fim": datetime.now().isoformat(timespec="milliseconds"),
+            "mensagens": len(self._registros),
+            "resultados": resultados,
+            "fases": fases,
+            "total": {
+                "p50": round(percentil(totais, 50), 3) if totais else None,
+                "p95": round(percentil(totais, 95), 3) if totais else None,
+                "soma": round(sum(totais), 3),
+            },
+        }
+
+        if self._registros:
+            print("TEMPOS POR FASE (s)")
+            print(f"{'fase':<12} {'n':>4} {'p50':>8} {'p95':>8} {'soma':>9}")
+            for nome, est in fases.items():
+                print(f"{nome:<12} {est['n']:>4} {est['p50']:>8.1f} {est['p95']:>8.1f} {est['soma']:>9.1f}")
+            print(f"{'=' * 60}\n")
+
+        self._gravar(resumo)
+        # Próximo lote (mesmo objeto reutilizado) começa do zero
+        self._registros = []
+        self.lote_id = datetime.now().strftime("%Y%m%d-%H%M%S")
+        return resumo
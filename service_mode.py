@@ -0,0 +1,382 @@
+"""Modo serviço: processo residente com agenda própria e endpoint local de controle.
+
+Em vez de o Task Scheduler abrir um Python novo toda manhã, o serviço fica no ar e:
+- dispara as execuções nos horários de SERVICO_HORARIOS (segunda a sábado, por tipo de mensagem);
+- mantém a conexão com o banco, o índice do roster (refeito quando a tabela muda), o cache das métricas do dia e a sessão do WhatsApp Web;
+- aceita pedidos locais (somente 127.0.0.1 por padrão) para prévias e reenvios sob demanda.
+
+POST exige o cabeçalho X-Servico-Token igual a SERVICO_TOKEN (sem token configurado, fica
+desligado) e recusa pedidos com Origin: uma página aberta no navegador da mesma máquina
+não consegue disparar envios.
+
+Endpoints:
+- GET  /status                      situação do serviço e últimas execuções
+- POST /executar?teste=1&tipos=lider_area&areas=Trad&data=2026-01-12&atualizar=1
+  teste=1 responde com as mensagens (prévia); sem teste, o envio entra na fila.
+- GET  /metricas, /mensagens         números e mensagens já calculados (metrics_endpoint)
+
+Uso: python main.py --servico
+"""
+
+from __future__ import annotations
+
+import hmac
+import itertools
+import json
+import queue
+import threading
+import time
+from datetime import date, datetime, time as hora
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import config
+import metrics_endpoint
+import rolling_window
+import run_deadline
+import sargable_predicates
+from metric_plan import FiltroExecucao, executar, montar_mensagens
+from report_calendar import ReportContext, should_send_today
+from run_ledger import marcar_data_execucao
+
+
+SERVICO_HORARIOS = getattr(
+    config,
+    "SERVICO_HORARIOS",
+    {"lider_merchan": "07:00", "diretoria": "07:00", "lider_area": "07:00", "lider_org": "07:00"},
+)
+SERVICO_HOST = getattr(config, "SERVICO_HOST", "127.0.0.1")
+SERVICO_PORTA = getattr(config, "SERVICO_PORTA", 8765)
+SERVICO_TOKEN = getattr(config, "SERVICO_TOKEN", None)
+
+# Prévias via HTTP aguardam no máximo este tempo pela resposta
+TIMEOUT_PREVIA_SEGUNDOS = 300
+
+
+def ler_horario(texto: str) -> hora:
+    """"7:00", "07:00" ou "07:00:00" -> time; horário inválido levanta ValueError."""
+    h, sep, resto = str(texto).strip().partition(":")
+    try:
+        return hora.fromisoformat(f"{h.zfill(2)}{sep}{resto}")
+    except ValueError:
+        raise ValueError(f"horário inválido em SERVICO_HORARIOS: {texto!r} (use HH:MM)") from None
+
+
+def horarios_por_tipo(horarios: dict[str, str]) -> dict[hora, list[str]]:
+    """{"lider_merchan": "07:00", "lider_area": "7:30"} -> {time(7, 0): [...], time(7, 30): [...]}"""
+    agrupado: dict[hora, list[str]] = {}
+    for tipo, horario in horarios.items():
+        agrupado.setdefault(ler_horario(horario), []).append(tipo)
+    return dict(sorted(agrupado.items()))
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(
+        self,
+        origem: str,
+        tipos: list[str] | None = None,
+        areas: list[str] | None = None,
+        data: date | None = None,
+        teste: bool = False,
+        atualizar: bool = False,
+    ):
+        self.id = next(self._ids)
+        self.origem = origem
+        self.tipos = tipos or []
+        self.areas = areas or []
+        self.data = data
+        self.teste = teste
+        self.atualizar = atualizar
+        self.status = "na_fila"
+        self.criado_em = datetime.now()
+        self.fim: datetime | None = None
+        self.resultado: dict | None = None
+        self.erro: str | None = None
+        self.concluido = threading.Event()
+
+    def resumo(self) -> dict:
+        return {
+            "id": self.id,
+            "origem": self.origem,
+            "tipos": self.tipos,
+            "areas": self.areas,
+            "data": self.data.isoformat() if self.data else None,
+            "teste": self.teste,
+            "status": self.status,
+            "criado_em": self.criado_em.isoformat(timespec="seconds"),
+            "fim": self.fim.isoformat(timespec="seconds") if self.fim else None,
+            "erro": self.erro,
+        }
+
+
+class ServicoRelatorio:
+    def __init__(self, horarios: dict[str, str] | None = None, host: str = SERVICO_HOST, porta: int = SERVICO_PORTA):
+        self.horarios = horarios_por_tipo(horarios or SERVICO_HORARIOS)
+        self.host = host
+        self.porta = porta
+        self.token = SERVICO_TOKEN
+        self.fila: queue.Queue[Job] = queue.Queue()
+        self.jobs: list[Job] = []
+        self._db = None
+        self._senders = None
+        # Cache do dia das métricas (a chave já inclui o período); o roster fica em recipient_index
+        self._dia_cache: date | None = None
+        self._cache_metricas: dict = {}
+        # Dia cuja carga o portão de frescor já confirmou
+        self._dia_frescor: date | None = None
+        self._disparados: set[tuple[date, hora]] = set()
+        self._parar = threading.Event()
+        self._http: ThreadingHTTPServer | None = None
+
+    # ------------------------------------------------------------------
+    # Execução (somente na thread do worker: banco e navegador não são compartilhados)
+    # ------------------------------------------------------------------
+    def _banco(self):
+        if self._db is None:
+            from database import Database
+
+            self._db = Database()
+        return self._db
+
+    def _descartar_banco(self) -> None:
+        if self._db is not None:
+            try:
+                self._db.disconnect()
+            except Exception:
+                pass
+        self._db = None
+
+    def _renovar_cache(self, hoje: date, forcar: bool) -> None:
+        if forcar or self._dia_cache != hoje:
+            self._dia_cache = hoje
+            self._cache_metricas = {}
+
+    def executar_job(self, job: Job) -> dict:
+        import main
+
+        hoje = job.data or datetime.now().date()
+        if not should_send_today(hoje):
+            return {"mensagens_envio": [], "aviso": "domingo: não envia relatório"}
+
+        self._renovar_cache(hoje, job.atualizar)
+        # Prévia não grava o estado das janelas móveis
+        rolling_window.somente_leitura(job.teste)
+        db = self._banco()
+        # Só a assinatura do roster a cada job: mudou na tabela, o índice é refeito
+        from recipient_index import carregar_indice
+
+        roster = carregar_indice(db, forcar=job.atualizar).linhas
+
+        ctx = ReportContext.para_data(hoje)
+        filtro = FiltroExecucao(somente_areas=job.areas, somente_tipos=job.tipos)
+        if not job.teste and self._dia_frescor != hoje:
+            from freshness_gate import aguardar_dados
+
+            if self._senders is None:
+                self._senders = main.preparar_envio()
+            if not aguardar_dados(db, ctx.ref, self._senders):
+                raise RuntimeError(f"dados de {ctx.ref:%d/%m} incompletos")
+            self._dia_frescor = hoje
+            # Prévias anteriores podem ter guardado métricas da carga incompleta
+            self._cache_metricas = {}
+            from daily_rollup import publicar_recentes
+
+            publicar_recentes(db, ctx.ref)
+        plano = main.planejar_execucao(db, ctx, filtro, leaders_rows=roster)
+        if plano is None:
+            return {"mensagens_envio": [], "aviso": "roster vazio"}
+        if not job.teste and plano.destinatarios:
+            main.confirmar_lote(self._senders)
+
+        resultados = executar(plano, db, cache=self._cache_metricas)
+        mensagens_envio = marcar_data_execucao(montar_mensagens(plano, resultados), hoje)
+        main.gravar_snapshot(ctx, resultados, mensagens_envio)
+
+        if job.teste:
+            return {"mensagens_envio": mensagens_envio}
+
+        if self._senders is None:
+            # Primeira entrega do processo: warm-up + kickoff uma única vez
+            self._senders = main.preparar_envio()
+        ledger = main.criar_ledger()
+        resumo = main.enviar_lote(
+            mensagens_envio, self._senders, ao_concluir_item=ledger.registrar_entrega if ledger else None
+        )
+        if ledger is not None and filtro.sem_filtros():
+            # Como no envio diário: dia entregue por inteiro não volta no --recuperar
+            ledger.concluir_se_entregue(hoje, mensagens_envio)
+        return {"envio": {k: v for k, v in resumo.items() if k != "adiados"}, "destinatarios": len(mensagens_envio)}
+
+    def _worker(self) -> None:
+        while not self._parar.is_set():
+            try:
+                job = self.fila.get(timeout=1)
+            except queue.Empty:
+                continue
+            job.status = "executando"
+            print(f"\n▶ [{datetime.now():%H:%M:%S}] Execução #{job.id} ({job.origem}) tipos={job.tipos or 'todos'}")
+            if run_deadline.EXECUCAO_PRAZO_MINUTOS:
+                run_deadline.ativar(run_deadline.EXECUCAO_PRAZO_MINUTOS * 60)
+            # Grafias de ForaDoRoteiro/tipocheckin e feriados: descobertos de novo a cada execução
+            sargable_predicates.limpar()
+            try:
+                job.resultado = self.executar_job(job)
+                job.status = "ok"
+            except Exception as e:
+                job.status = "erro"
+                job.erro = str(e)
+                print(f"✗ Execução #{job.id} falhou: {e}")
+                # Conexão pode ter caído: a próxima execução reconecta
+                self._descartar_banco()
+            finally:
+                run_deadline.desativar()
+                job.fim = datetime.now()
+                job.concluido.set()
+
+    def submeter(self, job: Job) -> Job:
+        self.jobs.append(job)
+        del self.jobs[:-50]
+        self.fila.put(job)
+        return job
+
+    # ------------------------------------------------------------------
+    # Agenda
+    # ------------------------------------------------------------------
+    def _agendador(self) -> None:
+        # Horários que já passaram quando o serviço subiu não disparam atrasados
+        agora = datetime.now()
+        for horario in self.horarios:
+            if agora.time() > horario:
+                self._disparados.add((agora.date(), horario))
+
+        while not self._parar.is_set():
+            agora = datetime.now()
+            hoje = agora.date()
+            if should_send_today(hoje):
+                for horario, tipos in self.horarios.items():
+                    chave = (hoje, horario)
+                    if chave in self._disparados or agora.time() < horario:
+                        continue
+                    self._disparados.add(chave)
+                    self.submeter(Job("agenda", tipos=list(tipos)))
+            self._parar.wait(20)
+
+    # ------------------------------------------------------------------
+    # Endpoint local
+    # ------------------------------------------------------------------
+    def status(self) -> dict:
+        return {
+            "agora": datetime.now().isoformat(timespec="seconds"),
+            "horarios": {f"{h:%H:%M}": tipos for h, tipos in self.horarios.items()},
+            "fila": self.fila.qsize(),
+            "banco_conectado": bool(self._db is not None and getattr(self._db, "conn", None) is not None),
+            "whatsapp_pronto": bool(self._senders and all(s.warmup_pronto.is_set() for s in self._senders)),
+            "cache_dia": self._dia_cache.isoformat() if self._dia_cache else None,
+            "metricas_em_cache": len(self._cache_metricas),
+            "execucoes": [j.resumo() for j in self.jobs[-10:]],
+        }
+
+    def _criar_handler(self):
+        servico = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _responder(self, codigo: int, corpo: dict) -> None:
+                dados = json.dumps(corpo, ensure_ascii=False, default=str).encode("utf-8")
+                self.send_response(codigo)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(dados)))
+                self.end_headers()
+                self.wfile.write(dados)
+
+            def do_GET(self):
+                caminho = urlparse(self.path).path
+                if caminho == "/status":
+                    self._responder(200, servico.status())
+                elif caminho in metrics_endpoint.ROTAS:
+                    metrics_endpoint.atender(self)
+                else:
+                    self._responder(404, {"erro": "rota não encontrada"})
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                if url.path != "/executar":
+                    self._responder(404, {"erro": "rota não encontrada"})
+                    return
+                # Navegador sempre manda Origin em POST; cliente local (curl/script) não
+                if self.headers.get("Origin") is not None:
+                    self._responder(403, {"erro": "pedidos de navegador não são aceitos"})
+                    return
+                if not servico.token:
+                    self._responder(403, {"erro": "defina SERVICO_TOKEN no config para aceitar execuções"})
+                    return
+                token = self.headers.get("X-Servico-Token") or ""
+                if not hmac.compare_digest(token.encode("utf-8"), str(servico.token).encode("utf-8")):
+                    self._responder(401, {"erro": "X-Servico-Token ausente ou inválido"})
+                    return
+                q = parse_qs(url.query)
+
+                def lista(nome: str) -> list[str]:
+                    return [v.strip() for item in q.get(nome, []) for v in item.split(",") if v.strip()]
+
+                def flag(nome: str) -> bool:
+                    return (q.get(nome, ["0"])[0] or "").strip().lower() in ("1", "true", "sim")
+
+                try:
+                    data = date.fromisoformat(q["data"][0]) if q.get("data") else None
+                except ValueError:
+                    self._responder(400, {"erro": "data inválida (use YYYY-MM-DD)"})
+                    return
+
+                job = servico.submeter(
+                    Job(
+                        "http",
+                        tipos=lista("tipos"),
+                        areas=lista("areas"),
+                        data=data,
+                        teste=flag("teste"),
+                        atualizar=flag("atualizar"),
+                    )
+                )
+                if not job.teste:
+                    self._responder(202, job.resumo())
+                    return
+                job.concluido.wait(TIMEOUT_PREVIA_SEGUNDOS)
+                self._responder(200 if job.status == "ok" else 500, {**job.resumo(), **(job.resultado or {})})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def rodar(self) -> int:
+        print("=" * 60)
+        print("MODO SERVIÇO - GERADOR MENSAGENS MERCHAN")
+        print("=" * 60)
+        for horario, tipos in self.horarios.items():
+            print(f"- {horario:%H:%M}: {', '.join(tipos)} (segunda a sábado)")
+        print(f"Controle local: http://{self.host}:{self.porta}/status")
+        if not self.token:
+            print("⚠ SERVICO_TOKEN não definido: POST /executar desligado (só a agenda dispara).")
+        print("=" * 60)
+
+        threading.Thread(target=self._worker, name="servico-worker", daemon=True).start()
+        threading.Thread(target=self._agendador, name="servico-agenda", daemon=True).start()
+        self._http = ThreadingHTTPServer((self.host, self.porta), self._criar_handler())
+        try:
+            self._http.serve_forever()
+        except KeyboardInterrupt:
+            print("\n⚠ Serviço interrompido pelo usuário (Ctrl+C).")
+        finally:
+            self._parar.set()
+            self._http.server_close()
+            # Aguarda a execução em andamento terminar antes de fechar a conexão
+            while any(j.status == "executando" for j in self.jobs):
+                time.sleep(1)
+            self._descartar_banco()
+        return 0
+
+
+def executar_servico() -> int:
+    return ServicoRelatorio().rodar()
@@ -0,0 +1,209 @@
+"""Perfil por etapa da execução (--perfil): tempo, memória e, opcionalmente, cProfile.
+
+Uso no código: `with etapa("consultas"): ...` (não faz nada se o perfil estiver desligado).
+Etapas podem ser aninhadas; o caminho completo ("metricas;geral") identifica a etapa.
+Com prazo de execução ativo (run_deadline), as mesmas etapas conferem o tempo restante.
+
+Ao final:
+- tabela-resumo no terminal (chamadas, tempo total, memória alocada e pico por etapa);
+- arquivo .folded (formato "pilha;de;etapas valor") compatível com flamegraph.pl/speedscope,
+  com o tempo em milissegundos; com cProfile, as funções aparecem abaixo de cada etapa.
+"""
+
+from __future__ import annotations
+
+import cProfile
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import ExitStack, contextmanager, nullcontext
+from datetime import datetime
+
+import run_deadline
+
+
+class _Quadro:
+    __slots__ = ("nome", "caminho", "t0", "mem0", "pico_filhos", "profiler")
+
+    def __init__(self, nome: str, caminho: str):
+        self.nome = nome
+        self.caminho = caminho
+        self.t0 = 0.0
+        self.mem0 = 0
+        self.pico_filhos = 0
+        self.profiler: cProfile.Profile | None = None
+
+
+class PerfilEtapas:
+    def __init__(self, usar_cprofile: bool = False):
+        self.usar_cprofile = usar_cprofile
+        self._thread = threading.current_thread()
+        self._pilha: list[_Quadro] = []
+        # caminho -> [chamadas, segundos, bytes alocados (líquido), pico]
+        self.estatisticas: dict[str, list[float]] = {}
+        self._ordem: list[str] = []
+        self._cprofile_stats: dict[str, pstats.Stats] = {}
+        self._inicio = time.perf_counter()
+        self._tracemalloc_iniciado = False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracemalloc_iniciado = True
+
+    @contextmanager
+    def etapa(self, nome: str):
+        """"metricas;geral" = etapa "geral" dentro de "metricas": um quadro por segmento."""
+        # Só a thread principal entra no perfil (warm-up/sessões paralelas rodam em outras threads)
+        if threading.current_thread() is not self._thread:
+            yield
+            return
+        with ExitStack() as quadros:
+            for segmento in nome.split(";"):
+                quadros.enter_context(self._quadro(segmento))
+            yield
+
+    @contextmanager
+    def _quadro(self, nome: str):
+        pai = self._pilha[-1] if self._pilha else None
+        quadro = _Quadro(nome, f"{pai.caminho};{nome}" if pai else nome)
+
+        if pai is not None and pai.profiler is not None:
+            pai.profiler.disable()
+        if self.usar_cprofile:
+            quadro.profiler = cProfile.Profile()
+
+        _, pico_antes = tracemalloc.get_traced_memory()
+        if pai is not None:
+            pai.pico_filhos = max(pai.pico_filhos, pico_antes)
+        tracemalloc.reset_peak()
+        quadro.mem0, _ = tracemalloc.get_traced_memory()
+        self._pilha.append(quadro)
+        quadro.t0 = time.perf_counter()
+        if quadro.profiler is not None:
+            quadro.profiler.enable()
+        try:
+            yield
+        finally:
+            if quadro.profiler is not None:
+                quadro.profiler.disable()
+            segundos = time.perf_counter() - quadro.t0
+            mem1, pico = tracemalloc.get_traced_memory()
+            pico = max(pico, quadro.pico_filhos)
+            self._pilha.pop()
+            if pai is not None:
+                pai.pico_filhos = max(pai.pico_filhos, pico)
+                if pai.profiler is not None:
+                    pai.profiler.enable()
+            self._registrar(quadro, segundos, mem1 - quadro.mem0, pico)
+
+    def _registrar(self, quadro: _Quadro, segundos: float, alocado: int, pico: int) -> None:
+        est = self.estatisticas.get(quadro.caminho)
+        if est is None:
+            est = self.estatisticas[quadro.caminho] = [0, 0.0, 0, 0]
+            self._ordem.append(quadro.caminho)
+        est[0] += 1
+        est[1] += segundos
+        est[2] += alocado
+        est[3] = max(est[3], pico)
+        if quadro.profiler is not None:
+            stats = pstats.Stats(quadro.profiler)
+            anterior = self._cprofile_stats.get(quadro.caminho)
+            if anterior is not None:
+                anterior.add(stats)
+            else:
+                self._cprofile_stats[quadro.caminho] = stats
+
+    def _tempo_proprio(self, caminho: str) -> float:
+        """Tempo da etapa sem o tempo das sub-etapas diretas."""
+        total = self.estatisticas[caminho][1]
+        prefixo = caminho + ";"
+        filhos = sum(
+            est[1]
+            for c, est in self.estatisticas.items()
+            if c.startswith(prefixo) and ";" not in c[len(prefixo):]
+        )
+        return max(0.0, total - filhos)
+
+    def linhas_folded(self) -> list[str]:
+        linhas: list[str] = []
+        for caminho in self._ordem:
+            stats = self._cprofile_stats.get(caminho)
+            if stats is None:
+                ms = int(round(self._tempo_proprio(caminho) * 1000))
+                if ms > 0:
+                    linhas.append(f"{caminho} {ms}")
+                continue
+            # Com cProfile: o tempo próprio de cada função vira uma folha abaixo da etapa
+            for (arquivo, linha, func), (_, _, tottime, _, _) in stats.stats.items():
+                ms = int(round(tottime * 1000))
+                if ms <= 0:
+                    continue
+                nome = f"{func} ({os.path.basename(arquivo)}:{linha})".replace(";", ",").replace(" ", "_")
+                linhas.append(f"{caminho};{nome} {ms}")
+        return linhas
+
+    def relatorio(self, diretorio: str = "perfis") -> str | None:
+        total = time.perf_counter() - self._inicio
+        print("\n" + "=" * 78)
+        print("PERFIL POR ETAPA")
+        print("=" * 78)
+        print(f"{'etapa':<40} {'n':>4} {'tempo (s)':>10} {'alocado MB':>11} {'pico MB':>9}")
+        for caminho in self._ordem:
+            n, segundos, alocado, pico = self.estatisticas[caminho]
+            nivel = caminho.count(";")
+            rotulo = ("  " * nivel + caminho.rsplit(";", 1)[-1])[:40]
+            print(
+                f"{rotulo:<40} {int(n):>4} {segundos:>10.2f} "
+                f"{alocado / 1_048_576:>11.2f} {pico / 1_048_576:>9.2f}"
+            )
+        print(f"{'TOTAL':<40} {'':>4} {total:>10.2f}")
+        print("=" * 78)
+
+        arquivo = None
+        try:
+            os.makedirs(diretorio, exist_ok=True)
+            arquivo = os.path.join(diretorio, f"perfil_{datetime.now():%Y%m%d_%H%M%S}.folded")
+            with open(arquivo, "w", encoding="utf-8") as f:
+                f.write("\n".join(self.linhas_folded()) + "\n")
+            print(f"Pilhas (flame graph): {arquivo}")
+        except Exception as e:
+            print(f"⚠ Não foi possível gravar o perfil: {e}")
+
+        if self._tracemalloc_iniciado:
+            tracemalloc.stop()
+        return arquivo
+
+
+_perfil_ativo: PerfilEtapas | None = None
+
+
+def ativar(usar_cprofile: bool = False) -> PerfilEtapas:
+    global _perfil_ativo
+    _perfil_ativo = PerfilEtapas(usar_cprofile=usar_cprofile)
+    return _perfil_ativo
+
+
+def desativar() -> PerfilEtapas | None:
+    global _perfil_ativo
+    perfil, _perfil_ativo = _perfil_ativo, None
+    return perfil
+
+
+@contextmanager
+def _etapa_com_prazo(nome: str):
+    with run_deadline.etapa(nome):
+        if _perfil_ativo is None:
+            yield
+        else:
+            with _perfil_ativo.etapa(nome):
+                yield
+
+
+def etapa(nome: str):
+    """Context manager da etapa no perfil ativo e no prazo da execução (no-op se ambos desligados)."""
+    if run_deadline.ativo():
+        return _etapa_com_prazo(nome)
+    if _perfil_ativo is None:
+        return nullcontext()
+    return _perfil_ativo.etapa(nome)
@@ -0,0 +1,138 @@
+"""Várias empresas (EMPRESAS no config) numa única execução.
+
+Cada empresa sobrescreve chaves do config: banco (DB_CONFIG), tabelas, ordem das
+áreas, listas de grupos/redes. A empresa ativa fica num ContextVar, então cada
+thread da fase de dados enxerga só a sua configuração:
+
+- `valor(nome)` devolve o valor da empresa ativa (ou o do config);
+- `PorEmpresa(nome)` é o mesmo valor usado como constante de módulo (f-strings das
+  consultas, iteração), resolvido a cada uso;
+- `arquivo_da_empresa(caminho)` separa os arquivos de estado (ledger, snapshots,
+  janelas móveis, parcial) por empresa.
+
+Sem empresa ativa, tudo se comporta como antes (valores do config).
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+import config
+
+
+EMPRESAS: dict[str, dict] = getattr(config, "EMPRESAS", None) or {}
+EMPRESAS_PARALELO = getattr(config, "EMPRESAS_PARALELO", None)
+
+# Chaves que cada empresa pode sobrescrever
+CHAVES_POR_EMPRESA = (
+    "DB_CONFIG",
+    "TABLE_AREA_MERCHAN",
+    "TABLE_TELEFONE_LIDERANCA",
+    "TABLE_MONITORAMENTO",
+    "TABLE_FERIADO_MERCHAN",
+    "TABLE_TELEFONE_PROMOTOR",
+    "CHECKIN_VALIDOS",
+    "AREAS_ORDEM_PADRAO",
+    "GRUPOS_ECONOMICOS_IMPORTANTES",
+    "REDES_IMPORTANTES",
+    "ROLLUP_TABELA",
+    "ORG_PAIS",
+    "TELEFONE_DDI_ACEITOS",
+)
+
+_empresa_atual: contextvars.ContextVar[str | None] = contextvars.ContextVar("empresa_atual", default=None)
+
+
+def empresa_atual() -> str | None:
+    return _empresa_atual.get()
+
+
+def validar(nomes: list[str]) -> list[str]:
+    """Erros de configuração das empresas pedidas (lista vazia = ok)."""
+    erros = []
+    for nome in nomes:
+        if nome not in EMPRESAS:
+            erros.append(f"empresa desconhecida: {nome} (EMPRESAS: {', '.join(EMPRESAS) or 'nenhuma'})")
+            continue
+        extras = sorted(set(EMPRESAS[nome] or {}) - set(CHAVES_POR_EMPRESA))
+        if extras:
+            erros.append(f"empresa {nome}: chaves não suportadas por empresa: {', '.join(extras)}")
+    return erros
+
+
+def valor(nome: str, padrao=None):
+    empresa = _empresa_atual.get()
+    if empresa is not None:
+        sobrescritos = EMPRESAS.get(empresa) or {}
+        if nome in sobrescritos:
+            return sobrescritos[nome]
+    return getattr(config, nome, padrao)
+
+
+@contextmanager
+def usar_empresa(nome: str | None):
+    token = _empresa_atual.set(nome)
+    try:
+        yield
+    finally:
+        _empresa_atual.reset(token)
+
+
+def arquivo_da_empresa(caminho: str | None) -> str | None:
+    """"execucoes.json" -> "execucoes_<empresa>.json" (diretórios: "snapshots_<empresa>")."""
+    empresa = _empresa_atual.get()
+    if not caminho or empresa is None:
+        return caminho
+    raiz, ext = os.path.splitext(caminho)
+    return f"{raiz}_{empresa}{ext}"
+
+
+class PorEmpresa:
+    """Valor do config resolvido pela empresa ativa a cada uso (str/format/iteração)."""
+
+    def __init__(self, nome: str):
+        self.nome = nome
+
+    def resolver(self):
+        return valor(self.nome)
+
+    def __str__(self) -> str:
+        return str(self.resolver())
+
+    def __format__(self, spec: str) -> str:
+        return format(self.resolver(), spec)
+
+    def __iter__(self):
+        return iter(self.resolver() or ())
+
+    def __len__(self) -> int:
+        return len(self.resolver() or ())
+
+    def __repr__(self) -> str:
+        return f"PorEmpresa({self.nome!r}: {self.resolver()!r})"
+
+
+def executar_por_empresa(nomes: list[str], fn) -> dict[str, object]:
+    """Roda fn(nome) para cada empresa em paralelo, cada uma no seu contexto.
+
+    Devolve {nome: resultado ou a exceção levantada}.
+    """
+    resultados: dict[str, object] = {}
+    if not nomes:
+        return resultados
+
+    def rodar(nome: str):
+        with usar_empresa(nome):
+            return fn(nome)
+
+    with ThreadPoolExecutor(max_workers=EMPRESAS_PARALELO or len(nomes), thread_name_prefix="empresa") as pool:
+        futuros = {nome: pool.submit(contextvars.copy_context().run, rodar, nome) for nome in nomes}
+        for nome, futuro in futuros.items():
+            try:
+                resultados[nome] = futuro.result()
+            except Exception as e:
+                resultados[nome] = e
+    return resultados
@@ -0,0 +1,121 @@
+"""Confirmação de envio com imagens sintéticas (sem WhatsApp e sem captura real)."""
+
+import pytest
+
+Image = pytest.importorskip("PIL.Image")
+ImageDraw = pytest.importorskip("PIL.ImageDraw")
+
+from delivery_detector import (  # noqa: E402
+    COR_LIDO,
+    CORES_ENVIADO,
+    DetectorEntrega,
+    caixa_vazia,
+    marcador_ultima_bolha,
+    tela_mudou,
+)
+
+FUNDO_BOLHA = (217, 253, 211)
+FUNDO_CAIXA = (255, 255, 255)
+
+
+def bolha(hora: str, cor=CORES_ENVIADO[0]):
+    """Canto da última bolha: hora em cinza + ✓ na cor do marcador."""
+    img = Image.new("RGB", (80, 40), FUNDO_BOLHA)
+    d = ImageDraw.Draw(img)
+    d.text((4, 14), hora, fill=CORES_ENVIADO[1])
+    d.line([(50, 22), (55, 28), (70, 12)], fill=cor, width=3)
+    return img
+
+
+def caixa(texto: bool):
+    img = Image.new("RGB", (300, 40), FUNDO_CAIXA)
+    if texto:
+        ImageDraw.Draw(img).rectangle([10, 12, 200, 28], fill=(20, 20, 20))
+    return img
+
+
+class Relogio:
+    def __init__(self):
+        self.t = 0.0
+
+    def __call__(self):
+        return self.t
+
+    def dormir(self, s):
+        self.t += s
+
+
+REGIAO_CAIXA = (0, 0, 300, 40)
+REGIAO_BOLHA = (0, 50, 80, 40)
+
+
+def detector(quadros, timeout=3):
+    """Detector cuja captura devolve os quadros [(caixa, bolha), ...] em sequência; o último se repete."""
+    relogio = Relogio()
+    pendentes = list(quadros)
+    atual = {}
+
+    def captura(regiao):
+        # Cada leitura captura a caixa e depois a bolha
+        if regiao == REGIAO_CAIXA:
+            atual["quadro"] = pendentes.pop(0) if len(pendentes) > 1 else pendentes[0]
+            return atual["quadro"][0]
+        return atual["quadro"][1]
+
+    return DetectorEntrega(
+        REGIAO_CAIXA, REGIAO_BOLHA, timeout=timeout, intervalo=0.5, captura=captura, relogio=relogio, dormir=relogio.dormir
+    )
+
+
+def test_caixa_e_marcador_sem_referencias():
+    assert caixa_vazia(caixa(False))
+    assert not caixa_vazia(caixa(True))
+    assert marcador_ultima_bolha(bolha("08:01")) == "enviado"
+    assert marcador_ultima_bolha(bolha("08:01", cor=COR_LIDO)) == "lido"
+    assert marcador_ultima_bolha(Image.new("RGB", (80, 40), FUNDO_BOLHA)) is None
+
+
+def test_bolha_anterior_nao_confirma_envio_que_nao_saiu():
+    # Conversa já tinha uma mensagem com ✓; o texto novo nunca chegou à caixa
+    anterior = bolha("07:58")
+    d = detector([(caixa(False), anterior), (caixa(False), anterior)])
+    d.registrar_antes()
+    r = d.aguardar_confirmacao()
+    assert not r.confirmado
+    assert r.motivo == "nenhuma bolha nova desde antes do envio"
+
+
+def test_sem_base_a_bolha_anterior_confirmaria():
+    # O comportamento antigo (sem registrar_antes) é justamente o falso positivo
+    anterior = bolha("07:58")
+    d = detector([(caixa(False), anterior)])
+    assert d.aguardar_confirmacao().confirmado
+
+
+def test_bolha_nova_confirma():
+    d = detector([(caixa(True), bolha("07:58")), (caixa(True), bolha("07:58")), (caixa(False), bolha("08:03"))])
+    d.registrar_antes()
+    r = d.aguardar_confirmacao()
+    assert r.confirmado and r.marcador == "enviado"
+
+
+def test_mesmo_minuto_confirma_pela_caixa():
+    # Segunda mensagem para o mesmo número no mesmo minuto: canto da bolha idêntico
+    canto = bolha("08:03")
+    d = detector([(caixa(True), canto), (caixa(False), canto)])
+    d.registrar_antes()
+    assert d.aguardar_confirmacao().confirmado
+
+
+def test_texto_preso_na_caixa():
+    d = detector([(caixa(True), bolha("07:58")), (caixa(True), bolha("07:58"))])
+    d.registrar_antes()
+    r = d.aguardar_confirmacao()
+    assert not r.confirmado
+    assert r.motivo == "texto continua na caixa de digitação"
+
+
+def test_tela_mudou():
+    assert tela_mudou((caixa(False), bolha("07:58")), (caixa(False), bolha("08:03")))
+    assert not tela_mudou((caixa(False), bolha("07:58")), (caixa(False), bolha("07:58")))
+    assert tela_mudou((caixa(True), bolha("08:03")), (caixa(False), bolha("08:03")))
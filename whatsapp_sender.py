@@ -4,17 +4,58 @@ Notas práticas:
 - O pywhatkit abre o WhatsApp Web, digita e envia a mensagem.
 - Para evitar que a aba seja fechada cedo demais (mensagem ainda "subindo"),
   aguardamos alguns segundos após o envio antes de fechar.
+- Com perfil próprio (sessões paralelas, WA_SESSOES) ou com a confirmação pela tela,
+  a conversa é aberta com o texto já na URL (como o pywhatkit faz) e o ENTER é nosso:
+  só o foco + ENTER usa a trava do desktop (o carregamento de uma sessão corre
+  enquanto outra envia) e a tela é capturada logo antes do ENTER, como base da confirmação.
 """
 
+import os
+import subprocess
+import threading
 import time
 import webbrowser
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+from urllib.parse import quote
 
-import pyautogui
-import pywhatkit as kit
+from send_scheduler import fmt_duracao
+from stage_profiler import etapa
 
 
 KICKOFF_PHONE_E164 = "+5585989564518"
 KICKOFF_MESSAGE = "Disparo de mensagens Merchan iniciado"
+WHATSAPP_WEB = "https://web.whatsapp.com"
+
+
+class EnvioTravado(Exception):
+    def __init__(self, fase):
+        super().__init__(f"envio travado em '{fase}'")
+        self.fase = fase
+
+
+def executar_em_thread(funcao, segundos):
+    """Roda `funcao` numa thread e espera no máximo `segundos`.
+
+    (True, retorno) se terminou; (False, None) se estourou. A thread que estourou segue
+    bloqueada em segundo plano (daemon) e é abandonada; exceções de `funcao` são repassadas.
+    """
+    saida = {}
+
+    def alvo():
+        try:
+            saida["retorno"] = funcao()
+        except BaseException as e:
+            saida["erro"] = e
+
+    thread = threading.Thread(target=alvo, name="whatsapp-envio", daemon=True)
+    thread.start()
+    thread.join(segundos)
+    if thread.is_alive():
+        return False, None
+    if "erro" in saida:
+        raise saida["erro"]
+    return True, saida.get("retorno")
 
 
 class WhatsAppSender:
@@ -27,7 +68,39 @@ class WhatsAppSender:
         wait_time_padrao=45,
         warmup_segundos=25,
         auto_close_browser=False,
+        telemetria=None,
+        enviar_kickoff=True,
+        trava_gui=None,
+        detector_entrega=None,
+        relogio=time.monotonic,
+        dormir=time.sleep,
+        agora=datetime.now,
+        kit=None,
+        teclado=None,
+        navegador=None,
+        watchdog_segundos=60,
+        tentativas_envio=1,
+        matar_navegador=None,
+        navegador_executavel=None,
+        perfil_navegador=None,
+        janela=None,
+        executar_com_prazo=None,
     ):
+        """
+        relogio/dormir/agora, kit (pywhatkit), teclado (pyautogui) e navegador (webbrowser)
+        podem ser substituídos, ex.: pelo simulador de envio (send_simulator).
+        perfil_navegador: pasta de perfil (--user-data-dir) de navegador_executavel, com o
+        WhatsApp Web logado só para esta sessão; janela: (x, y, largura, altura) da janela
+        dela na tela. Sem perfil, o envio é o do pywhatkit no navegador padrão.
+        watchdog_segundos: folga além das esperas previstas de cada envio. Cada envio roda
+        numa thread (executar_em_thread) e o lote espera no máximo esse tempo: estourou, o
+        navegador que o sender abriu é encerrado (matar_navegador, PID do perfil ou alt+F4)
+        e reaberto com warm-up, e a mensagem é repetida até `tentativas_envio` vezes se
+        travou antes do ENTER. A thread que travou é abandonada e não toca mais no teclado.
+        None/0 = sem watchdog (envio na própria thread do lote).
+        executar_com_prazo(funcao, segundos) -> (terminou, retorno): substituível, ex.: pelo
+        relógio virtual do simulador.
+        """
         self.intervalo = intervalo_entre_mensagens
         self.intervalo_mesmo_numero = intervalo_mesmo_numero
         self.espera_pos_envio = espera_pos_envio
@@ -37,17 +110,71 @@ class WhatsAppSender:
         self._ja_enviou_algo = False
         # Não fecha automaticamente o navegador a menos que solicitado
         self.auto_close_browser = auto_close_browser
+        # TelemetriaEnvio opcional (um registro JSONL por mensagem)
+        self.telemetria = telemetria
+        self.enviar_kickoff = enviar_kickoff
+        # Trava compartilhada entre sessões no mesmo desktop (foco/teclado)
+        self.trava_gui = trava_gui
+        # DetectorEntrega opcional: confirma o envio pela tela em vez da espera fixa
+        self.detector_entrega = detector_entrega
+        # Warm-up e kickoff podem rodar em segundo plano enquanto o banco é consultado:
+        # warmup_pronto ao fim do warm-up; sessao_pronta depois do kickoff (ou sem ele)
+        self.warmup_pronto = threading.Event()
+        self.sessao_pronta = threading.Event()
+        self._preparacao = None
+        self._cancelar_preparacao = threading.Event()
+        # Decisão sobre o lote (sinalizar_lote): o kickoff só sai se houver lote
+        self._lote_decidido = threading.Event()
+        self._ha_lote = False
+        self._kickoff_feito = False
+        # Alertas (frescor) e kickoff podem vir de threads diferentes: um envio por vez
+        self._trava_envio = threading.Lock()
+        if kit is None:
+            import pywhatkit as kit
+        if teclado is None:
+            import pyautogui as teclado
+        self._kit = kit
+        self._teclado = teclado
+        self._navegador = navegador or webbrowser
+        self._relogio = relogio
+        self._dormir = dormir
+        self._agora = agora
+        self.watchdog_segundos = watchdog_segundos
+        self.tentativas_envio = max(1, int(tentativas_envio or 1))
+        self._matar_navegador = matar_navegador
+        self._executar_com_prazo = executar_com_prazo or executar_em_thread
+        # Sinal de cancelamento do envio em andamento, visto pela thread que o executa
+        self._local = threading.local()
+        self._fase_atual = None
+        self.ultimo_motivo_falha = None
+        if perfil_navegador and not navegador_executavel:
+            raise ValueError("perfil_navegador exige navegador_executavel (ex.: caminho do chrome.exe)")
+        self.navegador_executavel = navegador_executavel
+        self.perfil_navegador = perfil_navegador
+        self.janela = tuple(janela) if janela else None
+        # Processo do navegador do perfil (a primeira abertura; as seguintes só entregam a URL a ele):
+        # é ele que o watchdog encerra
+        self._processo = None
+        # Sem pywhatkit (que dá o próprio ENTER): perfil próprio ou confirmação com captura antes do ENTER
+        self._envio_pela_url = bool(perfil_navegador) or detector_entrega is not None
 
     def warmup_whatsapp_web(self):
         """Abre o WhatsApp Web para reduzir a chance do 1º envio ficar em rascunhos."""
         try:
             print("🌐 Abrindo WhatsApp Web (warm-up)...")
-            webbrowser.open("https://web.whatsapp.com")
+            with self._gui():
+                self._abrir(WHATSAPP_WEB)
             if self.warmup_segundos and self.warmup_segundos > 0:
                 print(f"  ⏱ Aguardando {self.warmup_segundos}s para carregar...")
-                time.sleep(self.warmup_segundos)
+                restante = self.warmup_segundos
+                while restante > 0 and not self._cancelar_preparacao.is_set():
+                    self._dormir(min(1.0, restante))
+                    restante -= 1.0
+            if self._cancelar_preparacao.is_set():
+                return False
             try:
-                pyautogui.press("esc")
+                with self._gui():
+                    self._teclado.press("esc")
             except Exception:
                 pass
             return True
@@ -55,11 +182,78 @@ class WhatsAppSender:
             print(f"  ⚠ Warm-up falhou: {e}")
             return False
 
+    def preparar_sessao(self):
+        """Warm-up do WhatsApp Web e, decidido que há lote, o kickoff; sinaliza `sessao_pronta` ao final."""
+        try:
+            if not self.warmup_pronto.is_set():
+                try:
+                    self.warmup_whatsapp_web()
+                finally:
+                    self.warmup_pronto.set()
+            if self.enviar_kickoff and not self._kickoff_feito:
+                # Em segundo plano, o kickoff sai junto com as consultas assim que o plano tem destinatários
+                self._lote_decidido.wait()
+                if self._ha_lote and not self._cancelar_preparacao.is_set():
+                    self.enviar_kickoff_pendente()
+        finally:
+            self.sessao_pronta.set()
+
+    def sinalizar_lote(self, ha_lote=True):
+        """Libera (ou dispensa) o kickoff da preparação; só a primeira decisão vale."""
+        if self._lote_decidido.is_set():
+            return
+        self._ha_lote = bool(ha_lote)
+        self._lote_decidido.set()
+
+    def enviar_kickoff_pendente(self):
+        """Mensagem inicial (kickoff) do disparo, uma vez por sessão."""
+        if not self.enviar_kickoff or self._kickoff_feito:
+            return
+        self._kickoff_feito = True
+        print("\n📣 Enviando mensagem inicial (kickoff) do disparo...")
+        if not self.enviar_mensagem(KICKOFF_PHONE_E164, KICKOFF_MESSAGE, fechar_aba=False, tipo="kickoff"):
+            print("⚠ Mensagem inicial falhou; seguindo com o lote mesmo assim.")
+
+    def iniciar_preparacao_em_segundo_plano(self):
+        """Dispara `preparar_sessao` numa thread; o lote aguarda `sessao_pronta` antes de enviar."""
+        if self._preparacao is not None or self.sessao_pronta.is_set():
+            return self._preparacao
+        self._preparacao = threading.Thread(
+            target=self.preparar_sessao, name="whatsapp-warmup", daemon=True
+        )
+        self._preparacao.start()
+        return self._preparacao
+
+    def cancelar_preparacao(self):
+        """Saída antes do envio (sem lote, erro): interrompe o warm-up, dispensa o kickoff e espera a thread."""
+        self._cancelar_preparacao.set()
+        self._lote_decidido.set()
+        if self._preparacao is not None:
+            self._preparacao.join()
+
+    def aguardar_warmup(self):
+        """Só o warm-up (ex.: alerta antes de se saber se haverá lote)."""
+        if self._preparacao is None and not self.warmup_pronto.is_set():
+            try:
+                self.warmup_whatsapp_web()
+            finally:
+                self.warmup_pronto.set()
+            return
+        self.warmup_pronto.wait()
+
+    def aguardar_sessao_pronta(self):
+        if self._preparacao is None and not self.sessao_pronta.is_set():
+            self.preparar_sessao()
+            return
+        if not self.sessao_pronta.is_set():
+            print("⏳ Aguardando o warm-up/kickoff do WhatsApp Web terminar...")
+        self.sessao_pronta.wait()
+
     def fechar_aba(self):
         try:
             # Fecha a aba atual
-            pyautogui.hotkey("ctrl", "w")
-            time.sleep(1)
+            self._teclado.hotkey("ctrl", "w")
+            self._dormir(1)
             return True
         except Exception as e:
             print(f"  ⚠ Erro ao fechar aba: {e}")
@@ -68,66 +262,291 @@ class WhatsAppSender:
     def fechar_navegador(self):
         try:
             print("  🔒 Fechando navegador...")
-            pyautogui.hotkey("alt", "F4")
-            time.sleep(2)
+            self._teclado.hotkey("alt", "F4")
+            self._dormir(2)
             return True
         except Exception as e:
             print(f"  ⚠ Erro ao fechar navegador: {e}")
             return False
 
-    def enviar_mensagem(self, telefone, mensagem, fechar_aba=False):
+    def _gui(self):
+        return self.trava_gui if self.trava_gui is not None else nullcontext()
+
+    def _abrir(self, url):
+        """Abre a URL no navegador do perfil da sessão (ou no navegador padrão, sem perfil)."""
+        if not self.perfil_navegador:
+            self._navegador.open(url)
+            return
+        comando = [self.navegador_executavel, f"--user-data-dir={os.path.abspath(self.perfil_navegador)}"]
+        if self.janela:
+            x, y, largura, altura = self.janela
+            comando += [f"--window-position={x},{y}", f"--window-size={largura},{altura}"]
+        processo = subprocess.Popen(comando + [url])
+        if self._processo is None or self._processo.poll() is not None:
+            self._processo = processo
+
+    def _focar(self):
+        """Clica na caixa de digitação da janela da sessão: traz a janela para a frente e dá o foco."""
+        if self.janela:
+            x, y, largura, altura = self.janela
+        else:
+            x, y = 0, 0
+            largura, altura = self._teclado.size()
+        self._teclado.click(x + largura // 2, y + altura - altura // 10)
+
+    def _fase(self, registro, nome):
+        # Envio abandonado pelo watchdog: a thread para aqui, sem abrir a próxima fase
+        self._vigia_conferir()
+        self._fase_atual = nome
+        if registro is None:
+            return nullcontext()
+        return registro.fase(nome)
+
+    # ------------------------------------------------------------------
+    # Watchdog por envio (o envio roda numa thread; o lote espera com prazo)
+    # ------------------------------------------------------------------
+    def _limite_envio(self, wait_time):
+        """Tempo máximo de um envio: esperas previstas + folga do watchdog."""
+        if self.detector_entrega is not None:
+            pos_envio = self.detector_entrega.timeout + self.detector_entrega.espera_minima
+        else:
+            pos_envio = max(self.espera_pos_envio or 0, 5) + 3
+        return wait_time + pos_envio + 5 + self.watchdog_segundos
+
+    def _vigia_conferir(self):
+        """Na thread do envio: interrompe se o watchdog já desistiu dele (não digita mais nada)."""
+        cancelado = getattr(self._local, "cancelado", None)
+        if cancelado is not None and cancelado.is_set():
+            raise EnvioTravado(self._fase_atual)
+
+    def _pausar(self, segundos):
+        self._vigia_conferir()
+        self._dormir(segundos)
+        self._vigia_conferir()
+
+    def encerrar_navegador(self):
+        """Encerra só o navegador desta sessão: o processo que o sender abriu (árvore do PID)
+        ou, no Linux, o do perfil; sem perfil (navegador padrão), fecha a janela (alt+F4)."""
+        try:
+            if self._matar_navegador is not None:
+                self._matar_navegador()
+            elif self._processo is not None and self._processo.poll() is None:
+                if os.name == "nt":
+                    comando = ["taskkill", "/F", "/T", "/PID", str(self._processo.pid)]
+                    subprocess.run(comando, capture_output=True, timeout=30)
+                else:
+                    self._processo.kill()
+                self._processo.wait(timeout=30)
+            elif self.perfil_navegador and os.name != "nt":
+                # A primeira abertura entregou a URL a um navegador do perfil que já estava aberto
+                perfil = f"--user-data-dir={os.path.abspath(self.perfil_navegador)}"
+                subprocess.run(["pkill", "-f", perfil], capture_output=True, timeout=30)
+            else:
+                with self._gui():
+                    if self._envio_pela_url:
+                        self._focar()
+                    self.fechar_navegador()
+        except Exception as e:
+            print(f"  ⚠ Não foi possível encerrar o navegador: {e}")
+        self._processo = None
+
+    def recuperar_navegador(self):
+        """Depois de um envio travado: encerra o navegador, reabre e refaz o warm-up."""
+        print("  🔄 Recuperando o navegador (encerrar + warm-up)...")
+        self.encerrar_navegador()
+        self._dormir(3)
+        self.warmup_whatsapp_web()
+        # Navegador recém-aberto: o próximo envio usa a espera da primeira mensagem
+        self._ja_enviou_algo = False
+
+    def enviar_mensagem(self, telefone, mensagem, fechar_aba=False, tipo="", tentativa=1):
+        with self._trava_envio:
+            return self._enviar_com_tentativas(telefone, mensagem, fechar_aba, tipo, tentativa)
+
+    def _enviar_com_tentativas(self, telefone, mensagem, fechar_aba, tipo, tentativa):
+        while True:
+            sucesso, motivo, repetir = self._enviar_uma_vez(telefone, mensagem, fechar_aba, tipo, tentativa)
+            if sucesso:
+                self.ultimo_motivo_falha = None
+                return True
+            self.ultimo_motivo_falha = motivo
+            if repetir is None:
+                return False
+            # Travou: o navegador é recuperado mesmo sem nova tentativa (próximos itens)
+            self.recuperar_navegador()
+            if not repetir or tentativa >= self.tentativas_envio:
+                return False
+            tentativa += 1
+            print(f"  🔁 Nova tentativa ({tentativa}/{self.tentativas_envio}) para {telefone}...")
+
+    def _enviar_uma_vez(self, telefone, mensagem, fechar_aba, tipo, tentativa):
+        """(sucesso, motivo da falha, repetir): repetir None = não travou; False = travou após o ENTER."""
+        registro = None
+        self._fase_atual = "inicio"
         try:
             print(f"⏳ Enviando mensagem para {telefone}...")
 
             wait_time = self.wait_time_primeira if not self._ja_enviou_algo else self.wait_time_padrao
+            if self.telemetria is not None:
+                registro = self.telemetria.iniciar_mensagem(
+                    telefone, mensagem, tipo=tipo, tentativa=tentativa, wait_time=wait_time
+                )
 
-            # Usa pywhatkit (mantém a aba aberta; fecharemos manualmente após espera segura)
-            kit.sendwhatmsg_instantly(
-                phone_no=telefone,
-                message=mensagem,
-                wait_time=wait_time,
-                tab_close=False,
-                close_time=5,
-            )
+            if not self.watchdog_segundos:
+                falha_confirmacao = self._passos_envio(telefone, mensagem, fechar_aba, wait_time, registro)
+            else:
+                cancelado = threading.Event()
+                terminou, falha_confirmacao = self._executar_com_prazo(
+                    lambda: self._passos_envio(telefone, mensagem, fechar_aba, wait_time, registro, cancelado),
+                    self._limite_envio(wait_time),
+                )
+                if not terminou:
+                    # A thread do envio fica para trás: ao voltar, para no próximo passo
+                    cancelado.set()
+                    print(f"\n  ⏰ Watchdog: envio estourou o tempo em '{self._fase_atual}'")
+                    raise EnvioTravado(self._fase_atual)
+
+            if falha_confirmacao:
+                print(f"✗ Envio não confirmado para {telefone}: {falha_confirmacao}")
+                if registro is not None:
+                    registro.finalizar("nao_confirmado", falha_confirmacao)
+                return False, falha_confirmacao, None
 
-            # Redundância: em alguns cenários o texto é digitado, mas o ENTER não ocorre.
-            try:
-                time.sleep(1.0)
-                for _ in range(3):
-                    pyautogui.press("enter")
-                    time.sleep(0.6)
-            except Exception:
-                pass
+            print(f"✓ Mensagem enviada para {telefone}")
+            self._ja_enviou_algo = True
+            if registro is not None:
+                registro.finalizar("ok")
+            return True, None, None
+        except Exception as e:
+            if not isinstance(e, EnvioTravado):
+                print(f"✗ Erro ao enviar mensagem para {telefone}: {e}")
+                if registro is not None:
+                    registro.finalizar("erro", str(e))
+                return False, str(e), None
+
+            # Antes do ENTER a mensagem não saiu: pode repetir sem risco de duplicar
+            repetir = e.fase in ("inicio", "abrir_conversa")
+            motivo = f"watchdog: travou em '{e.fase}'" + ("" if repetir else " (pode ter sido enviada)")
+            print(f"✗ Envio para {telefone} não concluído ({motivo})")
+            if registro is not None:
+                registro.finalizar("timeout", motivo)
+            return False, motivo, repetir
+
+    def _passos_envio(self, telefone, mensagem, fechar_aba, wait_time, registro, cancelado=None):
+        """Abre a conversa, dá o ENTER e aguarda o envio; devolve o motivo se a tela não confirmou."""
+        self._local.cancelado = cancelado
+        if self._envio_pela_url:
+            # Conversa aberta com o texto na URL; o carregamento não segura a trava do desktop
+            with self._fase(registro, "abrir_conversa"):
+                with self._gui():
+                    self._abrir(f"{WHATSAPP_WEB}/send?phone={telefone.lstrip('+')}&text={quote(mensagem)}")
+                self._pausar(wait_time)
+        else:
+            with self._gui():
+                # Usa pywhatkit (mantém a aba aberta; fecharemos manualmente após espera segura)
+                # O pywhatkit dá o próprio ENTER: um estouro durante a chamada não repete a mensagem
+                with self._fase(registro, "pywhatkit"):
+                    self._kit.sendwhatmsg_instantly(
+                        phone_no=telefone,
+                        message=mensagem,
+                        wait_time=wait_time,
+                        tab_close=False,
+                        close_time=5,
+                    )
+
+        # Redundância: em alguns cenários o texto é digitado, mas o ENTER não ocorre.
+        # Só este trecho (foco + ENTER) segura a trava do desktop.
+        with self._fase(registro, "enter"):
+            with self._gui():
+                try:
+                    if self._envio_pela_url:
+                        self._focar()
+                        if self.detector_entrega is not None:
+                            self.detector_entrega.registrar_antes()
+                    self._pausar(1.0)
+                    for _ in range(3):
+                        self._teclado.press("enter")
+                        self._pausar(0.6)
+                except EnvioTravado:
+                    raise
+                except Exception:
+                    pass
 
-            # Aguarda a mensagem efetivamente ser enviada antes de fechar.
-            if self.espera_pos_envio and self.espera_pos_envio > 0:
+        # Aguarda a mensagem efetivamente ser enviada antes de fechar.
+        falha_confirmacao = None
+        with self._fase(registro, "pos_envio"):
+            if self.detector_entrega is not None:
+                # Só captura de tela (regiões da janela desta sessão): sem a trava do desktop
+                resultado = self.detector_entrega.aguardar_confirmacao()
+                self._vigia_conferir()
+                if resultado.confirmado:
+                    print(f"  ✓ Envio confirmado na tela ({resultado.marcador}, {resultado.segundos:.1f}s)")
+                else:
+                    falha_confirmacao = resultado.motivo or "envio não confirmado"
+            elif self.espera_pos_envio and self.espera_pos_envio > 0:
                 extra = 3
                 total_wait = max(self.espera_pos_envio, 5) + extra
                 print(f"  ⏱ Aguardando {total_wait}s para confirmar envio...")
-                time.sleep(total_wait)
+                self._pausar(total_wait)
 
             # Garante que não ficou nenhum popup/overlay
             try:
-                pyautogui.press("esc")
+                with self._gui():
+                    if self._envio_pela_url:
+                        self._focar()
+                    self._teclado.press("esc")
             except Exception:
                 pass
 
-            if fechar_aba:
-                # Aguarda um pouco antes de fechar para evitar fechamento precoce
+        if fechar_aba:
+            # Aguarda um pouco antes de fechar para evitar fechamento precoce
+            with self._fase(registro, "fechar_aba"):
                 try:
-                    time.sleep(0.8)
-                    self.fechar_aba()
+                    self._pausar(0.8)
+                    with self._gui():
+                        if self._envio_pela_url:
+                            self._focar()
+                        self.fechar_aba()
+                except EnvioTravado:
+                    raise
                 except Exception:
                     pass
+        return falha_confirmacao
+
+    def _imprimir_eta(self, plano, posicao):
+        restante = plano.restante_apos(posicao)
+        faltam = len(plano.itens) - posicao - 1
+        if faltam <= 0:
+            return
+        eta = self._agora() + timedelta(seconds=restante)
+        print(f"  📅 ETA do lote: {eta.strftime('%H:%M:%S')} (restam {faltam} itens, ~{fmt_duracao(restante)})")
+        if plano.prazo is not None and eta > plano.prazo:
+            print(f"  ⚠ Lote deve terminar após o prazo ({plano.prazo.strftime('%H:%M')}).")
+
+    def enviar_mensagens_lote(
+        self,
+        mensagens_envio,
+        modo_teste=False,
+        agenda=None,
+        ao_iniciar_item=None,
+        ao_concluir_item=None,
+    ):
+        plano = None
+        adiados = []
+        preparacao_pendente = not modo_teste and self._preparacao is None and not self.sessao_pronta.is_set()
+        if not modo_teste:
+            # Sem sinalizar_lote antes (ex.: modo serviço), a decisão sobre o kickoff sai daqui
+            self.sinalizar_lote(bool(mensagens_envio))
+        if not modo_teste and not preparacao_pendente:
+            # Warm-up/kickoff já disparados em segundo plano: o ETA parte de quando a sessão estiver pronta
+            self.aguardar_sessao_pronta()
+        if agenda is not None:
+            # Reordena por prioridade/telefone e calcula o ETA de cada item
+            plano = agenda.planejar(mensagens_envio, incluir_preparacao=preparacao_pendente)
+            agenda.imprimir_plano(plano)
+            mensagens_envio = [x.item for x in plano.itens]
+            adiados = [x.item for x in plano.adiados]
 
-            print(f"✓ Mensagem enviada para {telefone}")
-            self._ja_enviou_algo = True
-            return True
-        except Exception as e:
-            print(f"✗ Erro ao enviar mensagem para {telefone}: {e}")
-            return False
-
-    def enviar_mensagens_lote(self, mensagens_envio, modo_teste=False):
         total = len(mensagens_envio)
         enviadas = 0
         falhas = 0
@@ -141,16 +560,10 @@ class WhatsAppSender:
 
         try:
             if not modo_teste:
-                self.warmup_whatsapp_web()
-
-                print("\n📣 Enviando mensagem inicial (kickoff) do disparo...")
-                kickoff_ok = self.enviar_mensagem(
-                    KICKOFF_PHONE_E164,
-                    KICKOFF_MESSAGE,
-                    fechar_aba=False,
-                )
-                if not kickoff_ok:
-                    print("⚠ Mensagem inicial falhou; seguindo com o lote mesmo assim.")
+                self.aguardar_sessao_pronta()
+                if total:
+                    # Preparação anterior sem lote (modo serviço): o kickoff sai agora
+                    self.enviar_kickoff_pendente()
 
             for i, item in enumerate(mensagens_envio, 1):
                 destinatario = item["destinatario"]
@@ -167,41 +580,58 @@ class WhatsAppSender:
                 print(f"Telefone: {telefone}")
                 print(f"Mensagens a enviar: {len(mensagens)}")
 
+                inicio_item = self._relogio()
+                if ao_iniciar_item is not None:
+                    ao_iniciar_item(item)
+
                 if modo_teste:
                     print("📝 MODO TESTE - Mensagens que seriam enviadas:")
                     for j, msg in enumerate(mensagens, 1):
                         print(f"\n--- Mensagem {j} ---")
                         print(msg[:400] + ("..." if len(msg) > 400 else ""))
                     enviadas += 1
+                    if ao_concluir_item is not None:
+                        ao_concluir_item(item, True)
                     continue
 
                 sucesso_total = True
-                for j, mensagem in enumerate(mensagens, 1):
-                    print(f"\n  Enviando mensagem {j}/{len(mensagens)}...")
-                    is_last_msg = j == len(mensagens)
-                    fechar_aba_msg = is_last_msg and close_after_item
-                    # Só fecha aba se a flag do item pedir E o objeto estiver configurado
-                    fechar_arg = bool(fechar_aba_msg and self.auto_close_browser)
-                    sucesso = self.enviar_mensagem(telefone, mensagem, fechar_aba=fechar_arg)
-                    if not sucesso:
-                        sucesso_total = False
-                        break
-
-                    if j < len(mensagens):
-                        print(f"  ⏱ Aguardando {self.intervalo_mesmo_numero}s...")
-                        time.sleep(self.intervalo_mesmo_numero)
+                with etapa(f"{tipo or 'item'} {destinatario}"):
+                    for j, mensagem in enumerate(mensagens, 1):
+                        print(f"\n  Enviando mensagem {j}/{len(mensagens)}...")
+                        is_last_msg = j == len(mensagens)
+                        fechar_aba_msg = is_last_msg and close_after_item
+                        # Só fecha aba se a flag do item pedir E o objeto estiver configurado
+                        fechar_arg = bool(fechar_aba_msg and self.auto_close_browser)
+                        sucesso = self.enviar_mensagem(telefone, mensagem, fechar_aba=fechar_arg, tipo=tipo)
+                        if not sucesso:
+                            sucesso_total = False
+                            item["motivo_falha"] = self.ultimo_motivo_falha
+                            break
+
+                        if j < len(mensagens):
+                            print(f"  ⏱ Aguardando {self.intervalo_mesmo_numero}s...")
+                            self._dormir(self.intervalo_mesmo_numero)
 
                 if sucesso_total:
                     enviadas += 1
+                    item.pop("motivo_falha", None)
                     print(f"✓ Mensagens enviadas para {destinatario}")
                 else:
                     falhas += 1
-                    print(f"✗ Falha ao enviar mensagens para {destinatario}")
+                    print(f"✗ Falha ao enviar mensagens para {destinatario}: {item.get('motivo_falha') or 'erro'}")
+
+                if ao_concluir_item is not None:
+                    ao_concluir_item(item, sucesso_total)
+
+                if plano is not None:
+                    if sucesso_total:
+                        agenda.registrar_duracao(tipo, len(mensagens), self._relogio() - inicio_item)
+                    self._imprimir_eta(plano, i - 1)
 
                 if i < total:
                     espera = self.intervalo if close_after_item else 1
                     print(f"\n⏱ Aguardando {espera}s...")
-                    time.sleep(espera)
+                    self._dormir(espera)
 
         except KeyboardInterrupt:
             print("\n⚠ Envio interrompido pelo usuário (Ctrl+C).")
@@ -221,6 +651,14 @@ class WhatsAppSender:
         print(f"Total de destinatários: {total}")
         print(f"Enviadas com sucesso: {enviadas}")
         print(f"Falhas: {falhas}")
+        if adiados:
+            print(f"Adiados (fora do prazo): {len(adiados)}")
         print(f"{'='*60}\n")
 
-        return {"total": total, "enviadas": enviadas, "falhas": falhas}
+        if self.telemetria is not None and not modo_teste:
+            self.telemetria.resumo_lote()
+
+        if plano is not None and not modo_teste:
+            agenda.salvar_tempos()
+
+        return {"total": total, "enviadas": enviadas, "falhas": falhas, "adiados": adiados}